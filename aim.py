@@ -0,0 +1,166 @@
+"""
+This class predicts where the cue ball will go and draws the aiming line.
+
+The path comes from the same EventSimulator the balls are moved with: a copy of the table is shot
+at the aiming angle, and the cue ball is followed through its cushion bounces until it hits another
+ball or stops. The path (plus a short line showing where the hit ball will go) is turned into one
+mesh of dashes, which is kept until the angle or a ball moves. Holding J or L then rebuilds it once
+per degree instead of every frame.
+
+Example usage:
+aim = AimPredictor(basic_shapes)
+aim.draw(physics, cue_index, shooting_angle)   # Every frame in shooting mode
+print(aim.path, aim.first_hit)                  # Cue ball path as (k, 2) points, index of the ball it hits
+"""
+
+import numpy as np
+from OpenGL.GL import *
+from materials import Materials
+from mesh_cache import Mesh
+
+# Dashes of the aiming line (in feet)
+DASH_SPACING = 0.4      # Center to center, about 4.8 in
+DASH_LENGTH = 0.08      # Along the line
+DASH_WIDTH = 0.125      # Across the line, 1.5 in
+DASH_HEIGHT = 0.04      # 0.5 in
+DASH_Y = 0.075          # Height above the table cloth
+
+AIM_CUSHIONS = 3        # Cushion bounces shown before the line ends
+HIT_LINE_LENGTH = 1.2   # Length of the line showing where the first ball hit will go
+MAX_AIM_EVENTS = 100    # Events simulated at most for one prediction
+
+
+def dash_template():
+    """The 6 faces (4 corners each) of a dash at the origin pointing along x: (24, 8) vertex rows"""
+    half_length, half_width = DASH_LENGTH / 2, DASH_WIDTH / 2
+    faces = [
+        ((0, -1, 0), [(-1, 0, -1), (1, 0, -1), (1, 0, 1), (-1, 0, 1)]),   # Bottom
+        ((0, 1, 0), [(-1, 1, -1), (-1, 1, 1), (1, 1, 1), (1, 1, -1)]),    # Top
+        ((0, 0, -1), [(-1, 0, -1), (-1, 1, -1), (1, 1, -1), (1, 0, -1)]), # Back
+        ((0, 0, 1), [(-1, 0, 1), (1, 0, 1), (1, 1, 1), (-1, 1, 1)]),      # Front
+        ((-1, 0, 0), [(-1, 0, -1), (-1, 0, 1), (-1, 1, 1), (-1, 1, -1)]), # Left
+        ((1, 0, 0), [(1, 0, -1), (1, 1, -1), (1, 1, 1), (1, 0, 1)]),      # Right
+    ]
+    tex_coords = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    rows = []
+    for normal, corners in faces:
+        for (x, y, z), tex_coord in zip(corners, tex_coords):
+            rows.append([x * half_length, y * DASH_HEIGHT, z * half_width, *normal, *tex_coord])
+    return np.array(rows, dtype=np.float32)
+
+
+def dash_positions(points, spacing=DASH_SPACING):
+    """Centers and unit directions of dashes every spacing feet along a polyline of (k, 2) points"""
+    segments = np.diff(points, axis=0)
+    lengths = np.hypot(segments[:, 0], segments[:, 1])
+    keep = lengths > 1e-9
+    segments, lengths, starts = segments[keep], lengths[keep], points[:-1][keep]
+    if len(lengths) == 0:
+        return np.zeros((0, 2)), np.zeros((0, 2))
+
+    ends = np.cumsum(lengths)
+    distances = np.arange(0, ends[-1], spacing)
+    index = np.minimum(np.searchsorted(ends, distances, side="right"), len(ends) - 1)
+    along = distances - (ends[index] - lengths[index])
+    directions = segments[index] / lengths[index, None]
+    return starts[index] + directions * along[:, None], directions
+
+
+def dash_mesh(lines):
+    """One mesh with a dash box every DASH_SPACING along each of the polylines"""
+    template = dash_template()
+    centers, directions = zip(*[dash_positions(line) for line in lines])
+    centers, directions = np.concatenate(centers), np.concatenate(directions)
+    count = len(centers)
+
+    # Turn the template so its x axis follows the line: x' = x * direction + z * across
+    across = np.stack([-directions[:, 1], directions[:, 0]], axis=1)  # Where z goes, as with glRotate(angle, 0, 1, 0)
+    vertices = np.empty((count, len(template), 8), dtype=np.float32)
+    for column in (0, 3):  # Positions, then normals
+        x, z = template[:, column], template[:, column + 2]
+        vertices[:, :, column] = x[None, :] * directions[:, None, 0] + z[None, :] * across[:, None, 0]
+        vertices[:, :, column + 2] = x[None, :] * directions[:, None, 1] + z[None, :] * across[:, None, 1]
+        vertices[:, :, column + 1] = template[None, :, column + 1]
+    vertices[:, :, 0] += centers[:, None, 0]
+    vertices[:, :, 2] += centers[:, None, 1]
+    vertices[:, :, 1] += DASH_Y
+    vertices[:, :, 6:8] = template[None, :, 6:8]
+
+    quads = np.arange(0, len(template), 4)
+    face_indices = (quads[:, None] + np.array([0, 1, 2, 0, 2, 3])).ravel()
+    indices = (np.arange(count)[:, None] * len(template) + face_indices[None, :]).ravel()
+    return Mesh(vertices.reshape(-1, 8), indices, GL_TRIANGLES)
+
+
+class AimPredictor:
+
+    def __init__(self, basic_shapes):
+        self.basic_shapes = basic_shapes
+        self.key = None  # (angle, ball positions) the path was computed for
+        self.path = None  # (k, 2) points the cue ball goes through: start, cushion bounces, end
+        self.hit_line = None  # (2, 2) points from the first ball hit in the direction it will go
+        self.first_hit = None  # Index of the first ball the cue ball hits (None if it hits nothing)
+        self.mesh = None
+
+        # Statistics
+        self.computations = 0
+
+    def predict(self, physics, cue_index, angle):
+        """Follow the cue ball through a copy of the simulation, shot at angle"""
+        simulator = physics.copy()
+        simulator.shoot(cue_index, angle)
+        path = [simulator.positions[cue_index].copy()]
+        self.hit_line = None
+        self.first_hit = None
+        cushions = 0
+
+        for _ in range(MAX_AIM_EVENTS):
+            event = simulator.next_event()
+            if event is None:
+                break
+            time, kind, first, second = event
+            simulator.move_to(time)
+            if cue_index in (first, second) and kind == "ball":
+                path.append(simulator.positions[cue_index].copy())
+                simulator.resolve(kind, first, second)
+                self.first_hit = second if first == cue_index else first
+                direction = simulator.velocities[self.first_hit]
+                speed = np.hypot(direction[0], direction[1])
+                if speed > 0:
+                    start = simulator.positions[self.first_hit]
+                    self.hit_line = np.array([start, start + direction / speed * HIT_LINE_LENGTH])
+                break
+            if first == cue_index and kind != "ball":
+                path.append(simulator.positions[cue_index].copy())
+                if kind == "stop":
+                    break
+                cushions += 1
+                if cushions > AIM_CUSHIONS:
+                    break
+            simulator.resolve(kind, first, second)
+        else:
+            path.append(simulator.positions[cue_index].copy())
+
+        self.path = np.array(path)
+        self.computations += 1
+
+    def update(self, physics, cue_index, angle):
+        """Recompute the path and the mesh if the angle or any ball moved since last time"""
+        key = (angle, cue_index, physics.positions.tobytes())
+        if key == self.key:
+            return
+        self.key = key
+        self.predict(physics, cue_index, angle)
+        lines = [self.path] if self.hit_line is None else [self.path, self.hit_line]
+        if self.mesh is not None:
+            self.mesh.delete()
+        self.mesh = dash_mesh(lines)
+        self.mesh.upload()
+
+    def draw(self, physics, cue_index, angle):
+        """Draws the aiming line (relative to the table top) with one draw call"""
+        self.update(physics, cue_index, angle)
+        if len(self.mesh.indices) == 0:
+            return  # The cue ball can't move (no path)
+        Materials.set_material(GL_FRONT, Materials.BALL_RESIN)
+        self.basic_shapes.draw_mesh(self.mesh)
@@ -0,0 +1,115 @@
+"""
+This class packs several small images into one texture (an atlas).
+
+Each image gets a rectangle of the atlas, and a mesh that used the image on its own uses the
+atlas instead by moving its texture coordinates into that rectangle (remap_tex_coords). Shapes
+textured with several images, like the six faces of a die, can then be drawn with one texture
+bind and one draw call. Images are packed in rows, tallest first, each with a border that repeats
+its edge pixels so linear filtering doesn't pick up the neighbouring image.
+
+The border halves with every mipmap level, so the atlas only gets the levels in which it is still
+at least one texel wide (levels: 4 with the 8 pixel border); below that, each image would be mixed
+with its neighbours. Images and the atlas are placed on multiples of 2 ** levels pixels, so every
+level is exactly half the one above and the rectangles stay the same in all of them.
+
+The layout only depends on the sizes of the images, so it is worked out (and the rectangles are
+known) before any image is decoded; pack() builds the pixels later, when the atlas is loaded.
+
+Only images drawn with texture coordinates between 0 and 1 can go in an atlas: a texture that
+repeats over a surface (the wood, the walls) would repeat the whole atlas.
+
+Example usage:
+atlas = TextureAtlas([(512, 512), (512, 512), ...])   # (height, width) of each image
+tex_coords = remap_tex_coords([(0, 0), (1, 0), (1, 1), (0, 1)], atlas.rects[1])   # A quad showing the second image
+upload(build_mipmaps(atlas.pack([die_one_levels, die_two_levels, ...]), atlas.levels))   # Arrays or their mipmap levels
+"""
+
+import math
+import numpy as np
+from mipmaps import downsample
+
+TILE_SIZE = 512  # Largest side of an image in the atlas (larger images are scaled down)
+PADDING = 8      # Border around each image, in pixels
+
+
+def round_up(value, multiple):
+    return -(-value // multiple) * multiple
+
+
+def remap_tex_coords(tex_coords, rect):
+    """Texture coordinates of an image moved into its (s0, t0, s1, t1) rectangle of an atlas"""
+    s0, t0, s1, t1 = rect
+    return [(s0 + s * (s1 - s0), t0 + t * (t1 - t0)) for s, t in tex_coords]
+
+
+class TextureAtlas:
+
+    def __init__(self, sizes, tile_size=TILE_SIZE, padding=PADDING):
+        """
+        :param sizes: (height, width) of each image; images larger than tile_size are halved until they fit.
+        """
+        self.tile_size = tile_size
+        self.padding = padding
+        self.levels = int(math.log2(padding)) + 1 if padding > 0 else 1  # Mipmap levels in which the border is still there
+        align = 2 ** self.levels
+        self.tile_sizes = [self.fitted_size(size, tile_size) for size in sizes]
+        cells = [(round_up(height + 2 * padding, align), round_up(width + 2 * padding, align))
+                 for height, width in self.tile_sizes]
+
+        # Rows about as wide as the atlas is tall
+        width = max(max(cell[1] for cell in cells), round_up(math.ceil(math.sqrt(sum(h * w for h, w in cells))), align))
+        positions = [None] * len(cells)
+        x = y = row_height = used_width = 0
+        for index in sorted(range(len(cells)), key=lambda index: -cells[index][0]):
+            height, cell_width = cells[index]
+            if x + cell_width > width:
+                x, y, row_height = 0, y + row_height, 0
+            positions[index] = (x, y)
+            x += cell_width
+            row_height = max(row_height, height)
+            used_width = max(used_width, x)
+
+        self.width, self.height = used_width, y + row_height
+        self.cells = [(x, y, cell_width, cell_height) for (cell_height, cell_width), (x, y) in zip(cells, positions)]
+        self.rects = []  # (s0, t0, s1, t1) of each image, in the order given
+        for (height, width), (x, y) in zip(self.tile_sizes, positions):
+            left, top = x + padding, y + padding
+            self.rects.append((left / self.width, top / self.height,
+                               (left + width) / self.width, (top + height) / self.height))
+
+    def pack(self, images):
+        """
+        The (height, width, 3) atlas image (no OpenGL calls)
+        :param images: The images, in the order of the sizes: arrays or lists of mipmap levels (the largest
+                       level that fits in tile_size is used).
+        """
+        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        padding = self.padding
+        for source, (height, width), (x, y, cell_width, cell_height) in zip(images, self.tile_sizes, self.cells):
+            tile = self.fit(source, self.tile_size)
+            if tile.shape[:2] != (height, width):
+                raise ValueError("Image of size %s in an atlas laid out for %s" % (tile.shape[:2], (height, width)))
+            padded = np.pad(tile, ((padding, cell_height - height - padding), (padding, cell_width - width - padding),
+                                   (0, 0)), mode="edge")  # The rounding up goes to the bottom and right borders
+            image[y:y + cell_height, x:x + cell_width] = padded
+        return image
+
+    @staticmethod
+    def fitted_size(size, tile_size):
+        """(height, width) of an image once fit() has halved it (like downsample) until it is no larger than tile_size"""
+        height, width = size
+        while max(height, width) > tile_size:
+            height, width = max(1, height // 2), max(1, width // 2)
+        return height, width
+
+    @staticmethod
+    def fit(image, tile_size):
+        """The image (or its largest mipmap level) no larger than tile_size on either side"""
+        levels = image if isinstance(image, (list, tuple)) else [image]
+        for level in levels:
+            if max(level.shape[:2]) <= tile_size:
+                return level
+        level = levels[-1]
+        while max(level.shape[:2]) > tile_size:
+            level = downsample(level)
+        return level
@@ -17,32 +17,37 @@ from OpenGL.GLU import *
 from OpenGL.GL import *
 from utils import *
 import math
+import numpy as np
 from textures import *
+from mesh_cache import Mesh, MeshCache
+from mesh_generator import box_grid_arrays, plane_grid_arrays, sphere_arrays, cylinder_arrays
+from render_queue import RenderQueue, set_texturing, set_lighting, set_color
+from atlas import remap_tex_coords
+
+# glRotatef(270, 1, 0, 0) (cylinders stand along the y axis), transposed like the matrices OpenGL returns
+CYLINDER_ROTATION = np.array([[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=np.float64)
 
 
 class BasicShapes:
 
-    def draw_sphere(self, radius):
-        quadric = gluNewQuadric()  # Create a new quadric for the sphere
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
-        
+    def __init__(self, mesh_cache=None):
+        # Geometry is built once per set of parameters and reused every frame
+        self.mesh_cache = mesh_cache or MeshCache()
+        self.recorder = None
+        self.skip_draws = False  # Set while drawing something the camera can't see (state changes still happen)
+        self.lod = None  # Optional LODSelector that picks the slices of curved shapes by their size on screen
+
+    # lod_key (for this and the other curved shapes) tells the LODSelector which object this is, the same every frame
+    def draw_sphere(self, radius, slices=32, stacks=32, lod_key=None):
         glPushMatrix()  # Save the current matrix
         glTranslatef(0.0, radius, 0.0)  # Translate to place sphere on the y = 0 plane
         
         # Draw the sphere with specified radius, smooth appearance with 32 slices and stacks
-        gluSphere(quadric, radius, 32, 32)
+        self.draw_centered_sphere(radius, slices, stacks, lod_key)
         
         glPopMatrix()  # Restore the previous matrix state
-        gluDeleteQuadric(quadric)  # Clean up the quadric object
 
     def draw_rotated_sphere(self, radius, rotate_x, rotate_y, rotate_z):
-        quadric = gluNewQuadric()  # Create a new quadric for the sphere
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
-        
         glPushMatrix()  # Save the current matrix
         glTranslatef(0.0, radius, 0.0)  # Translate to place sphere on the y = 0 plane
         glRotate(rotate_x, 0,0,0)
@@ -50,17 +55,11 @@ class BasicShapes:
         glRotate(rotate_z, 0,0,1)
         
         # Draw the sphere with specified radius, smooth appearance with 32 slices and stacks
-        gluSphere(quadric, radius, 32, 32)
+        self.draw_centered_sphere(radius, 32, 32)
         
         glPopMatrix()  # Restore the previous matrix state
-        gluDeleteQuadric(quadric)  # Clean up the quadric object
 
-    def draw_animated_sphere(self, radius, position_x, position_z, rotate_x, rotate_z):
-        quadric = gluNewQuadric()  # Create a new quadric for the sphere
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
-        
+    def draw_animated_sphere(self, radius, position_x, position_z, rotate_x, rotate_z, lod_key=None):
         glPushMatrix()  # Save the current matrix
         glTranslatef(0.0, radius, 0.0)  # Translate to place sphere on the y = 0 plane
         
@@ -70,17 +69,57 @@ class BasicShapes:
         glRotate(rotate_z, 0,0,1)
         
         # Draw the sphere with specified radius, smooth appearance with 32 slices and stacks
-        gluSphere(quadric, radius, 32, 32)
+        self.draw_centered_sphere(radius, 32, 32, lod_key)
         
         glPopMatrix()  # Restore the previous matrix state
-        gluDeleteQuadric(quadric)  # Clean up the quadric object
+
+    # Draws a sphere centered on the current position (used by the other sphere functions and the light indicators)
+    # Every sphere with the same slices and stacks shares one unit sphere mesh that is scaled to the radius
+    def draw_centered_sphere(self, radius, slices=32, stacks=32, lod_key=None):
+        slices, stacks = self.level_of_detail("sphere", radius, slices, stacks, lod_key)
+        mesh = self.mesh_cache.get(("sphere", slices, stacks),
+                                   lambda: Mesh(*sphere_arrays(slices, stacks), GL_TRIANGLE_STRIP))
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        self.draw_mesh(mesh, transform=self.lod_transform(np.diag([radius, radius, radius, 1.0])))
+        glPopMatrix()
+
+    def lod_applies(self):
+        """
+        Whether the shapes drawn now get a level of detail: not baked scenery (it is seen from everywhere,
+        so it keeps full detail), nor shapes that aren't drawn (see skip_draws)
+        """
+        return self.lod is not None and self.recorder is None and not self.skip_draws
+
+    def level_of_detail(self, kind, radius, slices, stacks, lod_key=None):
+        """Fewer slices (and stacks, for spheres) for shapes that are small on screen"""
+        if not self.lod_applies():
+            return slices, stacks
+        level = self.lod.select(None if lod_key is None else (kind, lod_key), radius, slices)
+        if level == slices:
+            return slices, stacks
+        level_stacks = stacks if kind == "cylinder" else max(2, round(stacks * level / slices))
+        self.lod.record_saving(level, 2 * (slices * stacks - level * level_stacks))
+        return level, level_stacks
+
+    def lod_transform(self, local):
+        """
+        The modelview matrix for a shape drawn with local applied after level_of_detail() (local is the
+        transpose of the glScale/glRotate matrix, like the matrices OpenGL returns), worked out from the
+        matrix the LOD selection read, so the render queue doesn't read it back again. None if there is none.
+        """
+        if not self.lod_applies() or self.lod.modelview is None:
+            return None
+        return (local @ self.lod.modelview).astype(np.float32)
 
 
     # Draws a rectangle, with the following three paramates:
     # length is the distance in the x direction, width is in the z direction, and height is in the y direction
     def draw_rectangle(self, length, width, height):
-        glPushMatrix()
+        self.draw_cached_mesh(("rect", length, width, height),
+                              lambda: self.build_rectangle(length, width, height))
 
+    def build_rectangle(self, length, width, height):
         # Calculate half length and width sizes (for centering the pyramid on the x and z axes)
         half_length = length/2
         half_width = width/2
@@ -116,15 +155,7 @@ class BasicShapes:
             (0.0, 1.0)   # Top-left
         ]
 
-        # Draw the cube
-        glBegin(GL_QUADS)
-        for face in faces:
-            for i, vertex in enumerate(face):
-                glTexCoord2f(*tex_coords[i])  # Map texture coordinates
-                glVertex3fv(vertices[vertex])  # Define vertex
-        glEnd()
-
-        glPopMatrix()
+        return self.build_quads(vertices, faces, tex_coords, [0, height / 2, 0])
 
         """
         Visual repersentation with vertexes labled:
@@ -155,78 +186,13 @@ class BasicShapes:
         :param rows: Number of rows for grid.
         :param cols: Number of columns for grid.
         """
-        glPushMatrix()
+        self.draw_cached_mesh(("rect_grid", length, width, height, rows, cols),
+                              lambda: self.build_rectangle_with_grid(length, width, height, rows, cols))
 
-        # Half dimensions for centering
-        half_length = length / 2
-        half_width = width / 2
-
-        # Helper to draw one face as a grid
-        def draw_face(p1, p2, p3, p4, tex_coords):
-            """
-            Draws a single face of the rectangular prism.
-            :param p1, p2, p3, p4: Four corners of the face in counterclockwise order.
-            :param tex_coords: Texture coordinates for the four corners.
-            """
-            dx1 = (p2[0] - p1[0]) / cols
-            dy1 = (p2[1] - p1[1]) / cols
-            dz1 = (p2[2] - p1[2]) / cols
-
-            dx2 = (p4[0] - p1[0]) / rows
-            dy2 = (p4[1] - p1[1]) / rows
-            dz2 = (p4[2] - p1[2]) / rows
-
-            tx1, ty1 = tex_coords[1][0] - tex_coords[0][0], tex_coords[1][1] - tex_coords[0][1]
-            tx2, ty2 = tex_coords[3][0] - tex_coords[0][0], tex_coords[3][1] - tex_coords[0][1]
-
-            for i in range(rows):
-                glBegin(GL_TRIANGLE_STRIP)
-                for j in range(cols + 1):
-                    # Top vertex
-                    glTexCoord2f(tex_coords[0][0] + j * tx1 / cols, tex_coords[0][1] + (i + 1) * ty2 / rows)
-                    glVertex3f(
-                        p1[0] + j * dx1 + (i + 1) * dx2,
-                        p1[1] + j * dy1 + (i + 1) * dy2,
-                        p1[2] + j * dz1 + (i + 1) * dz2,
-                    )
-                    # Bottom vertex
-                    glTexCoord2f(tex_coords[0][0] + j * tx1 / cols, tex_coords[0][1] + i * ty2 / rows)
-                    glVertex3f(
-                        p1[0] + j * dx1 + i * dx2,
-                        p1[1] + j * dy1 + i * dy2,
-                        p1[2] + j * dz1 + i * dz2,
-                    )
-                glEnd()
-
-        # Vertices for the rectangular prism
-        vertices = [
-            [-half_length, 0, -half_width],       # Vertex 0
-            [half_length, 0, -half_width],        # Vertex 1
-            [half_length, height, -half_width],   # Vertex 2
-            [-half_length, height, -half_width],  # Vertex 3
-            [-half_length, 0, half_width],        # Vertex 4
-            [half_length, 0, half_width],         # Vertex 5
-            [half_length, height, half_width],    # Vertex 6
-            [-half_length, height, half_width]    # Vertex 7
-        ]
-
-        # Texture coordinates for a face
-        tex_coords = [
-            (0.0, 0.0),  # Bottom-left
-            (1.0, 0.0),  # Bottom-right
-            (1.0, 1.0),  # Top-right
-            (0.0, 1.0)   # Top-left
-        ]
-
-        # Draw each face of the rectangular prism
-        draw_face(vertices[0], vertices[1], vertices[2], vertices[3], tex_coords)  # Bottom
-        draw_face(vertices[4], vertices[5], vertices[6], vertices[7], tex_coords)  # Top
-        draw_face(vertices[0], vertices[4], vertices[7], vertices[3], tex_coords)  # Left
-        draw_face(vertices[1], vertices[5], vertices[6], vertices[2], tex_coords)  # Right
-        draw_face(vertices[3], vertices[2], vertices[6], vertices[7], tex_coords)  # Back
-        draw_face(vertices[0], vertices[1], vertices[5], vertices[4], tex_coords)  # Front
-
-        glPopMatrix()
+    def build_rectangle_with_grid(self, length, width, height, rows, cols):
+        # All six faces are generated with NumPy and joined into one triangle strip
+        vertices, indices = box_grid_arrays(length, width, height, rows, cols)
+        return Mesh(vertices, indices, GL_TRIANGLE_STRIP)
 
     
     def draw_plane_with_grid(self, length, width, rows, cols):
@@ -237,63 +203,13 @@ class BasicShapes:
         :param rows: Number of rows for the grid.
         :param cols: Number of columns for the grid.
         """
-        glPushMatrix()
+        self.draw_cached_mesh(("plane_grid", length, width, rows, cols),
+                              lambda: self.build_plane_with_grid(length, width, rows, cols))
 
-        # Half dimensions for centering
-        half_length = length / 2
-        half_width = width / 2
-
-        # Bottom-left and top-right corners of the plane
-        p1 = [-half_length, 0, -half_width]  # Bottom-left
-        p2 = [half_length, 0, -half_width]  # Bottom-right
-        p3 = [half_length, 0, half_width]   # Top-right
-        p4 = [-half_length, 0, half_width]  # Top-left
-
-        # Texture coordinates for a plane
-        tex_coords = [
-            (0.0, 0.0),  # Bottom-left
-            (1.0, 0.0),  # Bottom-right
-            (1.0, 1.0),  # Top-right
-            (0.0, 1.0)   # Top-left
-        ]
-
-        # Helper function to draw the grid
-        def draw_grid(p1, p2, p3, p4, tex_coords, rows, cols):
-            """
-            Draws a grid on the plane using triangle strips.
-            """
-            dx1 = (p2[0] - p1[0]) / cols
-            dz1 = (p2[2] - p1[2]) / cols
-
-            dx2 = (p4[0] - p1[0]) / rows
-            dz2 = (p4[2] - p1[2]) / rows
-
-            tx1, tz1 = tex_coords[1][0] - tex_coords[0][0], tex_coords[1][1] - tex_coords[0][1]
-            tx2, tz2 = tex_coords[3][0] - tex_coords[0][0], tex_coords[3][1] - tex_coords[0][1]
-
-            for i in range(rows):
-                glBegin(GL_TRIANGLE_STRIP)
-                for j in range(cols + 1):
-                    # Top vertex
-                    glTexCoord2f(tex_coords[0][0] + j * tx1 / cols, tex_coords[0][1] + (i + 1) * tz2 / rows)
-                    glVertex3f(
-                        p1[0] + j * dx1 + (i + 1) * dx2,
-                        p1[1],
-                        p1[2] + j * dz1 + (i + 1) * dz2,
-                    )
-                    # Bottom vertex
-                    glTexCoord2f(tex_coords[0][0] + j * tx1 / cols, tex_coords[0][1] + i * tz2 / rows)
-                    glVertex3f(
-                        p1[0] + j * dx1 + i * dx2,
-                        p1[1],
-                        p1[2] + j * dz1 + i * dz2,
-                    )
-                glEnd()
-
-        # Draw the plane
-        draw_grid(p1, p2, p3, p4, tex_coords, rows, cols)
-
-        glPopMatrix()
+    def build_plane_with_grid(self, length, width, rows, cols):
+        # The plane faces up (+y), rotate it to face another way
+        vertices, indices = plane_grid_arrays(length, width, rows, cols)
+        return Mesh(vertices, indices, GL_TRIANGLE_STRIP)
 
 
 
@@ -308,9 +224,33 @@ class BasicShapes:
         - height: Height of the cube (Y-axis)
         - face_textures: Optional list of texture IDs, one for each face in the order:
         [bottom, back, top, front, left, right]. If None, no textures are applied.
+        If the six textures were packed into one atlas (see Textures.create_atlas), the cube is drawn
+        with the atlas in one draw call.
         """
-        glPushMatrix()
+        atlas = textures.atlas_of(face_textures) if face_textures and len(face_textures) == 6 else None
+        if atlas is not None:
+            atlas_name, rects = atlas
+            textures.set_texture(atlas_name)
+            self.draw_cached_mesh(("cube", length, width, height, rects),
+                                  lambda: self.build_cube(length, width, height, rects))
+            return
 
+        mesh = self.mesh_cache.get(("cube", length, width, height),
+                                   lambda: self.build_cube(length, width, height))
+
+        if not face_textures:
+            self.draw_mesh(mesh)
+            return
+
+       # Draw the cube with optional textures for each face
+        for i, (first, count) in enumerate(mesh.ranges):
+            # Bind the texture for the current face
+            if i < len(face_textures):
+              textures.set_texture(face_textures[i])
+            self.draw_mesh(mesh, first, count)
+
+    def build_cube(self, length, width, height, face_rects=None):
+        # face_rects: optional atlas rectangle of each face's texture (see atlas.py)
         # Calculate half length and width sizes (for centering the cube)
         half_length = length / 2
         half_width = width / 2
@@ -342,20 +282,7 @@ class BasicShapes:
             (0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)
         ]
 
-       # Draw the cube with optional textures for each face
-        for i, face in enumerate(faces):
-            # Bind the texture for the current face
-            if face_textures and i < len(face_textures):
-              textures.set_texture(face_textures[i])
-
-            glBegin(GL_QUADS)
-            for j, vertex in enumerate(face):
-                glTexCoord2f(*tex_coords[j])  # Texture coordinates for the vertex
-                glVertex3fv(vertices[vertex])  # Vertex position
-            glEnd()
-
-
-        glPopMatrix()
+        return self.build_quads(vertices, faces, tex_coords, [0, height / 2, 0], face_rects)
 
         
     # Function to generate a standard pyramid
@@ -365,9 +292,12 @@ class BasicShapes:
 
     # Function to generate a pyramid with a rectangular base and texture
     def draw_rectangular_pyramid(self, base_width, base_length, height):
-        glPushMatrix()
-        glEnable(GL_TEXTURE_2D)  # Enable texture mapping
+        set_texturing(True)  # Enable texture mapping
+        self.draw_cached_mesh(("pyramid", base_width, base_length, height),
+                              lambda: self.build_rectangular_pyramid(base_width, base_length, height))
+        set_texturing(False)  # Disable texture mapping
 
+    def build_rectangular_pyramid(self, base_width, base_length, height):
         # Calculate half base size (for centering the pyramid on the x and z axes)
         half_width = base_width / 2.0
         half_length = base_length / 2.0
@@ -385,51 +315,38 @@ class BasicShapes:
         ]
         
         # Define the indices for the triangles (4 sides + base)
-        side_indices = [
+        triangles = [
             # Sides (4 triangles)
             [0, 4, 1],  # Triangle 1
             [1, 4, 2],  # Triangle 2
             [2, 4, 3],  # Triangle 3
             [3, 4, 0],  # Triangle 4
-        ]
-        
-        base_indices = [
+
             # Base (rectangle split into two triangles)
             [0, 1, 2],  # Triangle 5
             [0, 2, 3]   # Triangle 6
         ]
 
         # Define texture coordinates for the pyramid
-        side_tex_coords = [
+        tex_coords = [
             [0.0, 0.0], [0.5, 1.0], [1.0, 0.0],  # Texture for each side
             [0.0, 0.0], [0.5, 1.0], [1.0, 0.0],
             [0.0, 0.0], [0.5, 1.0], [1.0, 0.0],
             [0.0, 0.0], [0.5, 1.0], [1.0, 0.0],
-        ]
-
-        base_tex_coords = [
             [0.0, 0.0], [1.0, 0.0], [1.0, 1.0],  # Texture for base triangle 1
             [0.0, 0.0], [1.0, 1.0], [0.0, 1.0],  # Texture for base triangle 2
         ]
 
-        # Draw the sides of the pyramid
-        glBegin(GL_TRIANGLES)
-        for i, face in enumerate(side_indices):
-            for j, vertex in enumerate(face):
-                glTexCoord2f(side_tex_coords[i * 3 + j][0], side_tex_coords[i * 3 + j][1])
-                glVertex3fv(vertices[vertex])
-        glEnd()
-
-        # Draw the base of the pyramid
-        glBegin(GL_TRIANGLES)
-        for i, face in enumerate(base_indices):
-            for j, vertex in enumerate(face):
-                glTexCoord2f(base_tex_coords[i * 3 + j][0], base_tex_coords[i * 3 + j][1])
-                glVertex3fv(vertices[vertex])
-        glEnd()
+        # Every triangle gets its own three vertices so it can have a flat normal
+        center = [0.0, height / 4, 0.0]
+        mesh_vertices = []
+        for i, triangle in enumerate(triangles):
+            p1, p2, p3 = (vertices[vertex] for vertex in triangle)
+            normal = self.face_normal(p1, p2, p3, center)
+            for j, vertex in enumerate(triangle):
+                mesh_vertices.append(vertices[vertex] + normal + tex_coords[i * 3 + j])
 
-        glDisable(GL_TEXTURE_2D)  # Disable texture mapping
-        glPopMatrix()
+        return Mesh(mesh_vertices, range(len(mesh_vertices)), GL_TRIANGLES)
 
 
         """
@@ -450,48 +367,36 @@ class BasicShapes:
                            
         """
 
-    def draw_cone(self, base_radius, height, slices=32, stacks=1):
-        glPushMatrix()
-        glRotatef(270, 1.0, 0.0, 0.0)  # Rotate the cone to be vertical along the Y-axis
-        quadric = gluNewQuadric()
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
-
-        gluCylinder(quadric, base_radius, 0.0, height, slices, stacks)  # Create the cone
-        gluDeleteQuadric(quadric)
-        glPopMatrix()
 
-    def draw_cylinder(self, radius, height, slices=32, stacks=1):
-        glPushMatrix()
-        glRotatef(270, 1.0, 0.0, 0.0)  # Rotate the cylinder to be vertical along the Y-axis
-        quadric = gluNewQuadric()
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
+    def draw_cone(self, base_radius, height, slices=32, stacks=1, lod_key=None):
+        self.draw_adjustable_cylinder(base_radius, 0.0, height, slices, stacks, lod_key)  # Create the cone
 
-        gluCylinder(quadric, radius, radius, height, slices, stacks)  # Create the cylinder
-        gluDeleteQuadric(quadric)
-        glPopMatrix()
+    def draw_cylinder(self, radius, height, slices=32, stacks=1, lod_key=None):
+        self.draw_adjustable_cylinder(radius, radius, height, slices, stacks, lod_key)  # Create the cylinder
+
+    def draw_adjustable_cylinder(self, bottom_radius, top_radius, height, slices=32, stacks=1, lod_key=None):
+        # Cylinders with the same taper (top/bottom ratio) share one mesh that is scaled to size
+        scale = max(bottom_radius, top_radius)
+        if scale == 0:
+            return
+        bottom = round(bottom_radius / scale, 6)
+        top = round(top_radius / scale, 6)
+        slices, stacks = self.level_of_detail("cylinder", scale, slices, stacks, lod_key)
+        mesh = self.mesh_cache.get(("cylinder", slices, stacks, bottom, top),
+                                   lambda: Mesh(*cylinder_arrays(slices, stacks, bottom, top), GL_TRIANGLE_STRIP))
 
-    def draw_adjustable_cylinder(self, bottom_radius, top_radius, height, slices=32, stacks=1):
         glPushMatrix()
         glRotatef(270, 1.0, 0.0, 0.0)  # Rotate the cylinder to be vertical along the Y-axis
-        quadric = gluNewQuadric()
-        gluQuadricDrawStyle(quadric, GLU_FILL)
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluQuadricTexture(quadric, GL_TRUE)
-
-        gluCylinder(quadric, bottom_radius, top_radius, height, slices, stacks)  # Create the cylinder
-        gluDeleteQuadric(quadric)
+        glScalef(scale, scale, height)
+        self.draw_mesh(mesh, transform=self.lod_transform(np.diag([scale, scale, height, 1.0]) @ CYLINDER_ROTATION))
         glPopMatrix()
 
     def draw_white_rectangle(self, length, width, height):
 	
-        glDisable(GL_LIGHTING)  # Disable lighting for the solid colored rectangle
-        glColor3f(1.0, 1.0, 1.0)  # Set the color to white
+        set_lighting(False)  # Disable lighting for the solid colored rectangle (through the render queue if active)
+        set_color(1.0, 1.0, 1.0)  # Set the color to white
         self.draw_rectangle(length, width, height)  # Draw the rectangle
-        glEnable(GL_LIGHTING)  # Re-enable lighting
+        set_lighting(True)  # Re-enable lighting
 
     #=======================================
     # Prism functions
@@ -501,28 +406,30 @@ class BasicShapes:
         glPushMatrix()
 
         glTranslatef(0.0, height / 2, 0.0)  # Center the prism so it rests on the ground at y=0
+        self.draw_cached_mesh(("prism", sides, height, side_length),
+                              lambda: self.build_prism(sides, height, side_length))
+
+        glPopMatrix()
 
+    def build_prism(self, sides, height, side_length):
         # Generate the vertices and faces based on the number of sides, height, and side length
         vertices = self.generate_prism_vertices(sides, height, side_length)
         lat_faces = self.generate_prism_lateral_faces(sides)
         bases = self.generate_prism_bases(sides)
 
-        # Draw the lateral faces
-        glBegin(GL_QUADS)
-        for face in lat_faces:
+        # Each face gets its own vertices so it can have a flat normal, and is split into a triangle fan
+        center = [0, 0, 0]
+        mesh_vertices = []
+        indices = []
+        for face in lat_faces + bases:
+            normal = self.face_normal(vertices[face[0]], vertices[face[1]], vertices[face[-1]], center)
+            first = len(mesh_vertices)
             for vertex in face:
-                glVertex3fv(vertices[vertex])
-        glEnd()
+                mesh_vertices.append(vertices[vertex] + normal + [0.0, 0.0])
+            for k in range(1, len(face) - 1):
+                indices.extend([first, first + k, first + k + 1])
 
-        # Draw the bases
-        for base in bases:
-            glBegin(GL_POLYGON)
-            for vertex in base:
-                glVertex3fv(vertices[vertex])
-            glEnd()
-
-
-        glPopMatrix()
+        return Mesh(mesh_vertices, indices, GL_TRIANGLES)
 
 
 
@@ -571,7 +478,64 @@ class BasicShapes:
 
         return bases
 
-        
+
+    #=======================================
+    # Mesh functions
+    #=======================================
+
+    # Looks up (or builds) a mesh in the cache and draws it with a single draw call
+    def draw_cached_mesh(self, key, build, first=0, count=None):
+        mesh = self.mesh_cache.get(key, build)
+        self.draw_mesh(mesh, first, count)
+        return mesh
+
+    # Every shape is drawn through here, so a recorder (see StaticScene) or the active RenderQueue
+    # can capture the geometry with the current transform instead of drawing it
+    # transform is the current modelview matrix when the caller already knows it (see lod_transform)
+    def draw_mesh(self, mesh, first=0, count=None, transform=None):
+        if self.skip_draws:
+            return
+        recorder = self.recorder or RenderQueue.active
+        if recorder is not None and transform is not None:
+            recorder.record(mesh, first, count, transform)
+        elif recorder is not None:
+            recorder.record(mesh, first, count)
+        else:
+            mesh.draw(first, count)
+
+    # Builds a mesh out of quad faces (four vertex indices each), with a flat normal per face
+    # The index range of every face is stored in mesh.ranges, in the same order as faces
+    # With face_rects, the texture coordinates of each face are moved into its rectangle of an atlas
+    def build_quads(self, vertices, faces, tex_coords, center, face_rects=None):
+        mesh_vertices = []
+        indices = []
+        ranges = []
+        for f, face in enumerate(faces):
+            normal = self.face_normal(vertices[face[0]], vertices[face[1]], vertices[face[3]], center)
+            face_tex_coords = tex_coords if face_rects is None else remap_tex_coords(tex_coords, face_rects[f])
+            first = len(mesh_vertices)
+            for i, vertex in enumerate(face):
+                mesh_vertices.append(list(vertices[vertex]) + normal + list(face_tex_coords[i]))
+            ranges.append((len(indices), 6))
+            indices.extend([first, first + 1, first + 2, first, first + 2, first + 3])
+        return Mesh(mesh_vertices, indices, GL_TRIANGLES, ranges)
+
+    # Returns the unit normal of the face spanned by p1->p2 and p1->p3, pointing away from center
+    def face_normal(self, p1, p2, p3, center):
+        ax, ay, az = p2[0] - p1[0], p2[1] - p1[1], p2[2] - p1[2]
+        bx, by, bz = p3[0] - p1[0], p3[1] - p1[1], p3[2] - p1[2]
+        normal = [ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx]
+        length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
+        if length == 0:
+            return [0.0, 1.0, 0.0]  # Flat face (e.g. a rectangle with no height)
+        normal = [n / length for n in normal]
+
+        # Flip the normal if it points towards the center of the shape
+        outward = [p1[i] - center[i] for i in range(3)]
+        if sum(normal[i] * outward[i] for i in range(3)) < 0:
+            normal = [-n for n in normal]
+        return normal
+
     #=======================================
     # Coordinate frame (To help with creating models)
     #=======================================
@@ -0,0 +1,511 @@
+"""
+Benchmarks for the scene, none of which need a display.
+
+Everything is reported as a flat list of named metrics ("physics.break_150_balls.steps_per_second",
+"meshes.sphere.build_ms", ...). Whole frames of Room.display() are timed in a separate process
+with an off-screen software OpenGL context (see headless_gl.py); if that process can't start (no
+EGL, missing texture files) the frame metrics are left out and the reason is printed.
+
+Metrics ending in "per_second" are better when larger, metrics ending in "_ms", "_us" or "seconds"
+when smaller; other numbers (pair counts, events per shot) are only informative. A compare run
+flags every timing that got worse than the baseline by more than the threshold.
+
+Run from the project folder:
+python benchmarks.py                                     # Print the results
+python benchmarks.py --quick --output results.json       # Smaller sizes, saved with machine and commit info
+python benchmarks.py --compare baseline.json             # Run, then flag regressions against a baseline
+python benchmarks.py --compare baseline.json results.json --threshold 0.2   # Compare two saved runs
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import random
+import time
+import numpy as np
+from OpenGL.GL import GL_TRIANGLE_STRIP
+from collision import Collision, CollisionGrid
+from physics import PoolPhysics, PHYSICS_DT, BALL_RADIUS, TABLE_LENGTH, TABLE_WIDTH, SHOT_SPEED, DEFAULT_LAYOUT
+from event_sim import EventSimulator
+from shot_analysis import simulate_shots
+from table_set import TableSet
+from basic_shapes import BasicShapes
+from mesh_cache import Mesh
+from mesh_generator import sphere_arrays, cylinder_arrays
+from functools import partial
+from textures import Textures
+from texture_cache import TextureCache
+from texture_manager import TextureManager
+from mipmaps import build_mipmaps
+from utils import Point
+
+# Frames drawn before timing starts (the first frames upload the meshes), and frames timed
+WARMUP_FRAMES = 10
+TIMED_FRAMES = 100
+
+DEFAULT_THRESHOLD = 0.1  # Slow-down (as a fraction) reported as a regression
+
+
+#==============================
+# Helpers
+#==============================
+
+def time_per_call(function, calls):
+    """Runs function() calls times and returns the average time per call in seconds"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+#==============================
+# Collision benchmarks
+#==============================
+
+def random_colliders(count, seed=0):
+    """Creates count small boxes spread out so every box has roughly the same number of neighbours"""
+    rng = random.Random(seed)
+    side = 4 * count ** 0.5  # Grow the area with the number of boxes to keep density constant
+    return [Collision(rng.uniform(0.5, 3), rng.uniform(0.5, 3), rng.uniform(-side/2, side/2), rng.uniform(-side/2, side/2))
+            for _ in range(count)], side
+
+
+def benchmark_collision_queries(counts=(10, 1000, 100000), queries=10000):
+    """Times point queries against the collision grid and against a plain list scan (per query, and queries per second)"""
+    results = []
+    for count in counts:
+        colliders, side = random_colliders(count)
+        grid = CollisionGrid()
+        for collider in colliders:
+            grid.add(collider)
+
+        rng = random.Random(1)
+        points = [Point(rng.uniform(-side/2, side/2), 0, rng.uniform(-side/2, side/2)) for _ in range(queries)]
+        points_iter = iter(points * 2)
+        grid_time = time_per_call(lambda: grid.point_inside(next(points_iter)), queries)
+
+        # The old approach: scan every box (fewer queries, since it is slow for large counts)
+        scan_queries = max(1, min(queries, 10**7 // count))
+        points_iter = iter(points * 2)
+        scan_time = time_per_call(lambda: any(c.pointInside(p) for p in [next(points_iter)] for c in colliders), scan_queries)
+
+        results.append({"colliders": count, "grid_query_us": grid_time * 1e6, "list_scan_query_us": scan_time * 1e6,
+                        "grid_queries_per_second": 1 / grid_time, "list_scan_queries_per_second": 1 / scan_time})
+    return results
+
+
+#==============================
+# Ball physics benchmarks
+#==============================
+
+def random_table(count, seed=0):
+    """A layout of count moving balls on a table that grows with count (about 1 ball per 2 square feet)"""
+    rng = np.random.default_rng(seed)
+    length = 2 * (count ** 0.5)
+    width = length / 2
+    layout = np.zeros((count, 4))
+    layout[:, 0] = rng.uniform(-length / 2 + BALL_RADIUS, length / 2 - BALL_RADIUS, count)
+    layout[:, 1] = rng.uniform(-width / 2 + BALL_RADIUS, width / 2 - BALL_RADIUS, count)
+    velocities = rng.normal(0, 5, (count, 2))
+    return layout, velocities, length, width
+
+
+def original_contact_loop(simulator):
+    """
+    The collision test the scene used before the simulator: a math.dist call for every pair of balls,
+    every frame (only the test, not the old collision response). Returns the number of touching pairs.
+    """
+    positions = simulator.positions.tolist()
+    reach = 2 * simulator.radius
+    touching = 0
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            if math.dist(positions[i], positions[j]) < reach:
+                touching += 1
+    return touching
+
+
+def benchmark_ball_collisions(counts=(16, 1000, 5000), steps=20):
+    """
+    Times the search for the next event of the simulator the game uses (EventSimulator) with the sweep
+    and prune broad phase and with the all pairs test, the original per-pair loop on the same balls,
+    and a whole frame (advance) with sweep and prune
+    """
+    results = []
+    for count in counts:
+        layout, velocities, length, width = random_table(count)
+        result = {"balls": count}
+
+        # The original loop and the all pairs test are slow for big tables, so they run fewer times
+        simulator = EventSimulator(layout, length=length, width=width)
+        loop_calls = max(1, min(steps, 10**6 // count ** 2))
+        result["original_loop_step_ms"] = time_per_call(lambda: original_contact_loop(simulator), loop_calls) * 1e3
+        result["original_loop_pairs"] = count * (count - 1) // 2
+        for broad_phase in ("sweep_and_prune", "all_pairs"):
+            simulator = EventSimulator(layout, length=length, width=width, broad_phase=broad_phase)
+            simulator.velocities[:] = velocities
+            simulator.wake()
+            calls = loop_calls if broad_phase == "all_pairs" else steps
+            result[broad_phase + "_event_ms"] = time_per_call(simulator.next_event, calls) * 1e3
+            result[broad_phase + "_pairs"] = simulator.pairs_tested
+
+        events = []
+        simulator = EventSimulator(layout, length=length, width=width)
+        simulator.velocities[:] = velocities
+        simulator.wake()
+        result["sweep_and_prune_step_ms"] = time_per_call(
+            lambda: events.append(simulator.advance(PHYSICS_DT)), steps) * 1e3
+        result["events_per_step"] = sum(events) / len(events)
+        results.append(result)
+    return results
+
+
+def benchmark_sleeping(count=5000, awake_fractions=(1.0, 0.1, 0.01, 0.0), steps=20):
+    """Time per frame of EventSimulator.advance when only some of the balls are moving (the rest are asleep)"""
+    layout, velocities, length, width = random_table(count)
+    rng = np.random.default_rng(1)
+    results = []
+    for fraction in awake_fractions:
+        simulator = EventSimulator(layout, length=length, width=width)
+        moving = rng.random(count) < fraction
+        simulator.velocities[moving] = velocities[moving]
+        simulator.wake()
+        step_time = time_per_call(lambda: simulator.advance(PHYSICS_DT), steps)
+        results.append({"balls": count, "awake_fraction": fraction, "step_ms": step_time * 1e3})
+    return results
+
+
+def rack_layout(count):
+    """The cue ball and a triangle rack of count - 1 balls, on a table made big enough for the rack"""
+    rows = 1
+    while rows * (rows + 1) // 2 < count - 1:
+        rows += 1
+    spacing = 2 * BALL_RADIUS * 1.01  # A small gap so the rack starts at rest
+    width = max(TABLE_WIDTH, 2 * rows * spacing)
+    length = max(TABLE_LENGTH, 2 * width)
+
+    layout = [(length / 4 - 1, 0, 0, 0)]  # A foot in front of the rack so it breaks in the first steps
+    for row in range(rows):
+        for column in range(row + 1):
+            if len(layout) < count:
+                layout.append((length / 4 + row * spacing * 0.866, (column - row / 2) * spacing, 0, 0))
+    return layout, length, width
+
+
+def benchmark_break(counts=(6, 16, 150, 1500), steps=120):
+    """Physics steps per second right after the cue ball breaks a rack (every collision happens here)"""
+    results = []
+    for count in counts:
+        layout, length, width = rack_layout(count)
+        physics = PoolPhysics(layout, length=length, width=width)
+        physics.shoot(0, 0)
+        step_time = time_per_call(lambda: physics.step(PHYSICS_DT), steps)
+        results.append({"balls": count, "steps_per_second": 1 / step_time,
+                        "awake_balls": int(physics.awake.sum())})
+    return results
+
+
+def benchmark_shot(angles=range(0, 360, 15)):
+    """Resolves the same shots event by event and in fixed steps, and compares the work done"""
+    events = steps = 0
+    start = time.perf_counter()
+    for angle in angles:
+        simulator = EventSimulator()
+        simulator.shoot(0, angle)
+        events += simulator.run()
+    event_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for angle in angles:
+        physics = PoolPhysics()
+        physics.shoot(0, angle)
+        while physics.is_moving():
+            physics.step(PHYSICS_DT)
+            steps += 1
+    step_time = time.perf_counter() - start
+
+    shots = len(angles)
+    return {"shots": shots, "events_per_shot": events / shots, "event_shot_ms": event_time / shots * 1e3,
+            "steps_per_shot": steps / shots, "fixed_step_shot_ms": step_time / shots * 1e3}
+
+
+def benchmark_shot_throughput(sizes=(1, 10, 100, 1000, 10000, 100000), processes=None):
+    """Shots per second of simulate_shots() for each batch size (the 100k batch takes minutes on one CPU)"""
+    rng = random.Random(2)
+    results = []
+    for size in sizes:
+        shots = [(rng.uniform(0, 360), rng.uniform(0.25, 1.5) * SHOT_SPEED) for _ in range(size)]
+        start = time.perf_counter()
+        simulate_shots(DEFAULT_LAYOUT, shots, processes=processes)
+        elapsed = time.perf_counter() - start
+        results.append({"shots": size, "seconds": elapsed, "shots_per_second": size / elapsed})
+    return results
+
+
+def benchmark_table_set(counts=(1, 10, 100, 1000, 10000), steps=60):
+    """Time per step of a TableSet where every table was just shot (one process, so one core)"""
+    rng = np.random.default_rng(3)
+    results = []
+    for count in counts:
+        tables = TableSet(count)
+        tables.shoot(np.arange(count), 0, rng.uniform(0, 360, count))
+        step_time = time_per_call(lambda: tables.step(PHYSICS_DT), steps)
+        results.append({"tables": count, "step_ms": step_time * 1e3, "table_steps_per_second": count / step_time})
+    return results
+
+
+#==============================
+# Scene benchmarks
+#==============================
+
+def benchmark_meshes(repeats=20):
+    """Time to build the mesh of each BasicShapes primitive (CPU only: uploading it isn't included)"""
+    shapes = BasicShapes()
+    builders = {
+        "rectangle": lambda: shapes.build_rectangle(2, 1, 0.5),
+        "rectangle_with_grid": lambda: shapes.build_rectangle_with_grid(7.7, 3.7, 1, 8, 20),
+        "plane_with_grid": lambda: shapes.build_plane_with_grid(20, 20, 30, 30),
+        "cube": lambda: shapes.build_cube(1, 1, 1),
+        "rectangular_pyramid": lambda: shapes.build_rectangular_pyramid(1, 1, 1),
+        "prism": lambda: shapes.build_prism(6, 1, 1),
+        "sphere": lambda: Mesh(*sphere_arrays(32, 32), GL_TRIANGLE_STRIP),
+        "cylinder": lambda: Mesh(*cylinder_arrays(32, 1), GL_TRIANGLE_STRIP),
+    }
+    return {name: time_per_call(build, repeats) * 1e3 for name, build in builders.items()}
+
+
+def benchmark_textures(repeats=3):
+    """
+    Time to read and decode each image Textures loads, to build the mipmaps of a 1024 x 1024 image, and
+    to load all of them with their mipmaps one after another, through the TextureManager the room loads
+    them with, and through it from a warm TextureCache; returns the times (ms) and the files missing
+    """
+    results, images, missing = {}, [], []
+    for attribute, file_name, crop_dimensions in Textures.image_files:
+        if not os.path.exists(file_name):
+            missing.append(file_name)
+            continue
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        results[name] = time_per_call(lambda: Textures.read_image(file_name, crop_dimensions, mipmaps=False),
+                                      repeats) * 1e3
+        images.append((file_name, crop_dimensions))
+
+    image = np.random.default_rng(4).integers(0, 256, (1024, 1024, 3), dtype=np.uint8)
+    results["mipmaps_1024"] = time_per_call(lambda: build_mipmaps(image), repeats) * 1e3
+
+    results["all_serial"] = time_per_call(lambda: [Textures.read_image(*image) for image in images], repeats) * 1e3
+    results["all_parallel"] = time_per_call(lambda: load_with_manager(images), repeats) * 1e3
+    with tempfile.TemporaryDirectory() as directory:
+        load_with_manager(images, TextureCache(directory))  # Warm the cache
+        results["all_cached"] = time_per_call(lambda: load_with_manager(images, TextureCache(directory)), repeats) * 1e3
+    return results, missing
+
+
+def load_with_manager(images, cache=None):
+    """Loads (file name, crop dimensions) images the way Textures does, with the upload left out (no OpenGL)"""
+    manager = TextureManager(lambda texture_name, levels, nearest: None)
+    for index, (file_name, crop_dimensions) in enumerate(images):
+        manager.register(index, partial(Textures.read_image, file_name, crop_dimensions, cache), label=file_name)
+    manager.request_all()
+    manager.finish_loading()
+    manager.shutdown()
+
+
+def benchmark_frames(frames=TIMED_FRAMES):
+    """Times Room.display() in a new process with a software OpenGL context; returns the result or the error"""
+    environment = dict(os.environ, PYOPENGL_PLATFORM="egl", LIBGL_ALWAYS_SOFTWARE="1")
+    environment.setdefault("EGL_PLATFORM", "surfaceless")
+    command = [sys.executable, os.path.abspath(__file__), "--frame-worker", str(frames)]
+    completed = subprocess.run(command, env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines() or ["exit status %d" % completed.returncode]
+        return {"error": lines[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def frame_worker(frames):
+    """Runs in the process started by benchmark_frames(): prints the frame times as one line of JSON"""
+    import headless_gl
+    headless_gl.use_egl()
+    headless_gl.create_context(1200, 800)
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from room import Room
+
+    start = time.perf_counter()
+    room = Room(seed=0, window=False)
+    setup_time = time.perf_counter() - start
+    texture_time = room.textures.total_load_time
+    room.components.config_balls()
+    room.components.shoot_cue(-6.84)  # Keep the balls moving while the frames are timed
+
+    def frame():
+        room.update()
+        room.display()
+        glFinish()  # Count the time the software renderer spends drawing
+
+    frame()
+    room.textures.manager.finish_loading()  # Textures load when first used: time the frames with all of them
+    for _ in range(WARMUP_FRAMES):
+        frame()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(frames):
+        frame()
+    wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    print(json.dumps({"renderer": glGetString(GL_RENDERER).decode(), "frames": frames,
+                      "setup_seconds": setup_time, "texture_load_seconds": texture_time,
+                      "texture_memory_mb": room.textures.manager.resident_bytes / 2**20, "cpu_ms": cpu_time / frames * 1e3,
+                      "wall_ms": wall_time / frames * 1e3, "frames_per_second": frames / wall_time}))
+    room.textures.shutdown()
+
+
+#==============================
+# Suite
+#==============================
+
+def add_results(metrics, prefix, results, key):
+    """Adds a list of result dicts as metrics named prefix_<key value>.<field>"""
+    for result in results:
+        for field, value in result.items():
+            if field != key:
+                metrics["%s_%s.%s" % (prefix, result[key], field)] = value
+
+
+def run_suite(quick=False):
+    """Runs every benchmark and returns a dict of metric name -> value, and notes on what was skipped"""
+    metrics, notes = {}, []
+
+    print("Collision queries", file=sys.stderr)
+    add_results(metrics, "collision.colliders", benchmark_collision_queries(
+        (10, 1000) if quick else (10, 1000, 100000), 2000 if quick else 10000), "colliders")
+
+    print("Ball physics", file=sys.stderr)
+    add_results(metrics, "physics.break", benchmark_break(steps=30 if quick else 120), "balls")
+    add_results(metrics, "physics.balls", benchmark_ball_collisions((16, 1000) if quick else (16, 1000, 5000)),
+                "balls")
+    add_results(metrics, "physics.sleeping_5000_balls.awake_percent",
+                [{"awake_percent": round(result["awake_fraction"] * 100), "step_ms": result["step_ms"]}
+                 for result in benchmark_sleeping()], "awake_percent")
+    for field, value in benchmark_shot().items():
+        metrics["physics.shot." + field] = value
+    add_results(metrics, "physics.tables", benchmark_table_set((1, 100, 1000) if quick else (1, 10, 100, 1000, 10000)),
+                "tables")
+    add_results(metrics, "shots.batch", benchmark_shot_throughput((1, 100) if quick else (1, 100, 1000, 10000, 100000)),
+                "shots")
+
+    print("Meshes and textures", file=sys.stderr)
+    for name, build_time in benchmark_meshes().items():
+        metrics["meshes.%s.build_ms" % name] = build_time
+    decode_times, missing = benchmark_textures()
+    for name, decode_time in decode_times.items():
+        metrics["textures.%s.%s_ms" % (name, "build" if name.startswith("mipmaps") else "decode")] = decode_time
+    notes += ["texture file missing: " + file_name for file_name in missing]
+
+    print("Frames", file=sys.stderr)
+    frame = benchmark_frames(20 if quick else TIMED_FRAMES)
+    if "error" in frame:
+        notes.append("frames skipped: " + frame["error"])
+    else:
+        notes.append("frames drawn with " + frame.pop("renderer"))
+        for field, value in frame.items():
+            metrics["frame.display." + field] = value
+    return metrics, notes
+
+
+def machine_info():
+    return {"platform": platform.platform(), "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(), "python": platform.python_version(), "numpy": np.__version__}
+
+
+def commit_info():
+    """The commit benchmarked, and whether the working tree had changes"""
+    def git(*arguments):
+        try:
+            return subprocess.run(("git",) + arguments, capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def better_direction(name):
+    """1 if a larger value of the metric is better, -1 if a smaller one is, 0 if it isn't a timing"""
+    if name.endswith("per_second"):
+        return 1
+    if name.endswith(("_ms", "_us", "seconds")):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """(name, baseline value, current value, slow-down) of every timing in both runs, and the regressions"""
+    rows, regressions = [], []
+    for name in sorted(set(baseline["metrics"]) & set(current["metrics"])):
+        direction = better_direction(name)
+        old, new = baseline["metrics"][name], current["metrics"][name]
+        if direction == 0 or not old or not new:
+            continue
+        # Slow-down as a fraction: time taken goes up, or throughput goes down
+        slowdown = new / old - 1 if direction < 0 else old / new - 1
+        rows.append((name, old, new, slowdown))
+        if slowdown > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_metrics(results):
+    for name, value in sorted(results["metrics"].items()):
+        print("  %-55s %14.4f" % (name, value))
+    for note in results["notes"]:
+        print("  (%s)" % note)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the physics, meshes, textures and frames")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="baseline results, and optionally the results to compare (otherwise runs the suite)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slow-down reported as a regression (0.1 = 10%%)")
+    parser.add_argument("--frame-worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.frame_worker:
+        frame_worker(args.frame_worker)
+        return
+
+    if args.compare and len(args.compare) > 1:
+        with open(args.compare[1]) as file:
+            results = json.load(file)
+    else:
+        metrics, notes = run_suite(args.quick)
+        results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine_info(),
+                   "commit": commit_info(), "quick": args.quick, "metrics": metrics, "notes": notes}
+        print("Results (commit %s%s)" % (results["commit"]["commit"], ", with changes" if results["commit"]["dirty"] else ""))
+        print_metrics(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            baseline = json.load(file)
+        rows, regressions = compare(baseline, results, args.threshold)
+        print("Compared with %s (commit %s)" % (args.compare[0], baseline["commit"]["commit"]))
+        for name, old, new, slowdown in rows:
+            print("  %-55s %14.4f -> %14.4f %+7.1f%%%s"
+                  % (name, old, new, slowdown * 100, "  REGRESSION" if name in regressions else ""))
+        print("%d regressions beyond %.0f%%" % (len(regressions), args.threshold * 100))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from utils import Point
+import math
 class Collision:
     def __init__(self, width, depth, xPos, zPos):
         self.leftBound = xPos - (width/2)
@@ -6,11 +7,90 @@ class Collision:
         self.frontBound = zPos + (depth/2)
         self.backBound = zPos - (depth/2)
 
-    
+
     def pointInside(self, point):
         if (point.x > self.leftBound and point.x < self.rightBound) and (point.z > self.backBound and point.z < self.frontBound):
             return True
         else:
             return False
-    
-    
\ No newline at end of file
+
+
+class CollisionGrid:
+    """
+    A uniform grid of collision boxes on the xz plane.
+
+    Colliders are registered once (when the scene is built) and stored in every
+    grid cell they overlap, so a point query only has to look at the boxes in
+    the single cell that contains the point, no matter how many boxes exist.
+
+    Example usage:
+    colliders = CollisionGrid()
+    table = colliders.add(Collision(8, 4, 0, 0))
+    colliders.point_inside(camera.collisionPoint)
+    colliders.remove(table)
+    """
+
+    def __init__(self, cell_size=2.0):
+        self.cell_size = cell_size
+        self.cells = {}      # (cell_x, cell_z) -> list of colliders in that cell
+        self.colliders = {}  # collider -> list of cells it was added to
+
+    def __len__(self):
+        return len(self.colliders)
+
+    def __contains__(self, collider):
+        return collider in self.colliders
+
+    def cell_of(self, x, z):
+        """Returns the (cell_x, cell_z) key of the cell containing the point (x, z)"""
+        return (math.floor(x / self.cell_size), math.floor(z / self.cell_size))
+
+    def cells_of(self, collider):
+        """Returns the keys of every cell overlapped by the collider's bounds"""
+        min_x, min_z = self.cell_of(collider.leftBound, collider.backBound)
+        max_x, max_z = self.cell_of(collider.rightBound, collider.frontBound)
+        return [(i, j) for i in range(min_x, max_x + 1) for j in range(min_z, max_z + 1)]
+
+    def add(self, collider):
+        """Registers a collider and returns it (adding the same collider twice does nothing)"""
+        if collider in self.colliders:
+            return collider
+        cells = self.cells_of(collider)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(collider)
+        self.colliders[collider] = cells
+        return collider
+
+    def remove(self, collider):
+        """Unregisters a collider, returns False if it was never added"""
+        cells = self.colliders.pop(collider, None)
+        if cells is None:
+            return False
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.remove(collider)
+            if not bucket:
+                del self.cells[cell]
+        return True
+
+    def move(self, collider, xPos, zPos):
+        """Re-centers a (dynamic) collider at (xPos, zPos) and updates the cells it is stored in"""
+        self.remove(collider)
+        half_width = (collider.rightBound - collider.leftBound) / 2
+        half_depth = (collider.frontBound - collider.backBound) / 2
+        collider.leftBound = xPos - half_width
+        collider.rightBound = xPos + half_width
+        collider.backBound = zPos - half_depth
+        collider.frontBound = zPos + half_depth
+        return self.add(collider)
+
+    def clear(self):
+        self.cells.clear()
+        self.colliders.clear()
+
+    def point_inside(self, point):
+        """Returns True if the point is inside any registered collider"""
+        for collider in self.cells.get(self.cell_of(point.x, point.z), ()):
+            if collider.pointInside(point):
+                return True
+        return False
@@ -11,15 +11,31 @@ from pool_ball import *
 import random
 from pool_ball import PoolBall
 from utils import *
-#Global Variables, needed for pool ball functions
-global ball_1, ball_2, ball_3, ball_4, cue_ball, eight_ball, angle, balls
+from gl_state import gl_state
+from physics import DEFAULT_LAYOUT
+from event_sim import EventSimulator
+from aim import AimPredictor
+
+# Index of the cue ball in the physics layout (and in Components.balls)
+CUE_BALL = 0
 
 class Components:
 
-    def __init__(self, textures, basic_shapes):
+    def __init__(self, textures, basic_shapes, seed=None):
         self.textures = textures
         self.basic_shapes = basic_shapes
 
+        # All the randomness (the spotlight flicker) comes from here, so a session can be replayed from its seed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.random = random.Random(self.seed)
+
+        # Predicts and draws the cue ball's path in shooting mode
+        self.aim = AimPredictor(basic_shapes)
+
+        # The pool balls of this table (created by config_balls)
+        self.balls = []
+        self.physics = None
+
     
     #==============================
     # Table functions
@@ -138,32 +154,28 @@ class Components:
         # Draw lightbulb
         glTranslate(0,-0.5,0)
         Materials.set_material(GL_FRONT_AND_BACK, Materials.LIGHTBULB)
-        self.basic_shapes.draw_sphere(radius=0.15)  # Small sphere for the bulb
+        self.basic_shapes.draw_sphere(radius=0.15, lod_key="hanging light bulb")  # Small sphere for the bulb
         glTranslate(0,0.5,0)
 
         Materials.set_material(GL_FRONT_AND_BACK, Materials.SILVER)
 
         # Ceiling attachment
-        self.basic_shapes.draw_cylinder(1/12, 6) #radius, height
+        self.basic_shapes.draw_cylinder(1/12, 6, lod_key="hanging light cord") #radius, height
 
         #Spotlight shade
         glTranslate(0,-2,0)
-        self.basic_shapes.draw_adjustable_cylinder(2, 1/12, 2) # bottom_radius, top_radius, height
+        self.basic_shapes.draw_adjustable_cylinder(2, 1/12, 2, lod_key="hanging light shade") # bottom_radius, top_radius, height
 
         glPopMatrix()
 
 
-    def setup_spotlight_lighting(self, is_on, frame_count, spotlight_state, ROOM_HEIGHT):
+    def update_spotlight(self, frame_count, spotlight_state):
         """
-        Set up the spotlight with smoother flickering and occasional darkness.
-        :param is_on: Whether the spotlight is initially enabled.
+        Advance the spotlight's smoother flickering and occasional darkness by one frame.
         :param frame_count: The current frame count (used to control flickering).
         """
-        light_num = GL_LIGHT3
-
-
         if frame_count % 60 == 0:  # Update every second
-            if random.random() < 0.3:  # 30% chance to turn off completely
+            if self.random.random() < 0.3:  # 30% chance to turn off completely
                 spotlight_state["target_intensity"] = 0.0
             else:
                 spotlight_state["target_intensity"] = 0.5  # Fully on after a reset
@@ -183,11 +195,16 @@ class Components:
         ) * 0.1
         spotlight_state["current_intensity"] = max(0.0, min(spotlight_state["current_intensity"], 0.5))  # Clamp to [0, 0.5]
 
-
+    def setup_spotlight_lighting(self, is_on, frame_count, spotlight_state, ROOM_HEIGHT):
+        """
+        Set up the spotlight with the intensity update_spotlight() worked out for this frame.
+        :param is_on: Whether the spotlight is initially enabled.
+        """
+        light_num = GL_LIGHT3
 
         # Set the light properties
         if is_on and spotlight_state["current_intensity"] > 0.0:
-            glEnable(light_num)
+            gl_state.enable(light_num)
             glLightfv(light_num, GL_POSITION, [0, ROOM_HEIGHT - 8, 0, 1])
             glLightfv(light_num, GL_DIFFUSE, [
                 spotlight_state["current_intensity"],
@@ -208,7 +225,7 @@ class Components:
             glLightf(light_num, GL_LINEAR_ATTENUATION, 0.01)
             glLightf(light_num, GL_QUADRATIC_ATTENUATION, 0.00)
         else:
-            glDisable(light_num)
+            gl_state.disable(light_num)
 
     def draw_light_bulb(self):
         """Draws a small light bulb inside the lamp shade."""
@@ -222,6 +239,11 @@ class Components:
 
     def draw_table_with_lamp(self, table_length, table_width, dice_frame):
         """Draws a table with a lamp placed on top, scaling the lamp down."""
+        self.draw_table_and_lamp(table_length, table_width)
+        self.draw_table_dice(dice_frame)
+
+    def draw_table_and_lamp(self, table_length, table_width):
+        """Draws the parts of draw_table_with_lamp() that never move (everything except the dice)."""
         glPushMatrix()
 
         # Draw the table
@@ -236,14 +258,18 @@ class Components:
         self.draw_lamp()  # Draw the lamp
         glPopMatrix()
 
-        # Position and draw the dice
+        glPopMatrix()
+
+    def draw_table_dice(self, dice_frame):
+        """Draws the pair of dice on top of the table from draw_table_and_lamp()."""
         glPushMatrix()
+
+        # Position and draw the dice
         glTranslate(0.6,3,0.3)
         self.draw_animated_die(dice_frame)
         glTranslate(-0.1,0,0.3)
         glRotate(30, 0,1,0)
         self.draw_animated_die(dice_frame)
-        glPopMatrix()
         
         glPopMatrix()
 
@@ -253,9 +279,7 @@ class Components:
     
     def draw_red_ball(self):
         glPushMatrix()
-        glMaterialfv(GL_FRONT, GL_AMBIENT, [1.0, 0.0, 0.0, 1.0])
-        glMaterialfv(GL_FRONT, GL_DIFFUSE, [1.0, 0.0, 0.0, 1.0])
-        glMaterialfv(GL_FRONT, GL_SPECULAR, [1.0, 0.0, 0.0, 1.0])
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_RED)  # Through the render queue if active
         self.basic_shapes.draw_sphere(0.2)
         glPopMatrix()
 
@@ -423,11 +447,25 @@ class Components:
         glPopMatrix()
 
     
-    def draw_animated_pool_table_scene(self, in_shooting_mode, shooting_angle):
-        global ball_1, ball_2, ball_3, ball_4, cue_ball, eight_ball, angle, balls
-        angle = shooting_angle
+    # draw_table can be set to False when the table and cue stick are drawn separately (e.g. baked into a StaticScene)
+    def draw_animated_pool_table_scene(self, in_shooting_mode, shooting_angle, draw_table=True):
         glPushMatrix()
 
+        if draw_table:
+            self.draw_pool_table_with_cue()
+        glTranslatef(0, 3.08, 0)  # Move up from the ground
+        # Draw the balls (they are moved by step_physics(), not here)
+        for ball in self.balls[CUE_BALL + 1:] + self.balls[:CUE_BALL + 1]: # Cue ball last
+            ball.draw()
+
+        #Draw the dashed line along the path the cue ball will take
+        if in_shooting_mode:
+            self.aim.draw(self.physics, CUE_BALL, shooting_angle)
+
+        glPopMatrix()
+
+    # Draws the pool table and the cue stick leaning against it (the parts of the pool scene that never move)
+    def draw_pool_table_with_cue(self):
         # Set the material for the table and cue stick
         Materials.set_material(GL_FRONT, Materials.BALL_PLASTIC)
 
@@ -440,88 +478,37 @@ class Components:
         self.draw_cue_stick()
         glPopMatrix()
         self.draw_pool_table()
-        glTranslatef(0, 3.08, 0)  # Move up from the ground
-        # Draw the balls
-        ball_1.draw()
-        ball_2.draw()
-        ball_3.draw()
-        ball_4.draw()
-        eight_ball.draw()
-        cue_ball.draw()
-
-        for i in range(len(balls)):
-            for j in range(i+1, len(balls)):
-                pos1 = (balls[i][0].position_x, balls[i][0].position_z)
-                pos2 = (balls[j][0].position_x, balls[j][0].position_z)
-                isMoving = balls[i][0].power != 0
-                noCooldown = balls[i][1] == 0 and balls[j][1] == 0
-                if math.dist(pos1,pos2)< 2 * balls[i][0].radius and isMoving and noCooldown:
-                    #Set 1/12 second cooldown to prevent repeat collisions
-                    balls[i][1] = 5
-                    balls[j][1] = 5
-
-                    #Calculate the instance vector for carrying movement
-                    diffX = balls[j][0].position_x - balls[i][0].position_x
-                    diffZ = balls[j][0].position_z - balls[i][0].position_z
-                    instVector = Vector(diffX, 0, diffZ)
-                    instVector.normalize()
-                    balls[j][0].changeDirection(instVector)
-                    
-
-                    #Next, calculate the power of both colliding pool balls
-                    #Note: Magnitude of the direction vectors is 1, simplifying calculation
-                    dotProduct = balls[i][0].direction.dx * balls[j][0].direction.dx + balls[i][0].direction.dz * balls[j][0].direction.dz
-                    pathAngle = math.degrees(math.acos(dotProduct))
-
-                    balls[i][0].power = balls[i][0].power * pathAngle / 90
-                    balls[j][0].power = balls[i][0].power * (90 - pathAngle)/90
-
-                    #Finally, calculate the new direction of the original ball, noting edge cases when going below 0 degrees
-                    if (balls[i][0].getAngle() % 360 < balls[j][0].getAngle() %360) or (balls[i][0].getAngle() % 360 > 270 and balls[j][0].getAngle() % 360 < 90):
-                        desiredAngle = balls[i][0].getAngle() - 90
-                    else:
-                        desiredAngle = balls[i][0].getAngle() + 90
-                    #Set new direction for original ball
-                    desiredVector = Vector(math.cos(math.radians(desiredAngle)),0,math.sin(math.radians(desiredAngle)))
-                    balls[i][0].changeDirection(desiredVector)
-            #Lower Cooldowns by 1 for all collisions
-            if balls[i][1] > 0:
-                balls[i][1] -= 1
-
-        #Draw the dashed lines for the cue ball
-        if in_shooting_mode:
-            PoolBall.draw_dash(cue_ball, shooting_angle, 1, self.basic_shapes)
-
-        glPopMatrix()
 
     #Sets initial state for the pool balls
     def config_balls(self):
-        global ball_1, ball_2, ball_3, ball_4, cue_ball, eight_ball, balls
-        # Create the balls
-        ball_1 = PoolBall(False, None, False, self.textures, self.basic_shapes) # has_texture, texture_name, is_cue
-        ball_2 = PoolBall(False, None, False, self.textures, self.basic_shapes) 
-        ball_3 = PoolBall(False, None, False, self.textures, self.basic_shapes) 
-        ball_4 = PoolBall(False, None, False, self.textures, self.basic_shapes)
-        eight_ball = PoolBall(True, self.textures.eight_ball_texture, False, self.textures, self.basic_shapes)
-        cue_ball = PoolBall(False, None, True, self.textures, self.basic_shapes)
-
-
-        # Configure the balls
-        ball_1.set_config(0.5, 0.3, 0, 0) # position_x, position_z, rotation_x, rotation_z
-        ball_2.set_config(-0.3, 1, 0, 0)
-        ball_3.set_config(1, 0.8, 0, 0)
-        ball_4.set_config(-0.6, -1.2, 0, 0)
-        eight_ball.set_config(0.3, 0.7, 100, 0)
-        cue_ball.set_config(-2, 0, 0, 0)
-
-        #Place balls in a list, with cooldown collisions: Needed for ball movement and interactions
-        balls = [[cue_ball, 0], [ball_1, 0], [ball_2, 0], [ball_3, 0], [ball_4,0], [eight_ball, 0]]
-        
+        # Create the balls, in the same order as the physics layout
+        self.balls = [
+            # Cue ball (has_texture, texture_name, is_cue): plain white, which shares an atlas with the eight ball's
+            # texture, so the two are drawn with one call
+            PoolBall(True, self.textures.white_texture, True, self.textures, self.basic_shapes),
+            PoolBall(False, None, False, self.textures, self.basic_shapes), # Balls 1-4
+            PoolBall(False, None, False, self.textures, self.basic_shapes),
+            PoolBall(False, None, False, self.textures, self.basic_shapes),
+            PoolBall(False, None, False, self.textures, self.basic_shapes),
+            PoolBall(True, self.textures.eight_ball_texture, False, self.textures, self.basic_shapes), # Eight ball
+        ]
+
+        # The balls are simulated from one collision to the next; the PoolBall objects only draw them
+        self.physics = EventSimulator(DEFAULT_LAYOUT) # position_x, position_z, rotation_x, rotation_z of each ball
+        self.sync_balls()
+
+    #Advances the simulation by elapsed seconds of real time and moves the balls to be drawn
+    def step_physics(self, elapsed):
+        self.physics.advance(elapsed) # The balls are views into the simulator's arrays, so they move with it
+
+    #Points the balls that get drawn at the simulation state (worked out for the exact frame time)
+    def sync_balls(self):
+        for index, ball in enumerate(self.balls):
+            ball.bind(self.physics.positions, self.physics.rotations, index)
+
     #Takes the shooting angle from Room, then pushes the cue_ball in that direction
     def shoot_cue(self, shootingAngle):
-        cue_ball.direction.dx = math.cos(math.radians(shootingAngle))
-        cue_ball.direction.dz = -math.sin(math.radians(shootingAngle))
-        cue_ball.power = .4
+        self.physics.shoot(CUE_BALL, shootingAngle)
     #Method which draws the picture for the room
 
     def draw_picture(self, length, frame_width, height):
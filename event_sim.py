@@ -0,0 +1,316 @@
+"""
+This class simulates pool shots event by event instead of in fixed steps.
+
+Friction takes the same fraction of a ball's speed every second, so after t seconds a ball's
+velocity is v * e^(-kt) (k = -ln(FRICTION_PER_SECOND)) and it has moved v * g(t), with
+g(t) = (1 - e^(-kt)) / k. Every ball moves along a straight line in terms of the same g, so the
+time two balls touch, a ball reaches a cushion or a ball slows down to STOP_SPEED can be solved
+for exactly. The simulator jumps from one of these events to the next, so a shot takes a few dozen
+events instead of hundreds of steps, and fast balls can never pass through each other. In between
+events the state is worked out for any time, so the renderer can sample it at the exact frame time.
+Balls at rest are asleep: they are not moved, left out of the stop and cushion searches, and pairs
+of sleeping balls are never solved for. A ball wakes up when it is shot or hit, and nothing is
+computed while every ball is asleep.
+
+Pairs that could touch are found with sweep and prune: until the next stop or cushion no ball turns,
+so each ball covers an interval along the table's long axis. The intervals are sorted and only balls
+whose intervals overlap are solved for, so big tables stay fast.
+
+Nothing here uses OpenGL. The rules (speeds, friction, bounces, hits) are the same as PoolPhysics.
+
+Example usage:
+simulator = EventSimulator()
+simulator.shoot(0, 45)                  # Cue ball (index 0) at 45 degrees
+simulator.advance(elapsed_seconds)      # Every frame
+simulator.snapshot()                    # (n, 4) array of position_x, position_z, rotation_x, rotation_z to draw
+
+simulator.run()                         # Or resolve the whole shot at once...
+simulator.state_at(1.5)                 # ...and look at any moment of it afterwards
+print(simulator.events)                 # [(time, "ball" / "cushion" / "stop", first, second), ...]
+"""
+
+import bisect
+import math
+import numpy as np
+from physics import BALL_RADIUS, TABLE_LENGTH, TABLE_WIDTH, SHOT_SPEED, FRICTION_PER_SECOND, STOP_SPEED, \
+    ROLL_RATE, CONTACT_BLOCK, DEFAULT_LAYOUT
+
+# Friction as a rate: speed(t) = speed(0) * e^(-DECAY * t)
+DECAY = -math.log(FRICTION_PER_SECOND)
+
+# Most events handled in one call (guards against balls stuck hitting each other forever)
+MAX_EVENTS = 10000
+
+
+def distance_to_time(g):
+    """Seconds it takes to cover g (the distance covered by a ball of speed 1), inf if it never gets there"""
+    if g >= 1 / DECAY:
+        return math.inf
+    return -math.log1p(-DECAY * g) / DECAY
+
+
+def time_to_distance(t):
+    """g(t): how far a ball of speed 1 gets in t seconds"""
+    return -math.expm1(-DECAY * t) / DECAY
+
+
+class EventSimulator:
+
+    def __init__(self, layout=DEFAULT_LAYOUT, radius=BALL_RADIUS, length=TABLE_LENGTH, width=TABLE_WIDTH,
+                 broad_phase="sweep_and_prune"):
+        """
+        :param layout: (position_x, position_z, rotation_x, rotation_z) of each ball.
+        :param broad_phase: "sweep_and_prune" (default) or "all_pairs", which tests every pair with an awake ball.
+        """
+        layout = np.asarray(layout, dtype=np.float64).reshape(-1, 4)
+        self.radius = radius
+        self.length = length
+        self.width = width
+        self.positions = layout[:, 0:2].copy()           # (n, 2): x, z
+        self.rotations = layout[:, 2:4].copy()           # (n, 2): rotation_x, rotation_z (degrees)
+        self.velocities = np.zeros((len(layout), 2))     # (n, 2): ft/s along x, z
+        self.awake = np.zeros(len(layout), dtype=bool)   # (n,): balls that are moving
+
+        # Confine the balls to the table
+        self.minimum = np.array([-length / 2 + radius, -width / 2 + radius])
+        self.maximum = np.array([length / 2 - radius, width / 2 - radius])
+
+        self.broad_phase = broad_phase
+        self.pairs_tested = 0  # Pairs the narrow phase checked for the last event
+
+        self.time = 0.0  # Time of the state in the arrays above
+        self.events = []  # (time, kind, first, second) of every event since the last shot
+        self.keyframes = []  # (time, positions, velocities, rotations) after each event, for state_at()
+        self.save_keyframe()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def shoot(self, index, angle, speed=SHOT_SPEED):
+        """Push a ball in the direction of angle (degrees)"""
+        self.velocities[index] = (speed * math.cos(math.radians(angle)), -speed * math.sin(math.radians(angle)))
+        self.wake(index)
+        self.events = []
+        self.keyframes = []
+        self.save_keyframe()
+
+    def wake(self, indices=slice(None)):
+        """Wake up balls whose velocities were set directly (all of them by default)"""
+        self.awake[indices] = np.any(self.velocities[indices] != 0, axis=-1)
+
+    def is_moving(self):
+        return bool(self.awake.any())
+
+    def copy(self):
+        """A separate simulator that starts from the current positions and velocities"""
+        simulator = EventSimulator(self.snapshot(), self.radius, self.length, self.width, self.broad_phase)
+        simulator.velocities[:] = self.velocities
+        simulator.wake()
+        simulator.time = self.time
+        return simulator
+
+    def snapshot(self):
+        """What the renderer needs: an (n, 4) array of position_x, position_z, rotation_x, rotation_z"""
+        return np.hstack([self.positions, self.rotations])
+
+    def save_keyframe(self):
+        self.keyframes.append((self.time, self.positions.copy(), self.velocities.copy(), self.rotations.copy()))
+
+    #==============================
+    # Moving between events
+    #==============================
+
+    @staticmethod
+    def moved(positions, velocities, rotations, dt):
+        """Positions, velocities and rotations dt seconds later, assuming no event happens in between"""
+        speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+        moving = speeds > 0
+        positions = positions + velocities * time_to_distance(dt)
+        rotations = rotations.copy()
+        # A moving ball turns at the same rate whatever its speed (rotation_x follows z, rotation_z follows x)
+        rotations[moving] += velocities[moving, ::-1] / speeds[moving, None] * ROLL_RATE * dt
+        return positions, velocities * math.exp(-DECAY * dt), rotations
+
+    def move_to(self, time):
+        """Moves the awake balls to time, writing into the arrays in place (so views into them stay valid)"""
+        if time > self.time and self.is_moving():
+            moving = np.nonzero(self.awake)[0]
+            self.positions[moving], self.velocities[moving], self.rotations[moving] = self.moved(
+                self.positions[moving], self.velocities[moving], self.rotations[moving], time - self.time)
+        self.time = max(self.time, time)
+
+    def state_at(self, time):
+        """The snapshot at any time since the last shot (up to the last event simulated, or further if at rest)"""
+        index = max(0, bisect.bisect_right([keyframe[0] for keyframe in self.keyframes], time) - 1)
+        start, positions, velocities, rotations = self.keyframes[index]
+        positions, _, rotations = self.moved(positions, velocities, rotations, max(0.0, time - start))
+        return np.hstack([positions, rotations])
+
+    #==============================
+    # Finding the next event
+    #==============================
+
+    def next_stop(self):
+        """(seconds from now, ball) of the next moving ball to slow down to STOP_SPEED"""
+        moving = np.nonzero(self.awake)[0]
+        if len(moving) == 0:
+            return math.inf, None
+        speeds = np.hypot(self.velocities[moving, 0], self.velocities[moving, 1])
+        times = np.log(np.maximum(speeds, STOP_SPEED) / STOP_SPEED) / DECAY
+        best = int(np.argmin(times))
+        return float(times[best]), int(moving[best])
+
+    def next_cushion(self):
+        """(seconds from now, ball, axis) of the next ball to reach a cushion it is moving towards"""
+        moving = np.nonzero(self.awake)[0]
+        if len(moving) == 0:
+            return math.inf, None, None
+        positions, velocities = self.positions[moving], self.velocities[moving]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distances = np.where(velocities > 0, (self.maximum - positions) / velocities,
+                                 np.where(velocities < 0, (self.minimum - positions) / velocities, np.inf))
+        distances = np.maximum(distances, 0)  # Already at (or just past) the cushion
+        row, axis = np.unravel_index(np.argmin(distances), distances.shape)
+        return distance_to_time(distances[row, axis]), int(moving[row]), int(axis)
+
+    def next_contact(self, horizon=math.inf):
+        """
+        (seconds from now, first, second) of the next two balls to touch while moving towards each other.
+        :param horizon: Seconds from now by which no ball turns (the next stop or cushion); contacts after it
+                        may be missed, since they would come after that event anyway.
+        """
+        if self.broad_phase == "all_pairs":
+            distance, first, second = self.all_pairs_contact()
+        else:
+            distance, first, second = self.closest_contact(*self.sweep_and_prune_pairs(horizon))
+        return distance_to_time(distance), first, second
+
+    def sweep_and_prune_pairs(self, horizon):
+        """
+        Broad phase: index arrays (first, second) of the pairs with an awake ball whose intervals along x
+        (from where each ball is now to where it gets by horizon, plus its radius) overlap.
+        """
+        diameter = 2 * self.radius
+        xs = self.positions[:, 0]
+        ends = xs + self.velocities[:, 0] * time_to_distance(horizon)  # Sleeping balls stay where they are
+        lows = np.minimum(xs, ends) - self.radius
+        highs = np.maximum(xs, ends) + self.radius
+        order = np.argsort(lows, kind="stable")
+        lows, highs, awake = lows[order], highs[order], self.awake[order]
+
+        # Awake ball k in sorted order is tested against the balls after it that start before it ends, and
+        # against the sleeping balls before it that end after it starts (a sleeping ball's interval is a
+        # diameter long); each pair of awake balls is found from the one that comes first
+        ranks = np.nonzero(awake)[0]
+        starts = np.searchsorted(lows, lows[ranks] - diameter, side="left")
+        counts = np.searchsorted(lows, highs[ranks], side="right") - starts
+        total = int(counts.sum())
+        first = np.repeat(ranks, counts)
+        second = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        keep = (second > first) | ((second < first) & ~awake[second] & (highs[second] >= lows[first]))
+        return order[first[keep]], order[second[keep]]
+
+    def all_pairs_contact(self):
+        """Tests every pair with an awake ball (kept for comparison with the broad phase)"""
+        balls = np.nonzero(self.awake)[0]
+        count = len(self.positions)
+        best = (math.inf, None, None)
+        tested = 0
+        # Compare a block of awake balls against every ball at a time, to keep memory bounded for big tables
+        for start in range(0, len(balls), CONTACT_BLOCK):
+            block = balls[start:start + CONTACT_BLOCK]
+            first = np.repeat(block, count)
+            second = np.tile(np.arange(count), len(block))
+            # Each pair once: skip the ball itself, and take a pair of awake balls from the lower one only
+            keep = (second != first) & (~self.awake[second] | (second > first))
+            best = min(best, self.closest_contact(first[keep], second[keep]), key=lambda contact: contact[0])
+            tested += self.pairs_tested
+        self.pairs_tested = tested
+        return best
+
+    def closest_contact(self, first, second):
+        """(distance, first, second) of the pair among first[i], second[i] that touches first (distance as in g)"""
+        self.pairs_tested = len(first)
+        offsets = self.positions[second] - self.positions[first]
+        closing = self.velocities[second] - self.velocities[first]
+
+        # |offset + closing * g| = 2 * radius is a quadratic in g: a g^2 + b g + c = 0
+        a = np.einsum("ij,ij->i", closing, closing)
+        b = 2 * np.einsum("ij,ij->i", offsets, closing)
+        c = np.einsum("ij,ij->i", offsets, offsets) - (2 * self.radius) ** 2
+        discriminant = b * b - 4 * a * c
+        candidates = np.nonzero((b < 0) & (discriminant >= 0))[0]  # Approaching, and their paths meet
+        if len(candidates) == 0:
+            return math.inf, None, None
+
+        # The smaller root, written so it doesn't lose precision when a is tiny; 0 if already touching
+        b, c, discriminant = b[candidates], c[candidates], discriminant[candidates]
+        distances = np.maximum(2 * c / (-b + np.sqrt(discriminant)), 0)
+        best = int(np.argmin(distances))
+        pair = candidates[best]
+        first, second = int(first[pair]), int(second[pair])
+        return float(distances[best]), min(first, second), max(first, second)
+
+    def next_event(self):
+        """(time, kind, first, second) of the next event, or None when every ball is at rest"""
+        if not self.is_moving():
+            return None
+        stop_time, stop_ball = self.next_stop()
+        cushion_time, cushion_ball, axis = self.next_cushion()
+        contact_time, first, second = self.next_contact(min(stop_time, cushion_time))
+        events = [(contact_time, "ball", first, second), (cushion_time, "cushion", cushion_ball, axis),
+                  (stop_time, "stop", stop_ball, None)]
+        time, kind, first, second = min(events, key=lambda event: event[0])
+        return self.time + time, kind, first, second
+
+    #==============================
+    # Handling events
+    #==============================
+
+    def resolve(self, kind, first, second):
+        if kind == "ball":
+            # Elastic hit between equal-mass balls: they swap their velocities along the line between the centers
+            normal = self.positions[second] - self.positions[first]
+            normal /= max(np.hypot(normal[0], normal[1]), 1e-9)
+            impulse = normal * np.dot(self.velocities[first] - self.velocities[second], normal)
+            self.velocities[first] -= impulse
+            self.velocities[second] += impulse
+            self.wake([first, second])  # A sleeping ball that gets hit starts moving
+        elif kind == "cushion":
+            # second is the axis the ball bounces along
+            self.positions[first, second] = np.clip(self.positions[first, second],
+                                                    self.minimum[second], self.maximum[second])
+            self.velocities[first, second] *= -1
+        else:
+            self.velocities[first] = 0
+            self.awake[first] = False
+
+    def advance_to(self, time):
+        """Handle every event up to time, then move the balls to time; returns the number of events handled"""
+        handled = 0
+        while handled < MAX_EVENTS:
+            event = self.next_event()
+            if event is None or event[0] > time:
+                break
+            event_time, kind, first, second = event
+            self.move_to(event_time)
+            self.resolve(kind, first, second)
+            self.events.append(event)
+            self.save_keyframe()
+            handled += 1
+        self.move_to(time)
+        return handled
+
+    def advance(self, elapsed):
+        """Move the simulation forward by elapsed seconds of real time (call once per frame)"""
+        return self.advance_to(self.time + elapsed)
+
+    def run(self):
+        """Handle events until every ball is at rest; returns the number of events handled"""
+        handled = 0
+        while handled < MAX_EVENTS:
+            event = self.next_event()
+            if event is None:
+                break
+            handled += self.advance_to(event[0])
+        return handled
@@ -0,0 +1,117 @@
+"""
+This class works out which objects the camera can see, so the ones outside the view can be skipped.
+
+The view frustum is the pyramid (cut off at the near and far planes) that the camera sees. It is
+built from the same values the Camera hands to gluPerspective and gluLookAt: camAngle, aspRatio,
+near, far, the eye and the look angles. Objects are tested with a bounding box or sphere; anything
+that is completely behind one of the six planes is outside.
+
+Example usage:
+frustum = Frustum(camera)
+frustum.update()                                    # Every frame, after moving the camera
+if frustum.box_visible(Bounds((-1, 0, -1), (1, 2, 1))):
+    draw_object()
+print(frustum.culled)                               # Objects skipped since update()
+"""
+
+import math
+
+
+class Bounds:
+    """An axis-aligned bounding box in world space"""
+
+    def __init__(self, minimum, maximum):
+        self.minimum = tuple(minimum)
+        self.maximum = tuple(maximum)
+
+    def __str__(self):
+        return "Bounds(%s, %s)" % (self.minimum, self.maximum)
+
+    @staticmethod
+    def from_vertices(vertices):
+        """Bounds of an (n, 3+) array of vertices (only x, y, z are used)"""
+        return Bounds(vertices[:, 0:3].min(axis=0), vertices[:, 0:3].max(axis=0))
+
+    def union(self, other):
+        if other is None:
+            return self
+        return Bounds([min(a, b) for a, b in zip(self.minimum, other.minimum)],
+                      [max(a, b) for a, b in zip(self.maximum, other.maximum)])
+
+
+def normalize(x, y, z):
+    length = math.sqrt(x * x + y * y + z * z)
+    return x / length, y / length, z / length
+
+
+def cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+class Frustum:
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.planes = []  # (normal, d) with normals pointing inside: dot(normal, p) + d >= 0 inside
+        self.enabled = True
+
+        # Statistics (since the last update)
+        self.tested = 0
+        self.culled = 0
+
+    def update(self):
+        """Rebuild the planes from the camera, and reset the counters"""
+        camera = self.camera
+        eye = (camera.eye.x, camera.eye.y, camera.eye.z)
+
+        # Same look direction as Camera.placeCamera()
+        rad = math.radians(camera.lookAngle)
+        up = math.radians(camera.heightAngle)
+        forward = normalize(-math.sin(rad), -math.sin(up), -math.cos(rad))
+        right = normalize(*cross(forward, (0, 1, 0)))
+        upward = cross(right, forward)
+
+        tan_vertical = math.tan(math.radians(camera.camAngle) / 2)
+        tan_horizontal = tan_vertical * camera.aspRatio
+
+        normals = [
+            (forward, -camera.near),  # Near
+            (tuple(-f for f in forward), camera.far),  # Far
+        ]
+        for side, tangent in ((right, tan_horizontal), (upward, tan_vertical)):
+            for sign in (1, -1):
+                # The left/right (or bottom/top) planes lean out from the view direction by the field of view
+                normal = normalize(*[-sign * s + f * tangent for s, f in zip(side, forward)])
+                normals.append((normal, 0))
+
+        self.planes = [(normal, offset - dot(normal, eye)) for normal, offset in normals]
+        self.tested = 0
+        self.culled = 0
+
+    def count(self, visible):
+        self.tested += 1
+        if not visible:
+            self.culled += 1
+        return visible
+
+    def sphere_visible(self, center, radius):
+        if not self.enabled or not self.planes:
+            return True
+        for normal, d in self.planes:
+            if dot(normal, center) + d < -radius:
+                return self.count(False)
+        return self.count(True)
+
+    def box_visible(self, bounds):
+        if not self.enabled or not self.planes or bounds is None:
+            return True
+        for normal, d in self.planes:
+            # The corner of the box furthest along the normal
+            corner = [bounds.maximum[i] if normal[i] >= 0 else bounds.minimum[i] for i in range(3)]
+            if dot(normal, corner) + d < 0:
+                return self.count(False)
+        return self.count(True)
@@ -0,0 +1,121 @@
+"""
+This class keeps a copy of the OpenGL state we change most often (enable bits, bound textures,
+texture parameters, materials, ...) so calls that would not change anything are never sent to OpenGL.
+
+OpenGL state belongs to the context, so there is one tracker for the whole program: gl_state.
+Everything that changes this state should go through it, otherwise the copy goes stale.
+Call gl_state.reset() after changing the state directly or creating a new context.
+
+Example usage:
+from gl_state import gl_state
+gl_state.enable(GL_LIGHTING)
+gl_state.bind_texture(GL_TEXTURE_2D, texture_name)
+gl_state.material(GL_FRONT, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
+print(gl_state.hits, gl_state.misses)   # Calls skipped, calls sent to OpenGL
+"""
+
+from OpenGL.GL import *
+
+
+class GLState:
+
+    def __init__(self):
+        self.reset()
+        self.reset_counters()
+
+    def reset(self):
+        """Forget everything, so the next change of each piece of state is always sent to OpenGL"""
+        self.enabled = {}             # capability -> True/False
+        self.bound_textures = {}      # target -> texture name
+        self.texture_parameters = {}  # (texture name, parameter) -> value
+        self.materials = {}           # (face, parameter) -> tuple of values
+        self.texture_env = {}         # (target, parameter) -> value
+        self.hints = {}               # target -> mode
+
+    def reset_counters(self):
+        self.hits = 0    # Calls skipped because the state was already set
+        self.misses = 0  # Calls sent to OpenGL
+
+    def changed(self, table, key, value):
+        """Stores value under key and returns True if it is different from what was there"""
+        if key in table and table[key] == value:
+            self.hits += 1
+            return False
+        table[key] = value
+        self.misses += 1
+        return True
+
+    #==============================
+    # Enable bits
+    #==============================
+
+    def enable(self, capability):
+        if self.changed(self.enabled, capability, True):
+            glEnable(capability)
+
+    def disable(self, capability):
+        if self.changed(self.enabled, capability, False):
+            glDisable(capability)
+
+    def set_enabled(self, capability, enabled):
+        if enabled:
+            self.enable(capability)
+        else:
+            self.disable(capability)
+
+    def is_enabled(self, capability):
+        """True/False, or None if the capability hasn't been set through the tracker yet"""
+        return self.enabled.get(capability)
+
+    #==============================
+    # Textures
+    #==============================
+
+    def bind_texture(self, target, texture):
+        if self.changed(self.bound_textures, target, texture):
+            glBindTexture(target, texture)
+
+    def bound_texture(self, target=GL_TEXTURE_2D):
+        return self.bound_textures.get(target)
+
+    def texture_parameter(self, texture, parameter, value):
+        """Sets a parameter of a 2D texture object (parameters belong to the texture, not to the binding)"""
+        if self.changed(self.texture_parameters, (texture, parameter), value):
+            self.bind_texture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, parameter, value)
+
+    def tex_env(self, target, parameter, value):
+        if self.changed(self.texture_env, (target, parameter), value):
+            glTexEnvf(target, parameter, value)
+
+    def hint(self, target, mode):
+        if self.changed(self.hints, target, mode):
+            glHint(target, mode)
+
+    #==============================
+    # Materials
+    #==============================
+
+    def material(self, face, parameter, value):
+        """glMaterialf/glMaterialfv, skipped if every affected face already has this value"""
+        if isinstance(value, (int, float)):
+            value = (float(value),)
+        else:
+            value = tuple(float(v) for v in value)
+
+        faces = (GL_FRONT, GL_BACK) if face == GL_FRONT_AND_BACK else (face,)
+        if all(self.materials.get((f, parameter)) == value for f in faces):
+            self.hits += 1
+            return
+        for f in faces:
+            self.materials[(f, parameter)] = value
+        self.misses += 1
+
+        if len(value) == 1:
+            glMaterialf(face, parameter, value[0])
+        else:
+            glMaterialfv(face, parameter, value)
+
+
+# The tracker for the (single) OpenGL context
+gl_state = GLState()
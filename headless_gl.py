@@ -0,0 +1,48 @@
+"""
+Creates an OpenGL context without a window or a display, through EGL.
+
+With Mesa installed this runs on the llvmpipe software renderer, which is what benchmarks.py uses
+to time whole frames on machines without a screen. PyOpenGL picks its platform the first time
+OpenGL is imported, so use_egl() has to run before any module that imports OpenGL.
+
+Example usage:
+import headless_gl
+headless_gl.use_egl()
+headless_gl.create_context(1200, 800)   # Draws into an off-screen 1200 x 800 buffer
+from room import Room
+room = Room(window=False)
+"""
+
+import ctypes
+import os
+
+
+def use_egl():
+    """Makes PyOpenGL use EGL without a display server (call before OpenGL is imported)"""
+    os.environ["PYOPENGL_PLATFORM"] = "egl"
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+
+def create_context(width, height):
+    """Creates an OpenGL context drawing into an off-screen buffer and makes it current"""
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("Could not initialize EGL")
+
+    attributes = (EGL.EGLint * 11)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                   EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                   EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RED_SIZE, 8, EGL.EGL_NONE, 0, 0)
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value == 0:
+        raise RuntimeError("No EGL configuration with an OpenGL off-screen buffer")
+
+    size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, size)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("Could not make the EGL context current")
+    return display
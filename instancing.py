@@ -0,0 +1,160 @@
+"""
+This class draws many copies of the same mesh, each with its own transform, in a single draw call.
+
+Our OpenGL code is fixed-function (no shaders), so the copies can't be placed by the graphics card.
+Instead, the transforms of all instances are put in one array, every copy of the mesh is moved into
+eye space with NumPy, and the result is streamed into one vertex buffer and drawn with one
+glDrawElements call. The RenderQueue uses this for draws that share a mesh, texture and material
+(pool balls, dice faces, table legs, ...). When the texture is an atlas, each copy can also get its
+own rectangle of it: its texture coordinates are moved into the rectangle the same way.
+
+Example usage:
+instances = InstanceRenderer()
+instances.draw(mesh, 0, None, transforms)   # transforms: modelview matrices from glGetFloatv
+instances.draw(mesh, 0, None, transforms, tex_rects)   # tex_rects: (s0, t0, s1, t1) in the atlas, per copy
+"""
+
+import ctypes
+import weakref
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError, NullFunctionError
+from mesh_cache import VERTEX_SIZE, VERTEX_STRIDE, NORMAL_OFFSET, TEX_COORD_OFFSET
+from mesh_generator import strip_to_triangles
+
+# Fewer instances than this are drawn one by one
+MIN_INSTANCES = 2
+
+# Texture rectangle of instances that use the whole texture
+FULL_TEXTURE = (0.0, 0.0, 1.0, 1.0)
+
+
+def load_tex_rect(rect):
+    """Moves texture coordinates into an (s0, t0, s1, t1) rectangle with the texture matrix (None: back to normal)"""
+    glMatrixMode(GL_TEXTURE)
+    glLoadIdentity()
+    if rect is not None:
+        s0, t0, s1, t1 = rect
+        glTranslatef(s0, t0, 0)
+        glScalef(s1 - s0, t1 - t0, 1)
+    glMatrixMode(GL_MODELVIEW)
+
+
+class InstanceRenderer:
+
+    def __init__(self):
+        self.vbo = None
+        self.ibo = None
+        self.available = True  # False when the driver has no buffer objects
+
+        # mesh -> {(first, count): (used vertex rows, triangles indexing into them, {instances: indices})}
+        self.ranges = weakref.WeakKeyDictionary()
+
+        # Statistics
+        self.draw_calls = 0
+        self.instances = 0
+
+    def range_triangles(self, mesh, first, count):
+        """The vertices used by a range of the mesh, its triangles, and a dict for the index arrays (cached per mesh)"""
+        mesh_ranges = self.ranges.setdefault(mesh, {})
+        cached = mesh_ranges.get((first, count))
+        if cached is None:
+            end = len(mesh.indices) if count is None else first + count
+            indices = mesh.indices[first:end]
+            if mesh.mode == GL_TRIANGLE_STRIP:
+                triangles = strip_to_triangles(indices)
+            else:
+                triangles = indices.reshape(-1, 3)
+            used, triangles = np.unique(triangles, return_inverse=True)
+            cached = (mesh.vertices[used], triangles.reshape(-1).astype(np.uint32), {})
+            mesh_ranges[(first, count)] = cached
+        return cached
+
+    def instance_indices(self, vertex_count, triangles, index_cache, instances):
+        """The triangles repeated for each instance, each copy pointing at its own vertices"""
+        indices = index_cache.get(instances)
+        if indices is None:
+            offsets = np.arange(instances, dtype=np.uint32)[:, None] * np.uint32(vertex_count)
+            indices = (triangles[None, :] + offsets).reshape(-1)
+            index_cache[instances] = indices
+        return indices
+
+    def transform(self, vertices, transforms, tex_rects=None):
+        """Returns the vertices of every instance in eye space as one (instances * n, 8) array"""
+        # OpenGL matrices come back column by column, which is already the transpose we need for row vectors
+        transforms = np.asarray(transforms, dtype=np.float64).reshape(-1, 4, 4)
+        rotations = transforms[:, :3, :3]
+        normal_matrices = np.transpose(np.linalg.inv(rotations), (0, 2, 1))
+
+        result = np.empty((len(transforms), len(vertices), VERTEX_SIZE), dtype=np.float32)
+        result[..., 0:3] = np.einsum("vj,njk->nvk", vertices[:, 0:3], rotations) + transforms[:, None, 3, :3]
+        result[..., 3:6] = np.einsum("vj,njk->nvk", vertices[:, 3:6], normal_matrices)  # GL_NORMALIZE rescales these
+        if tex_rects is None:
+            result[..., 6:8] = vertices[:, 6:8]
+        else:
+            rects = np.array([FULL_TEXTURE if rect is None else rect for rect in tex_rects])[:, None, :]
+            result[..., 6:8] = rects[..., 0:2] + vertices[:, 6:8] * (rects[..., 2:4] - rects[..., 0:2])
+        return result.reshape(-1, VERTEX_SIZE)
+
+    def upload(self):
+        try:
+            self.vbo, self.ibo = glGenBuffers(2)
+        except (GLError, NullFunctionError):
+            self.available = False
+
+    def draw(self, mesh, first, count, transforms, tex_rects=None):
+        """
+        Draw the range of mesh once for every modelview matrix in transforms
+        :param tex_rects: Rectangle of the texture (an atlas) for each copy, None for the whole texture.
+        """
+        if self.vbo is None and self.available:
+            self.upload()
+        if not self.available:
+            # No buffer objects, so draw the copies one at a time
+            glMatrixMode(GL_MODELVIEW)
+            glPushMatrix()
+            for index, transform in enumerate(transforms):
+                glLoadMatrixf(transform)
+                if tex_rects is not None:
+                    load_tex_rect(tex_rects[index])
+                mesh.draw(first, count)
+            if tex_rects is not None:
+                load_tex_rect(None)
+            glPopMatrix()
+            return
+
+        vertices, triangles, index_cache = self.range_triangles(mesh, first, count)
+        data = self.transform(vertices, transforms, tex_rects)
+        indices = self.instance_indices(len(vertices), triangles, index_cache, len(transforms))
+
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()  # The vertices are already in eye space
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, None)
+        glNormalPointer(GL_FLOAT, VERTEX_STRIDE, NORMAL_OFFSET)
+        glTexCoordPointer(2, GL_FLOAT, VERTEX_STRIDE, TEX_COORD_OFFSET)
+
+        glDrawElements(GL_TRIANGLES, len(indices), GL_UNSIGNED_INT, ctypes.c_void_p(0))
+
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glPopMatrix()
+
+        self.draw_calls += 1
+        self.instances += len(transforms)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = self.ibo = None
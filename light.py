@@ -8,6 +8,7 @@ light objects in the project.
 
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from gl_state import gl_state
 
 class Light:
     def __init__(self, light_num, position, diffuse, specular, attenuation=None, spot_direction=None, spot_cutoff=None, spot_exponent=None):
@@ -22,7 +23,7 @@ class Light:
 
     def enable(self):
         """Enable and configure the light."""
-        glEnable(self.light_num)
+        gl_state.enable(self.light_num)
         glLightfv(self.light_num, GL_POSITION, self.position)
         glLightfv(self.light_num, GL_DIFFUSE, self.diffuse)
         glLightfv(self.light_num, GL_SPECULAR, self.specular)
@@ -42,7 +43,7 @@ class Light:
 
     def disable(self):
         """Disable the light."""
-        glDisable(self.light_num)
+        gl_state.disable(self.light_num)
 
 
     def place_flashlight(light_num):
@@ -70,6 +71,6 @@ class Light:
         glLightf(light_num, GL_CONSTANT_ATTENUATION, 1.0)
         glLightf(light_num, GL_LINEAR_ATTENUATION, 0.10)
         glLightf(light_num, GL_QUADRATIC_ATTENUATION, 0.00)
-        glEnable(light_num)
+        gl_state.enable(light_num)
         glPopMatrix()
 
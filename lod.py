@@ -0,0 +1,110 @@
+"""
+This class picks how finely to tessellate spheres and cylinders based on how big they are on screen.
+
+Each curved shape can be drawn at a few precomputed levels (32, 24, 16, 12 or 8 slices). A circle
+drawn with n slices is off by at most radius * (1 - cos(pi / n)), so we project that error to pixels
+using the Camera's field of view and the distance from the eye, and use the coarsest level whose
+error stays under the threshold. To keep shapes from popping back and forth between two levels, a
+shape only moves to a coarser level when the error is well under the threshold (see hysteresis).
+
+Shapes are followed from frame to frame by a key the caller passes with each draw (the ball's
+index, the light's position, ...), so shapes that are culled or not drawn don't shift the others.
+A shape drawn without a key gets no hysteresis. The modelview matrix is only read for shapes that
+are really drawn now (see BasicShapes.level_of_detail).
+
+Example usage:
+basic_shapes.lod = LODSelector(camera, WINDOW_HEIGHT)
+lod.begin_frame()                   # Every frame, before drawing (for the statistics)
+basic_shapes.draw_sphere(0.2, lod_key="ceiling ball")
+print(lod.last_frame_stats)         # {slices: triangles saved by drawing at that level}
+"""
+
+import math
+from render_queue import read_modelview
+
+# Slices of the precomputed levels, finest first
+LOD_LEVELS = (32, 24, 16, 12, 8)
+
+# Largest silhouette error (in pixels) allowed before a finer level is used
+DEFAULT_MAX_ERROR_PIXELS = 0.5
+
+# A shape only switches to a coarser level when its error is below (1 - hysteresis) * max error
+DEFAULT_HYSTERESIS = 0.25
+
+
+class LODSelector:
+
+    def __init__(self, camera, viewport_height, max_error_pixels=DEFAULT_MAX_ERROR_PIXELS,
+                 hysteresis=DEFAULT_HYSTERESIS, levels=LOD_LEVELS):
+        self.camera = camera
+        self.viewport_height = viewport_height
+        self.max_error_pixels = max_error_pixels
+        self.hysteresis = hysteresis
+        self.levels = levels
+        self.enabled = True
+        self.modelview = None  # Modelview matrix read by the last select(), None if it didn't read one
+
+        self.current_levels = {}  # Key of the shape -> slices it was drawn with last time
+
+        # Statistics
+        self.frame_stats = {}       # slices -> triangles saved this frame
+        self.last_frame_stats = {}  # The same, for the last full frame
+
+    def begin_frame(self):
+        self.last_frame_stats = self.frame_stats
+        self.frame_stats = {}
+
+    @property
+    def triangles_saved(self):
+        return sum(self.last_frame_stats.values())
+
+    def pixels_per_unit(self, distance):
+        """How many pixels one unit (foot) covers at this distance from the eye"""
+        distance = max(distance, self.camera.near)
+        half_height = distance * math.tan(math.radians(self.camera.camAngle) / 2)
+        return self.viewport_height / (2 * half_height)
+
+    def eye_distance_and_scale(self, modelview):
+        """Distance from the eye to the origin of modelview, and the largest scale in it"""
+        # Column by column: row 3 is the translation
+        x, y, z = modelview[3][0], modelview[3][1], modelview[3][2]
+        scale = max(math.sqrt(modelview[i][0] ** 2 + modelview[i][1] ** 2 + modelview[i][2] ** 2) for i in range(3))
+        return math.sqrt(x * x + y * y + z * z), scale
+
+    def error_pixels(self, radius_pixels, slices):
+        return radius_pixels * (1 - math.cos(math.pi / slices))
+
+    def select(self, key, radius, slices):
+        """
+        Returns the number of slices to draw a shape of the given radius with, centered on the current origin.
+        :param key: What the shape is (e.g. ("sphere", ball index)), the same every frame; None if it has no key.
+        :param slices: Slices the shape asked for; the result is never finer than this.
+        """
+        self.modelview = None
+        if not self.enabled:
+            return slices
+
+        self.modelview = read_modelview()
+        distance, scale = self.eye_distance_and_scale(self.modelview)
+        radius_pixels = radius * scale * self.pixels_per_unit(distance)
+        candidates = [slices] + [level for level in self.levels if level < slices]
+
+        def coarsest(max_error):
+            best = candidates[0]
+            for level in candidates:
+                if self.error_pixels(radius_pixels, level) <= max_error:
+                    best = level
+            return best
+
+        previous = self.current_levels.get(key) if key is not None else None
+        if previous not in candidates or self.error_pixels(radius_pixels, previous) > self.max_error_pixels:
+            chosen = coarsest(self.max_error_pixels)  # New shape, or the current level is too coarse now
+        else:
+            chosen = min(previous, coarsest(self.max_error_pixels * (1 - self.hysteresis)))
+        if key is not None:
+            self.current_levels[key] = chosen
+        return chosen
+
+    def record_saving(self, slices, triangles_saved):
+        if triangles_saved > 0:
+            self.frame_stats[slices] = self.frame_stats.get(slices, 0) + triangles_saved
@@ -9,6 +9,8 @@ Materials.set_material(GL_FRONT, Materials.COPPER)
 
 from OpenGL.GLU import *
 from OpenGL.GL import *
+import render_queue
+from gl_state import gl_state
 
 
 class Materials:
@@ -60,6 +62,7 @@ class Materials:
 	LIGHTBULB = Material( [0.8, 0.8, 0.6, 1.0],[1.0, 1.0, 0.8, 1.0],[1.0, 1.0, 1.0, 1.0], 100.0 )
 	DARK_SILVER = Material([0.1, 0.1, 0.1, 1.0], [0.3, 0.3, 0.3, 1.0], [0.5, 0.5, 0.5, 1.0], 20.0)
 	BRIGHT_WHITE = Material([ 1, 1, 1, 1.0 ], [ 1, 1, 1, 1.0 ], [ 1, 1, 1, 1.0 ], 1)
+	BRIGHT_RED = Material([1.0, 0.0, 0.0, 1.0], [1.0, 0.0, 0.0, 1.0], [1.0, 0.0, 0.0, 1.0], 1)
 	
 	# A method for setting the material of an object
 	# Automatically disables texturing to ensure that the material properties are applied.
@@ -74,10 +77,16 @@ class Materials:
 		  - GL_FRONT_AND_BACK: Apply material to both front and back sides.
 		material -- Material instance (like the ones above), such as Materials.COPPER or Materials.SILVER.
 		"""
-		glDisable(GL_TEXTURE_2D)  # Ensure textures are off before setting materials
-		glEnable(GL_LIGHTING) # Ensure lighting is enabled
+		# While a render queue is collecting the frame, it applies the material later
+		if render_queue.RenderQueue.active is not None:
+			render_queue.RenderQueue.active.set_material(face, material)
+			return
 
-		glMaterialfv(face, GL_AMBIENT, material.ambient)
-		glMaterialfv(face, GL_DIFFUSE, material.diffuse)
-		glMaterialfv(face, GL_SPECULAR, material.specular)
-		glMaterialf(face, GL_SHININESS, material.shininess)
\ No newline at end of file
+		# Calls that would not change anything are skipped by gl_state
+		gl_state.disable(GL_TEXTURE_2D)  # Ensure textures are off before setting materials
+		gl_state.enable(GL_LIGHTING) # Ensure lighting is enabled
+
+		gl_state.material(face, GL_AMBIENT, material.ambient)
+		gl_state.material(face, GL_DIFFUSE, material.diffuse)
+		gl_state.material(face, GL_SPECULAR, material.specular)
+		gl_state.material(face, GL_SHININESS, material.shininess)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+This class stores the geometry of our basic shapes on the graphics card so it only has to be built once.
+
+A Mesh holds interleaved vertex data (position, normal, texture coordinate) and an index list.
+The first time a mesh is drawn it is uploaded to a vertex buffer object (VBO), or compiled into a
+display list if VBOs are not available, and every draw after that is a single draw call.
+
+The MeshCache keeps meshes by key, such as ("rect_grid", 7.7, 3.7, 1, 8, 20), and throws away the
+least recently used meshes when the memory cap is reached.
+
+Example usage:
+mesh = mesh_cache.get(("rect", 1, 2, 3), lambda: build_rectangle(1, 2, 3))
+mesh.draw()
+"""
+
+import ctypes
+from collections import OrderedDict
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError, NullFunctionError
+
+# Every vertex is 8 floats: x, y, z, nx, ny, nz, s, t
+VERTEX_SIZE = 8
+VERTEX_STRIDE = VERTEX_SIZE * 4
+NORMAL_OFFSET = ctypes.c_void_p(3 * 4)
+TEX_COORD_OFFSET = ctypes.c_void_p(6 * 4)
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # 32 MB of vertex and index data
+
+
+class Mesh:
+
+    def __init__(self, vertices, indices, mode=GL_TRIANGLES, ranges=None):
+        """
+        :param vertices: (n, 8) array of x, y, z, nx, ny, nz, s, t values.
+        :param indices: Indices into vertices, drawn with the given mode.
+        :param mode: OpenGL primitive type (GL_TRIANGLES, GL_TRIANGLE_STRIP, ...).
+        :param ranges: Optional list of (first, count) index ranges that can be drawn separately
+                       (for example one range per face of a die).
+        """
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, VERTEX_SIZE)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        self.mode = mode
+        self.ranges = ranges or []
+
+        self.vbo = None
+        self.ibo = None
+        self.display_lists = {}  # (first, count) -> display list, only used without VBOs
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.indices.nbytes
+
+    @property
+    def triangle_count(self):
+        if self.mode == GL_TRIANGLES:
+            return len(self.indices) // 3
+        return max(0, len(self.indices) - 2)
+
+    def upload(self):
+        """Copy the mesh to the graphics card (falls back to display lists when VBOs are missing)"""
+        if self.vbo is not None or self.display_lists:
+            return
+        try:
+            self.vbo, self.ibo = glGenBuffers(2)
+        except (GLError, NullFunctionError):
+            self.vbo = self.ibo = None
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def draw(self, first=0, count=None):
+        """Draw count indices starting at first (the whole mesh by default)"""
+        if count is None:
+            count = len(self.indices) - first
+        if self.vbo is None:
+            self.draw_display_list(first, count)
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, None)
+        glNormalPointer(GL_FLOAT, VERTEX_STRIDE, NORMAL_OFFSET)
+        glTexCoordPointer(2, GL_FLOAT, VERTEX_STRIDE, TEX_COORD_OFFSET)
+
+        glDrawElements(self.mode, count, GL_UNSIGNED_INT, ctypes.c_void_p(first * 4))
+
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def draw_display_list(self, first, count):
+        """Fallback for drivers without VBOs: compile the range into a display list once, then call it"""
+        display_list = self.display_lists.get((first, count))
+        if display_list is None:
+            display_list = glGenLists(1)
+            glNewList(display_list, GL_COMPILE)
+            glBegin(self.mode)
+            for index in self.indices[first:first + count]:
+                x, y, z, nx, ny, nz, s, t = self.vertices[index]
+                glNormal3f(nx, ny, nz)
+                glTexCoord2f(s, t)
+                glVertex3f(x, y, z)
+            glEnd()
+            glEndList()
+            self.display_lists[(first, count)] = display_list
+        glCallList(display_list)
+
+    def delete(self):
+        """Free the memory used on the graphics card"""
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = self.ibo = None
+        for display_list in self.display_lists.values():
+            glDeleteLists(display_list, 1)
+        self.display_lists = {}
+
+
+class MeshCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.meshes = OrderedDict()  # key -> Mesh, least recently used first
+        self.total_bytes = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.meshes)
+
+    def __contains__(self, key):
+        return key in self.meshes
+
+    def get(self, key, build):
+        """
+        Returns the mesh stored under key, building and uploading it with build() if it isn't cached.
+        :param key: Hashable description of the mesh, e.g. ("rect_grid", 7.7, 3.7, 1, 8, 20).
+        :param build: Function with no arguments that returns a new Mesh.
+        """
+        mesh = self.meshes.get(key)
+        if mesh is not None:
+            self.meshes.move_to_end(key)
+            self.hits += 1
+            return mesh
+
+        self.misses += 1
+        mesh = build()
+        mesh.upload()
+        self.meshes[key] = mesh
+        self.total_bytes += mesh.nbytes
+        self.evict()
+        return mesh
+
+    def evict(self):
+        """Delete least recently used meshes until we are under the memory cap (the newest mesh is always kept)"""
+        while self.total_bytes > self.max_bytes and len(self.meshes) > 1:
+            key, mesh = self.meshes.popitem(last=False)
+            self.total_bytes -= mesh.nbytes
+            mesh.delete()
+            self.evictions += 1
+
+    def clear(self):
+        for mesh in self.meshes.values():
+            mesh.delete()
+        self.meshes.clear()
+        self.total_bytes = 0
@@ -0,0 +1,234 @@
+"""
+This module generates the vertex and index arrays for our grid and curved shapes with NumPy.
+It doesn't use OpenGL, so meshes can also be generated ahead of time and saved to disk.
+
+Every vertex is 8 float32 values: x, y, z, nx, ny, nz, s, t
+Indices are uint32 and describe a single GL_TRIANGLE_STRIP. Rows (and faces) are joined with
+degenerate triangles, so a whole face or box can be drawn with one glDrawElements call.
+
+Example usage:
+vertices, indices = plane_grid_arrays(20, 20, 30, 30)
+save_mesh("floor.npz", vertices, indices)
+
+From the command line:
+python mesh_generator.py plane 20 20 30 30 -o floor.npz
+python mesh_generator.py box 7.7 3.7 1 8 20 -o trim.npz
+python mesh_generator.py sphere 32 32 -o sphere.npz
+"""
+
+import argparse
+import numpy as np
+
+# Texture coordinates of the corners p1, p2, p3 and p4 of a face
+DEFAULT_TEX_COORDS = ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0))
+
+
+def grid_vertices(p1, p2, p4, rows, cols, normal, tex_coords=DEFAULT_TEX_COORDS):
+    """
+    Returns a ((rows + 1) * (cols + 1), 8) array of vertices for a grid on the face
+    that starts at p1, runs towards p2 along the columns and towards p4 along the rows.
+    """
+    p1 = np.asarray(p1, dtype=np.float64)
+    col_step = (np.asarray(p2, dtype=np.float64) - p1) / cols
+    row_step = (np.asarray(p4, dtype=np.float64) - p1) / rows
+
+    i = np.arange(rows + 1, dtype=np.float64)[:, None, None]
+    j = np.arange(cols + 1, dtype=np.float64)[None, :, None]
+    positions = p1 + j * col_step + i * row_step  # (rows + 1, cols + 1, 3)
+
+    s = tex_coords[0][0] + j[..., 0] * (tex_coords[1][0] - tex_coords[0][0]) / cols
+    t = tex_coords[0][1] + i[..., 0] * (tex_coords[3][1] - tex_coords[0][1]) / rows
+
+    vertices = np.empty((rows + 1, cols + 1, 8), dtype=np.float32)
+    vertices[..., 0:3] = positions
+    vertices[..., 3:6] = normal
+    vertices[..., 6] = s
+    vertices[..., 7] = t
+    return vertices.reshape(-1, 8)
+
+
+def grid_strip_indices(rows, cols, offset=0):
+    """
+    Returns the indices of one triangle strip covering a rows x cols grid made by grid_vertices().
+    Each row is a strip of (top, bottom) pairs, and rows are joined by repeating the last index
+    of one row and the first index of the next (degenerate triangles that draw nothing).
+    """
+    i = np.arange(rows, dtype=np.uint32)[:, None]
+    j = np.arange(cols + 1, dtype=np.uint32)[None, :]
+    top = (i + 1) * (cols + 1) + j
+    bottom = i * (cols + 1) + j
+    strips = np.stack([top, bottom], axis=2).reshape(rows, -1) + np.uint32(offset)
+    return join_strips(strips)
+
+
+def join_strips(strips):
+    """
+    Joins a list (or 2D array) of triangle strips into a single strip with degenerate triangles.
+    Every strip must have an even length so the triangles keep their winding.
+    """
+    strips = [np.asarray(strip, dtype=np.uint32) for strip in strips]
+    pieces = []
+    for k, strip in enumerate(strips):
+        if k > 0:
+            pieces.append(strip[:1])  # Repeat the first index of this strip
+        pieces.append(strip)
+        if k < len(strips) - 1:
+            pieces.append(strip[-1:])  # Repeat the last index of this strip
+    return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.uint32)
+
+
+def strip_to_triangles(indices):
+    """Converts triangle strip indices to a (n, 3) array of triangles, dropping the degenerate ones"""
+    indices = np.asarray(indices, dtype=np.uint32)
+    if len(indices) < 3:
+        return np.zeros((0, 3), dtype=np.uint32)
+    triangles = np.stack([indices[:-2], indices[1:-1], indices[2:]], axis=1)
+    triangles[1::2, :2] = triangles[1::2, 1::-1]  # Every other triangle is flipped to keep the winding
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    return triangles[keep]
+
+
+def face_normal(p1, p2, p4, center):
+    """Unit normal of the face spanned by p1->p2 and p1->p4, pointing away from center"""
+    p1 = np.asarray(p1, dtype=np.float64)
+    normal = np.cross(np.asarray(p2) - p1, np.asarray(p4) - p1)
+    length = np.linalg.norm(normal)
+    if length == 0:
+        return np.array([0.0, 1.0, 0.0])  # Flat face (e.g. a box with no height)
+    normal /= length
+    if np.dot(normal, p1 - np.asarray(center)) < 0:
+        normal = -normal
+    return normal
+
+
+def plane_grid_arrays(length, width, rows, cols):
+    """Vertices and strip indices for a plane centered at the origin, facing up (+y)"""
+    half_length = length / 2
+    half_width = width / 2
+    p1 = [-half_length, 0, -half_width]  # Bottom-left
+    p2 = [half_length, 0, -half_width]   # Bottom-right
+    p4 = [-half_length, 0, half_width]   # Top-left
+    return grid_vertices(p1, p2, p4, rows, cols, [0, 1, 0]), grid_strip_indices(rows, cols)
+
+
+def box_grid_arrays(length, width, height, rows, cols):
+    """Vertices and strip indices for a box resting on y = 0 with a rows x cols grid on every face"""
+    half_length = length / 2
+    half_width = width / 2
+
+    corners = np.array([
+        [-half_length, 0, -half_width],       # Vertex 0
+        [half_length, 0, -half_width],        # Vertex 1
+        [half_length, height, -half_width],   # Vertex 2
+        [-half_length, height, -half_width],  # Vertex 3
+        [-half_length, 0, half_width],        # Vertex 4
+        [half_length, 0, half_width],         # Vertex 5
+        [half_length, height, half_width],    # Vertex 6
+        [-half_length, height, half_width]    # Vertex 7
+    ])
+
+    # Each face as (p1, p2, p3, p4) in counterclockwise order
+    faces = [
+        (0, 1, 2, 3),  # Bottom
+        (4, 5, 6, 7),  # Top
+        (0, 4, 7, 3),  # Left
+        (1, 5, 6, 2),  # Right
+        (3, 2, 6, 7),  # Back
+        (0, 1, 5, 4),  # Front
+    ]
+    center = [0, height / 2, 0]
+    face_size = (rows + 1) * (cols + 1)
+
+    vertices = []
+    strips = []
+    for k, (p1, p2, p3, p4) in enumerate(faces):
+        normal = face_normal(corners[p1], corners[p2], corners[p4], center)
+        vertices.append(grid_vertices(corners[p1], corners[p2], corners[p4], rows, cols, normal))
+        strips.append(grid_strip_indices(rows, cols, k * face_size))
+
+    return np.concatenate(vertices), join_strips(strips)
+
+
+#==============================
+# Curved shapes
+#==============================
+
+# These match the vertices, normals and texture coordinates of gluSphere and gluCylinder,
+# but are unit sized so one mesh can be scaled to any radius and height.
+
+def sphere_arrays(slices, stacks):
+    """Vertices and strip indices for a sphere of radius 1 centered at the origin (poles on the z axis, like gluSphere)"""
+    rho = np.linspace(0, np.pi, stacks + 1)[:, None]
+    theta = np.linspace(0, 2 * np.pi, slices + 1)[None, :]
+    theta[0, -1] = 0  # The seam reuses the first slice's position exactly
+
+    vertices = np.empty((stacks + 1, slices + 1, 8), dtype=np.float32)
+    vertices[..., 0] = -np.sin(theta) * np.sin(rho)
+    vertices[..., 1] = np.cos(theta) * np.sin(rho)
+    vertices[..., 2] = np.cos(rho)
+    vertices[..., 3:6] = vertices[..., 0:3]  # On a unit sphere the normal is the position
+    vertices[..., 6] = np.arange(slices + 1) / slices
+    vertices[..., 7] = 1 - np.arange(stacks + 1)[:, None] / stacks
+    return vertices.reshape(-1, 8), grid_strip_indices(stacks, slices)
+
+
+def cylinder_arrays(slices, stacks, bottom_radius=1.0, top_radius=1.0):
+    """Vertices and strip indices for a (possibly tapered) tube of height 1 along the z axis, like gluCylinder"""
+    z = np.linspace(0, 1, stacks + 1)[:, None]
+    radius = bottom_radius + (top_radius - bottom_radius) * z
+    angle = np.linspace(0, 2 * np.pi, slices + 1)[None, :]
+    angle[0, -1] = 0
+    x = np.sin(angle)
+    y = np.cos(angle)
+
+    vertices = np.empty((stacks + 1, slices + 1, 8), dtype=np.float32)
+    vertices[..., 0] = x * radius
+    vertices[..., 1] = y * radius
+    vertices[..., 2] = z
+
+    # The side slopes in by (bottom - top) per unit of height
+    normals = np.stack(np.broadcast_arrays(x, y, np.full_like(x, bottom_radius - top_radius)), axis=-1)
+    vertices[..., 3:6] = normals / np.linalg.norm(normals, axis=-1, keepdims=True)
+    vertices[..., 6] = np.arange(slices + 1) / slices
+    vertices[..., 7] = z
+    return vertices.reshape(-1, 8), grid_strip_indices(stacks, slices)
+
+
+#==============================
+# Saving meshes to disk
+#==============================
+
+def save_mesh(file_name, vertices, indices):
+    np.savez(file_name, vertices=np.asarray(vertices, dtype=np.float32), indices=np.asarray(indices, dtype=np.uint32))
+
+
+def load_mesh(file_name):
+    data = np.load(file_name)
+    return data["vertices"], data["indices"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate grid meshes and save them as .npz files")
+    parser.add_argument("shape", choices=["plane", "box", "sphere", "cylinder"])
+    parser.add_argument("sizes", type=float, nargs="+",
+                        help="plane: length width rows cols, box: length width height rows cols, "
+                             "sphere: slices stacks, cylinder: slices stacks [bottom_radius top_radius]")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    if args.shape == "sphere":
+        vertices, indices = sphere_arrays(int(args.sizes[0]), int(args.sizes[1]))
+    elif args.shape == "cylinder":
+        vertices, indices = cylinder_arrays(int(args.sizes[0]), int(args.sizes[1]), *args.sizes[2:])
+    else:
+        *dimensions, rows, cols = args.sizes
+        if args.shape == "plane":
+            vertices, indices = plane_grid_arrays(*dimensions, int(rows), int(cols))
+        else:
+            vertices, indices = box_grid_arrays(*dimensions, int(rows), int(cols))
+    save_mesh(args.output, vertices, indices)
+    print("Saved %d vertices and %d indices to %s" % (len(vertices), len(indices), args.output))
+
+
+if __name__ == "__main__":
+    main()
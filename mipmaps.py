@@ -0,0 +1,40 @@
+"""
+Builds the mipmap chain of a texture with NumPy.
+
+Each level is half the size of the one before (rounded down, as OpenGL expects, down to 1 x 1),
+and each texel is the average of a 2 x 2 block of the level above (a box filter). A texture drawn
+small on screen is then sampled from a level of about the right size instead of skipping over
+most of the texels of the full image, which is what makes fine patterns shimmer in the distance.
+
+Example usage:
+levels = build_mipmaps(pixels)          # pixels: (height, width, 3) uint8 array
+for level, image in enumerate(levels):
+    glTexImage2D(GL_TEXTURE_2D, level, GL_RGB, image.shape[1], image.shape[0], 0, GL_RGB,
+                 GL_UNSIGNED_BYTE, image)
+"""
+
+import numpy as np
+
+
+def downsample(image):
+    """Half the size of a (height, width, channels) uint8 image, averaging 2 x 2 blocks (an odd last row or column is dropped)"""
+    total = image.astype(np.uint16)
+    height, width = image.shape[:2]
+    count = 1
+    if height > 1:
+        even = height - height % 2
+        total = total[0:even:2] + total[1:even:2]
+        count *= 2
+    if width > 1:
+        even = width - width % 2
+        total = total[:, 0:even:2] + total[:, 1:even:2]
+        count *= 2
+    return ((total + count // 2) // count).astype(np.uint8)
+
+
+def build_mipmaps(image, max_levels=None):
+    """Every level of the image, from the image itself down to 1 x 1 (or only the first max_levels)"""
+    levels = [np.ascontiguousarray(image, dtype=np.uint8)]
+    while (levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1) and (max_levels is None or len(levels) < max_levels):
+        levels.append(downsample(levels[-1]))
+    return levels
@@ -0,0 +1,225 @@
+"""
+This class simulates the pool balls separately from drawing them.
+
+The simulation moves in fixed steps of PHYSICS_DT seconds. The room, the aim line and the shot
+analysis use EventSimulator (event_sim.py), which keeps the balls in the same arrays (one row per
+ball) but jumps from one event to the next; PoolPhysics is the fixed-step version of the same rules,
+and TableSet steps many tables the same way. The constants here are shared by all three.
+Nothing here uses OpenGL, so shots can be simulated without a window.
+
+Touching balls are found with sweep and prune: the balls are sorted along the table's long axis and
+only neighbours less than a ball diameter apart along it are checked, so big tables stay fast.
+Balls at rest are asleep: they are not moved, and pairs of sleeping balls are never checked. A ball
+wakes up when it is shot or hit, so a step where every ball is asleep costs next to nothing.
+
+All speeds are in feet per second. The old per-frame numbers (at 60 FPS) convert as:
+power 0.4 ft/frame = 24 ft/s, 2% friction per frame = 0.98^60 per second, stop below 0.002 ft/frame.
+
+Example usage:
+physics = PoolPhysics()
+physics.shoot(0, 45)                    # Cue ball (index 0) at 45 degrees
+while physics.is_moving():
+    physics.step(PHYSICS_DT)
+physics.snapshot()                      # (n, 4) array of position_x, position_z, rotation_x, rotation_z
+"""
+
+import math
+import numpy as np
+
+PHYSICS_DT = 1 / 60   # Seconds per simulation step
+
+# Pool ball and table (in feet)
+BALL_RADIUS = 0.186   # Standard radius for a pool ball
+TABLE_LENGTH = 7.7    # Our table is 7.7 units long, 3.7 units wide, and centered at the origin
+TABLE_WIDTH = 3.7
+
+SHOT_SPEED = 0.4 * 60                 # Cue ball speed after a shot
+FRICTION_PER_SECOND = 0.98 ** 60      # Fraction of the speed left after one second of rolling
+STOP_SPEED = 0.002 * 60               # Balls slower than this stop
+ROLL_RATE = math.pi * 60              # Degrees per second a moving ball turns (per unit of direction)
+
+CONTACT_BLOCK = 256   # Balls compared at once when looking for touching pairs
+
+# Starting positions as (position_x, position_z, rotation_x, rotation_z): cue ball, balls 1-4, eight ball
+DEFAULT_LAYOUT = [
+    (-2, 0, 0, 0),
+    (0.5, 0.3, 0, 0),
+    (-0.3, 1, 0, 0),
+    (1, 0.8, 0, 0),
+    (-0.6, -1.2, 0, 0),
+    (0.3, 0.7, 100, 0),
+]
+
+
+class PoolPhysics:
+    """
+    The state of every ball is kept in NumPy arrays (one row per ball), so each step is a handful of
+    array operations whether there are 6 balls or thousands.
+    """
+
+    def __init__(self, layout=DEFAULT_LAYOUT, radius=BALL_RADIUS, length=TABLE_LENGTH, width=TABLE_WIDTH,
+                 broad_phase="sweep_and_prune"):
+        """
+        :param layout: (position_x, position_z, rotation_x, rotation_z) of each ball.
+        :param broad_phase: "sweep_and_prune" (default) or "all_pairs", which tests every pair of balls.
+        """
+        layout = np.asarray(layout, dtype=np.float64).reshape(-1, 4)
+        self.radius = radius
+        self.positions = layout[:, 0:2].copy()           # (n, 2): x, z
+        self.rotations = layout[:, 2:4].copy()           # (n, 2): rotation_x, rotation_z (degrees)
+        self.velocities = np.zeros((len(layout), 2))     # (n, 2): ft/s along x, z
+        self.awake = np.zeros(len(layout), dtype=bool)   # (n,): balls that are moving
+
+        # Confine the balls to the table
+        self.minimum = np.array([-length / 2 + radius, -width / 2 + radius])
+        self.maximum = np.array([length / 2 - radius, width / 2 - radius])
+
+        self.broad_phase = broad_phase
+
+        self.time = 0.0  # Seconds simulated
+        self.contacts = 0  # Ball-ball hits resolved in the last step
+        self.pairs_tested = 0  # Pairs the narrow phase checked in the last step
+
+    def __len__(self):
+        return len(self.positions)
+
+    def shoot(self, index, angle, speed=SHOT_SPEED):
+        """Push a ball in the direction of angle (degrees)"""
+        self.velocities[index] = (speed * math.cos(math.radians(angle)), -speed * math.sin(math.radians(angle)))
+        self.wake(index)
+
+    def wake(self, indices=slice(None)):
+        """Wake up balls whose velocities were set directly (all of them by default)"""
+        self.awake[indices] = np.any(self.velocities[indices] != 0, axis=-1)
+
+    def is_moving(self):
+        return bool(self.awake.any())
+
+    def snapshot(self):
+        """What the renderer needs: an (n, 4) array of position_x, position_z, rotation_x, rotation_z"""
+        return np.hstack([self.positions, self.rotations])
+
+    #==============================
+    # Simulation
+    #==============================
+
+    def step(self, dt):
+        """Advance the simulation by dt seconds"""
+        self.time += dt
+        self.contacts = 0
+        self.pairs_tested = 0
+        if not self.awake.any():
+            return  # Everything is asleep
+        moving = np.nonzero(self.awake)[0]
+        self.move_balls(moving, dt)
+        self.bounce_off_cushions(moving)
+        self.collide_balls()
+
+    def move_balls(self, moving, dt):
+        """Moves the balls at the indices in moving, and puts the ones that stop to sleep"""
+        velocities = self.velocities[moving]
+        speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+        self.positions[moving] += velocities * dt
+
+        # A moving ball turns at the same rate whatever its speed (rotation_x follows z, rotation_z follows x)
+        directions = velocities / speeds[:, None]
+        self.rotations[moving] += directions[:, ::-1] * ROLL_RATE * dt
+
+        # Slow down, and stop once the ball is barely moving
+        velocities *= FRICTION_PER_SECOND ** dt
+        stopped = speeds * FRICTION_PER_SECOND ** dt < STOP_SPEED
+        velocities[stopped] = 0
+        self.velocities[moving] = velocities
+        self.awake[moving[stopped]] = False
+
+    def bounce_off_cushions(self, moving):
+        """Reverse the velocity of balls that reached a cushion while moving into it"""
+        positions, velocities = self.positions[moving], self.velocities[moving]
+        past_max = (positions >= self.maximum) & (velocities > 0)
+        past_min = (positions <= self.minimum) & (velocities < 0)
+        velocities[past_max | past_min] *= -1
+        self.velocities[moving] = velocities
+
+    def contact_pairs(self):
+        """Index arrays (i, j) of every pair of touching balls where at least one is awake, with i < j"""
+        if self.broad_phase == "all_pairs":
+            return self.all_pairs_contacts()
+        return self.sweep_and_prune_contacts()
+
+    def sweep_and_prune_contacts(self):
+        """
+        Broad phase: sort the balls along the table's long axis (x), and only test the pairs with an
+        awake ball whose x positions are less than a ball diameter apart. The narrow phase checks the
+        real distance.
+        """
+        diameter = 2 * self.radius
+        order = np.argsort(self.positions[:, 0], kind="stable")
+        xs = self.positions[order, 0]
+        awake = self.awake[order]
+
+        # Awake ball k in sorted order is tested against the counts[k] balls from starts[k] on
+        ranks = np.nonzero(awake)[0]
+        starts = np.searchsorted(xs, xs[ranks] - diameter, side="left")
+        counts = np.searchsorted(xs, xs[ranks] + diameter, side="right") - starts
+        total = int(counts.sum())
+        first = np.repeat(ranks, counts)
+        second = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+        # Each pair once: skip the ball itself, and take a pair of awake balls from the lower one only
+        keep = (second != first) & (~awake[second] | (second > first))
+        first, second = order[first[keep]], order[second[keep]]
+        self.pairs_tested = len(first)
+        if self.pairs_tested == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        offsets = self.positions[second] - self.positions[first]
+        touching = np.einsum("ij,ij->i", offsets, offsets) < diameter ** 2
+        first, second = first[touching], second[touching]
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def all_pairs_contacts(self):
+        """Tests every pair of balls (kept for comparison with the broad phase)"""
+        count = len(self.positions)
+        reach = (2 * self.radius) ** 2
+        self.pairs_tested = count * (count - 1) // 2
+        firsts, seconds = [], []
+        # Compare a block of balls against every later ball at a time, to keep memory bounded for big tables
+        for start in range(0, count, CONTACT_BLOCK):
+            end = min(count, start + CONTACT_BLOCK)
+            offsets = self.positions[None, start:, :] - self.positions[start:end, None, :]
+            first, second = np.nonzero(np.einsum("ijk,ijk->ij", offsets, offsets) < reach)
+            keep = (second > first) & (self.awake[first + start] | self.awake[second + start])
+            firsts.append(first[keep] + start)
+            seconds.append(second[keep] + start)
+        if not firsts:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def collide_balls(self):
+        """Elastic hits between equal-mass balls: they swap their velocities along the line between the centers"""
+        first, second = self.contact_pairs()
+        if len(first) == 0:
+            return
+
+        normals = self.positions[second] - self.positions[first]
+        distances = np.hypot(normals[:, 0], normals[:, 1])
+        distances[distances == 0] = 1e-9
+        normals /= distances[:, None]
+
+        # Only pairs moving towards each other are hit (pairs that are already separating are left alone)
+        closing = np.einsum("ij,ij->i", self.velocities[first] - self.velocities[second], normals)
+        hit = closing > 0
+        first, second, normals, distances, closing = first[hit], second[hit], normals[hit], distances[hit], closing[hit]
+        self.contacts = len(first)
+        if self.contacts == 0:
+            return
+
+        impulses = normals * closing[:, None]
+        np.add.at(self.velocities, first, -impulses)
+        np.add.at(self.velocities, second, impulses)
+        self.wake(np.concatenate([first, second]))  # A sleeping ball that gets hit starts moving
+
+        # Push overlapping balls apart so they don't stay stuck together
+        overlap = (2 * self.radius - distances)[:, None] * normals / 2
+        np.add.at(self.positions, first, -overlap)
+        np.add.at(self.positions, second, overlap)
@@ -103,7 +103,7 @@ class Preview:
         glTranslatef(light_position[0], light_position[1], light_position[2])
         glDisable(GL_LIGHTING)
         glColor3f(1, 1, 1) # White sphere
-        gluSphere(gluNewQuadric(), 0.2, 100, 100)
+        gluSphere(Preview.ball, 0.2, 100, 100) # Reuse one quadric instead of leaking a new one every frame
         glPopMatrix()
 
         glEnable(GL_LIGHTING)
@@ -0,0 +1,249 @@
+"""
+This class collects everything drawn during a frame and draws it sorted by texture and material,
+so each texture is bound and each material is set as few times as possible.
+
+While a queue is active (between begin() and end()), Materials.set_material() and Textures.set_texture()
+only remember the state, and every BasicShapes draw becomes a draw item with the current transform,
+mesh, material and texture. end() sorts the items by that state and draws them, and items that
+share a mesh as well are drawn together with one instanced draw call (see instancing.py).
+A texture packed in an atlas is recorded as the atlas and the texture's rectangle in it, so items
+with different textures of the same atlas (the balls) still go into one instanced call: each copy
+gets its texture coordinates moved into its own rectangle.
+
+Each item needs its modelview matrix, and reading it back from OpenGL stalls until the driver
+catches up, so the readbacks are counted in stats. Shapes that already read the matrix to pick
+their level of detail pass it along instead of reading it again (see BasicShapes.lod_transform).
+
+Only the state that goes through the queue is drawn with the item: the material, the texture,
+and lighting and colour set with set_lighting() and set_color() below (for unlit shapes). Any
+other state changed around a draw (a direct glColor3f, gl_state.disable(GL_LIGHTING) or
+gl_state.material call) takes effect when the item is collected, not when it is drawn, so
+it is lost or applies to the wrong items.
+
+Example usage:
+render_queue.begin()
+Materials.set_material(GL_FRONT, Materials.SILVER)  # Same calls as always
+basic_shapes.draw_sphere(1)
+render_queue.end()                                  # Everything is drawn here
+print(render_queue.stats)
+"""
+
+from OpenGL.GL import *
+import materials
+from gl_state import gl_state
+from instancing import InstanceRenderer, MIN_INSTANCES, load_tex_rect
+
+
+class DrawItem:
+    __slots__ = ("transform", "mesh", "first", "count", "face", "material", "texture", "tex_rect", "color")
+
+    def __init__(self, transform, mesh, first, count, face, material, texture, tex_rect, color):
+        self.transform = transform  # Modelview matrix when the item was submitted
+        self.mesh = mesh
+        self.first = first
+        self.count = count
+        self.face = face
+        self.material = material
+        self.texture = texture      # None when texturing is off
+        self.tex_rect = tex_rect    # (s0, t0, s1, t1) rectangle of texture (an atlas) to draw with, or None for all of it
+        self.color = color          # (r, g, b) drawn without lighting, or None when lit
+
+    def state_key(self):
+        # Untextured items first, then grouped by texture, then by material, then by colour, then by mesh (and range)
+        texture = -1 if self.texture is None else self.texture
+        count = -1 if self.count is None else self.count
+        color = () if self.color is None else self.color
+        return (texture, id(self.material), self.face, color, id(self.mesh), self.first, count)
+
+
+class RenderQueue:
+
+    # The queue that is currently collecting draws (None when drawing directly)
+    active = None
+
+    def __init__(self, textures, instancing=True):
+        self.textures = textures
+        self.items = []
+
+        # Items with the same state, mesh and range are drawn together in one call
+        self.instancing = instancing
+        self.instance_renderer = InstanceRenderer()
+
+        # State set since begin()
+        self.face = None
+        self.material = None
+        self.texture = None
+        self.tex_rect = None
+        self.texture_enabled = False
+        self.lighting = True
+        self.color = (1.0, 1.0, 1.0)
+
+        # Per-frame statistics (from the last end())
+        self.stats = {}
+        self.requested_materials = 0
+        self.requested_textures = 0
+        self.readbacks = 0  # glGetFloatv(GL_MODELVIEW_MATRIX) calls since begin()
+
+    def begin(self):
+        """Start collecting draws"""
+        self.items = []
+        self.requested_materials = 0
+        self.requested_textures = 0
+        self.readbacks = 0
+        RenderQueue.active = self
+
+    def end(self):
+        """Stop collecting draws and draw everything that was submitted"""
+        RenderQueue.active = None
+        self.flush()
+
+    #==============================
+    # State recorded while active
+    #==============================
+
+    def set_material(self, face, material):
+        self.face = face
+        self.material = material
+        self.texture_enabled = False  # Materials.set_material() turns texturing off
+        self.lighting = True          # and lighting on
+        self.requested_materials += 1
+
+    def set_texture(self, texture_name, rect=None):
+        """rect: the (s0, t0, s1, t1) rectangle to use when texture_name is an atlas"""
+        self.texture = texture_name
+        self.tex_rect = rect
+        self.texture_enabled = True
+        self.lighting = True  # Textures.set_texture() turns lighting on
+        self.requested_textures += 1
+
+    def set_texturing(self, enabled):
+        self.texture_enabled = enabled
+
+    def set_lighting(self, enabled):
+        self.lighting = enabled
+
+    def set_color(self, color):
+        self.color = tuple(color)
+
+    def record(self, mesh, first=0, count=None, transform=None):
+        """Add a draw item with the current state, and the current modelview matrix unless transform is given"""
+        if transform is None:
+            transform = read_modelview()
+        texture = self.texture if self.texture_enabled else None
+        tex_rect = self.tex_rect if self.texture_enabled else None
+        color = None if self.lighting else self.color
+        self.items.append(DrawItem(transform, mesh, first, count, self.face, self.material, texture, tex_rect, color))
+
+    #==============================
+    # Drawing
+    #==============================
+
+    def flush(self):
+        items = sorted(self.items, key=DrawItem.state_key)
+        material_changes = 0
+        texture_binds = 0
+        draw_calls = 0
+        instanced_items = 0
+
+        current_material = None
+        current_face = None
+        current_texture = None
+        texturing = None
+        current_color = None
+
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        index = 0
+        while index < len(items):
+            item = items[index]
+
+            # Sorting put items with the same state and mesh range next to each other
+            end = index + 1
+            key = item.state_key()
+            while end < len(items) and items[end].state_key() == key:
+                end += 1
+
+            if item.material is not None and (item.material is not current_material or item.face != current_face):
+                materials.Materials.set_material(item.face, item.material)
+                current_material, current_face = item.material, item.face
+                texturing = False
+                material_changes += 1
+
+            if item.texture is not None:
+                if item.texture != current_texture or not texturing:
+                    self.textures.set_texture(item.texture)
+                    current_texture = item.texture
+                    texturing = True
+                    texture_binds += 1
+            elif texturing is not False:
+                gl_state.disable(GL_TEXTURE_2D)
+                texturing = False
+
+            # Setting a material or texture turned lighting back on
+            gl_state.set_enabled(GL_LIGHTING, item.color is None)
+            if item.color is not None and item.color != current_color:
+                glColor3f(*item.color)
+                current_color = item.color
+
+            if self.instancing and end - index >= MIN_INSTANCES:
+                transforms = [instance.transform for instance in items[index:end]]
+                tex_rects = [instance.tex_rect for instance in items[index:end]]
+                self.instance_renderer.draw(item.mesh, item.first, item.count, transforms,
+                                            None if all(rect is None for rect in tex_rects) else tex_rects)
+                instanced_items += end - index
+                draw_calls += 1
+            else:
+                for instance in items[index:end]:
+                    glLoadMatrixf(instance.transform)
+                    if instance.tex_rect is not None:
+                        load_tex_rect(instance.tex_rect)
+                    instance.mesh.draw(instance.first, instance.count)
+                    if instance.tex_rect is not None:
+                        load_tex_rect(None)
+                    draw_calls += 1
+            index = end
+        glPopMatrix()
+        gl_state.enable(GL_LIGHTING)
+
+        self.items = []
+        self.stats = {
+            "items": len(items),
+            "draw_calls": draw_calls,
+            "instanced_items": instanced_items,
+            "texture_binds": texture_binds,
+            "material_changes": material_changes,
+            "requested_texture_binds": self.requested_textures,
+            "requested_material_changes": self.requested_materials,
+            "matrix_readbacks": self.readbacks,
+        }
+
+
+def read_modelview():
+    """glGetFloatv(GL_MODELVIEW_MATRIX), counted in the active render queue's stats"""
+    if RenderQueue.active is not None:
+        RenderQueue.active.readbacks += 1
+    return glGetFloatv(GL_MODELVIEW_MATRIX)
+
+
+def set_texturing(enabled):
+    """glEnable/glDisable(GL_TEXTURE_2D) that goes through the active render queue if there is one"""
+    if RenderQueue.active is not None:
+        RenderQueue.active.set_texturing(enabled)
+    else:
+        gl_state.set_enabled(GL_TEXTURE_2D, enabled)
+
+
+def set_lighting(enabled):
+    """glEnable/glDisable(GL_LIGHTING) that goes through the active render queue if there is one"""
+    if RenderQueue.active is not None:
+        RenderQueue.active.set_lighting(enabled)
+    else:
+        gl_state.set_enabled(GL_LIGHTING, enabled)
+
+
+def set_color(red, green, blue):
+    """glColor3f (the colour of unlit shapes) that goes through the active render queue if there is one"""
+    if RenderQueue.active is not None:
+        RenderQueue.active.set_color((red, green, blue))
+    else:
+        glColor3f(red, green, blue)
@@ -0,0 +1,139 @@
+"""
+These classes record the input of a session so it can be played back exactly.
+
+Every frame, Room turns what pygame reports into a FrameInput: the milliseconds since the last
+frame, the keys held down and the keys released. Together with the seed of the random numbers
+(the spotlight flicker) that is everything that changes the room, so feeding the same FrameInputs
+back through Room.handle_input() reproduces the session frame by frame, at any speed.
+
+A log file is a small header (magic, seed, frame count, checksum of the final state) followed by
+the frames, compressed with zlib: 5 bytes per frame plus 1 per key released.
+
+Example usage:
+recorder = InputRecorder(seed)
+recorder.record(frame_input)                    # Every frame
+recorder.save("session.rec", room.state_checksum())
+
+log = InputLog.load("session.rec")
+for frame_input in log.frames:
+    ...
+print(log.checksum)                             # The checksum the recorded session ended with
+"""
+
+import hashlib
+import struct
+import zlib
+import pygame
+
+MAGIC = b"ROOMREC1"
+HEADER = struct.Struct("<8sQI32s")  # Magic, seed, frame count, final state checksum
+MAX_SEED = 2**64 - 1  # Largest seed the header can store
+FRAME = struct.Struct("<HHB")       # Milliseconds since the last frame, keys held (bits), keys released
+MAX_ELAPSED_MS = 0xFFFF  # Longest frame a log can store; longer ones are cut to it before they are used
+
+# Keys Room checks every frame while they are held down (one bit each)
+HELD_KEYS = (pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_DOWN,
+             pygame.K_UP, pygame.K_p, pygame.K_j, pygame.K_l, pygame.K_SPACE, pygame.K_x, pygame.K_c)
+
+# Keys Room reacts to when they are released (stored as their index here)
+RELEASED_KEYS = (pygame.K_ESCAPE, pygame.K_r, pygame.K_t, pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3,
+                 pygame.K_4, pygame.K_5, pygame.K_h)
+QUIT_INDEX = 255  # Stored in place of a key when the window was closed
+
+
+class FrameInput:
+    """The input for one frame"""
+
+    def __init__(self, elapsed_ms, held=(), released=(), quit=False):
+        self.elapsed_ms = elapsed_ms  # Milliseconds since the last frame (advances the ball physics)
+        self.held = frozenset(held)  # Keys held down
+        self.released = list(released)  # Keys released this frame, in order
+        self.quit = quit  # The window was closed
+
+    @staticmethod
+    def from_pygame(elapsed_ms):
+        """
+        Reads this frame's input from pygame (only the keys Room uses are kept).
+        A frame longer than MAX_ELAPSED_MS (a stall, a debugger pause) counts as MAX_ELAPSED_MS, the
+        value the log stores, so the session and its replay advance the physics by the same time.
+        """
+        released, quit = [], False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit = True
+            elif event.type == pygame.KEYUP and event.key in RELEASED_KEYS:
+                released.append(event.key)
+        pressed = pygame.key.get_pressed()
+        return FrameInput(min(elapsed_ms, MAX_ELAPSED_MS), [key for key in HELD_KEYS if pressed[key]], released, quit)
+
+    def pack(self):
+        held = sum(1 << bit for bit, key in enumerate(HELD_KEYS) if key in self.held)
+        released = [RELEASED_KEYS.index(key) for key in self.released]
+        if self.quit:
+            released.append(QUIT_INDEX)
+        return FRAME.pack(self.elapsed_ms, held, len(released)) + bytes(released)
+
+    @staticmethod
+    def unpack(data, offset):
+        """Returns the FrameInput stored at offset, and the offset of the next one"""
+        elapsed_ms, held, count = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        indices = data[offset:offset + count]
+        frame = FrameInput(elapsed_ms, [key for bit, key in enumerate(HELD_KEYS) if held & (1 << bit)],
+                           [RELEASED_KEYS[index] for index in indices if index != QUIT_INDEX],
+                           QUIT_INDEX in indices)
+        return frame, offset + count
+
+
+class InputRecorder:
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.frames = bytearray()
+        self.frame_count = 0
+
+    def record(self, frame_input):
+        self.frames += frame_input.pack()
+        self.frame_count += 1
+
+    def save(self, path, checksum):
+        """Writes the log, with the checksum of the state the session ended in"""
+        header = HEADER.pack(MAGIC, self.seed, self.frame_count, bytes.fromhex(checksum))  # Before the file is emptied
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(zlib.compress(bytes(self.frames), 9))
+
+
+class InputLog:
+    """A recorded session"""
+
+    def __init__(self, seed, frames, checksum):
+        self.seed = seed
+        self.frames = frames  # List of FrameInput
+        self.checksum = checksum  # Hex digest of the final state when it was recorded
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, seed, frame_count, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("%s is not an input recording" % path)
+        body = zlib.decompress(data[HEADER.size:])
+        frames, offset = [], 0
+        for _ in range(frame_count):
+            frame, offset = FrameInput.unpack(body, offset)
+            frames.append(frame)
+        return InputLog(seed, frames, checksum.hex())
+
+
+def checksum(values):
+    """SHA-256 hex digest of a list of numbers, strings and NumPy arrays"""
+    digest = hashlib.sha256()
+    for value in values:
+        if hasattr(value, "tobytes"):
+            digest.update(value.tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b"|")
+    return digest.hexdigest()
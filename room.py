@@ -11,15 +11,24 @@
 import pygame
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import argparse
 import math
+import time
 from basic_shapes import BasicShapes
 from components import Components
 from textures import Textures
+from texture_manager import DEFAULT_BUDGET
 from utils import Point
 from camera import Camera
 from materials import *
-from collision import Collision
+from collision import Collision, CollisionGrid
 from light import Light
+from static_scene import StaticScene
+from render_queue import RenderQueue, set_lighting, set_color
+from gl_state import gl_state
+from lod import LODSelector
+from frustum import Frustum, Bounds
+from replay import FrameInput, InputRecorder, InputLog, checksum, MAX_SEED
 
 # Window settings
 window_dimensions = (1200, 800)
@@ -39,8 +48,15 @@ CAM_FAR = 1000.0
 INITIAL_EYE = Point(0, 5.67, 8)
 INITIAL_LOOK_ANGLE = 0
 
-# List for collision boxes
-collisionList = []
+# Size (in feet) of the cells used to index the collision boxes
+COLLISION_CELL_SIZE = 2.0
+
+# World-space bounds of the moving parts of the scene, used to skip them when the camera can't see them
+POOL_BALL_BOUNDS = Bounds((-4.7, 3.0, -2.2), (4.7, 3.7, 2.2))  # Balls and aiming dashes on the table
+DICE_BOUNDS = Bounds((-ROOM_WIDTH/2 + 0.3, 2.9, -ROOM_DEPTH/2 + 0.3), (-ROOM_WIDTH/2 + 2.3, 3.5, -ROOM_DEPTH/2 + 2.3))
+HANGING_LIGHT_PIVOT = (0, ROOM_HEIGHT, 0)
+HANGING_LIGHT_RADIUS = 8.5  # Covers the cord and shade at any swing angle
+LIGHT_INDICATOR_RADIUS = 0.2
 
 
 
@@ -50,6 +66,7 @@ class Room:
     # pool shooting variables
     in_shooting_mode = False
     shooting_angle = 0
+    toggleHold = False # True while P is held, so holding it only toggles shooting mode once
 
     # Animation frames
     global_frame = 0 # Used to keep track of time
@@ -73,21 +90,59 @@ class Room:
     # Picture boolean
     show_picture = False
 
-    def __init__(self):
+    def __init__(self, seed=None, window=True, texture_budget=DEFAULT_BUDGET, lazy_textures=True):
+        """
+        :param seed: Seed of the random numbers (the spotlight flicker), random if None.
+        :param window: False to draw into an OpenGL context that is already current (see headless_gl.py).
+        :param texture_budget: Bytes of texture memory kept at most (see texture_manager.py).
+        :param lazy_textures: Load each texture the first time it is drawn; False decodes all of them in
+                              parallel before the first frame.
+        """
 
         # Inititalize helpers
-        self.textures = Textures()
+        self.window = window
+        self.textures = Textures(window, lazy=lazy_textures, budget_bytes=texture_budget)
         self.basic_shapes = BasicShapes()
-        self.components = Components(self.textures, self.basic_shapes)
+        self.components = Components(self.textures, self.basic_shapes, seed)
 
         pygame.init()
-        pygame.display.set_mode(window_dimensions, pygame.DOUBLEBUF | pygame.OPENGL)
+        if window:
+            pygame.display.set_mode(window_dimensions, pygame.DOUBLEBUF | pygame.OPENGL)
         self.clock = pygame.time.Clock()
+        self.frame_time = 1 / FPS  # Seconds since the last frame, used to advance the ball physics
         
         self.camera = Camera(CAM_ANGLE, window_dimensions[0]/window_dimensions[1], CAM_NEAR, CAM_FAR, 
                            INITIAL_EYE, INITIAL_LOOK_ANGLE)
         
         self.init_gl()
+
+        # Collision boxes are registered once here, not every frame
+        self.colliders = CollisionGrid(COLLISION_CELL_SIZE)
+        self.register_colliders()
+
+        # Scenery that never moves is baked into a few world-space buffers
+        # Each section is baked separately so the ones out of view can be skipped
+        self.static_scene = StaticScene(self.basic_shapes, self.textures)
+        self.static_scene.add("floor", self.draw_floor)
+        self.static_scene.add("back_wall", self.draw_back_wall)
+        self.static_scene.add("front_wall", self.draw_front_wall)
+        self.static_scene.add("right_wall", self.draw_right_wall)
+        self.static_scene.add("left_wall", self.draw_left_wall)
+        self.static_scene.add("ceiling", self.draw_ceiling)
+        self.static_scene.add("pool_table", self.components.draw_pool_table_with_cue)
+        self.static_scene.add("corner_table", self.draw_corner_table)
+        self.static_scene.add("ceiling_ball", self.draw_ceiling_ball)
+        self.static_scene.add("picture", self.draw_picture)
+
+        # Objects outside of the camera's view are skipped (see frustum.culled)
+        self.frustum = Frustum(self.camera)
+
+        # Draws are sorted by texture and material each frame (see render_queue.stats)
+        self.render_queue = RenderQueue(self.textures)
+
+        # Spheres and cylinders far from the camera use fewer slices (see lod.last_frame_stats)
+        self.lod = LODSelector(self.camera, WINDOW_HEIGHT)
+        self.basic_shapes.lod = self.lod
         
         # Light states
         self.light_states = {
@@ -111,150 +166,115 @@ class Room:
         # If no non-flashlight lights are on, show the picture
         return True
 
+    def register_colliders(self):
+        """Add the collision boxes for the furniture in the room"""
+        self.colliders.add(Collision(8,4,0,0)) # Pool table
+        self.colliders.add(Collision(2,2,-ROOM_WIDTH/2 +1.3,-ROOM_DEPTH/2 + 1.3)) # Corner table
+
     def init_gl(self):
         """Initialize OpenGL settings"""
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_LIGHTING)
-        glEnable(GL_NORMALIZE)
-        glEnable(GL_TEXTURE_2D)
+        gl_state.enable(GL_DEPTH_TEST)
+        gl_state.enable(GL_LIGHTING)
+        gl_state.enable(GL_NORMALIZE)
+        gl_state.enable(GL_TEXTURE_2D)
         
         # Set up basic lighting
         glLightModelfv(GL_LIGHT_MODEL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-        glEnable(GL_LIGHT0)
-        glEnable(GL_LIGHT1)
-        glEnable(GL_LIGHT2)
-        glEnable(GL_LIGHT3) # Red and intially disabled
-        glEnable(GL_LIGHT4) # Green and intially disabled
-        glEnable(GL_LIGHT5) # Blue and intially disabled
+        gl_state.enable(GL_LIGHT0)
+        gl_state.enable(GL_LIGHT1)
+        gl_state.enable(GL_LIGHT2)
+        gl_state.enable(GL_LIGHT3) # Red and intially disabled
+        gl_state.enable(GL_LIGHT4) # Green and intially disabled
+        gl_state.enable(GL_LIGHT5) # Blue and intially disabled
         
-        glMaterialfv(GL_FRONT, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-        glMaterialfv(GL_FRONT, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-        glMaterialfv(GL_FRONT, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
-        glMaterialf(GL_FRONT, GL_SHININESS, 100.0)
+        gl_state.material(GL_FRONT, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
+        gl_state.material(GL_FRONT, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
+        gl_state.material(GL_FRONT, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
+        gl_state.material(GL_FRONT, GL_SHININESS, 100.0)
         
 
-    def handle_input(self):
-        """Handle keyboard and mouse input"""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    def handle_input(self, frame_input):
+        """Handle the keyboard input of one frame (a FrameInput, read from pygame or from a recording)"""
+        if frame_input.quit:
+            self.running = False
+        for key in frame_input.released:
+            if key == pygame.K_ESCAPE:
                 self.running = False
-            elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_ESCAPE:
-                    self.running = False
-                elif event.key == pygame.K_r: # Reset Camera to starting point
-                    self.camera.eye.x = 0
-                    self.camera.eye.y = 5.67
-                    self.camera.eye.z = 8
-                    # Reset collision point to match the camera's position
-                    self.camera.collisionPoint.x = self.camera.eye.x
-                    self.camera.collisionPoint.y = self.camera.eye.y
-                    self.camera.collisionPoint.z = self.camera.eye.z
-                elif event.key == pygame.K_t:  # Reset Vertical Camera position
-                    self.camera.heightAngle = INITIAL_LOOK_ANGLE
-
-                elif event.key in [pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5]:
-                    light_index = event.key - pygame.K_0
-                    self.toggle_light(light_index)
-                elif event.key == pygame.K_h: # Prints to console help message
-                    self.components.help_message()
-
-        keys = pygame.key.get_pressed()
-        moveBack = False
-        if keys[pygame.K_w]:
-            self.camera.slideCollision(0,0,-0.1) #First move collision box
-            #Check and see if a collision occurs with objects, if so flag it
-            for i in range(len(collisionList)):
-                if collisionList[i].pointInside(self.camera.collisionPoint):
-                    moveBack = True
-            #Check and see if wall collision occurs, if so flag it
-            if self.camera.collisionPoint.x < .2 -ROOM_WIDTH/2 or self.camera.collisionPoint.x > -.2 + ROOM_WIDTH/2 or self.camera.collisionPoint.z < .2 -ROOM_DEPTH/2 or self.camera.collisionPoint.z > -.2 + ROOM_DEPTH/2:
-                moveBack = True
-
-            #On collision, move collider back onto the player, do not move forward
-            if moveBack == True:
-                self.camera.slideCollision(0,0,.1)
-            else:
-                self.camera.slide(0, 0, -0.1)
-
-        if keys[pygame.K_s]:
-            self.camera.slideCollision(0,0,0.1) #First move collision box
-            #Check and see if a collision occurs with objects, if so flag it
-            for i in range(len(collisionList)):
-                if collisionList[i].pointInside(self.camera.collisionPoint):
-                    moveBack = True
-            #Check and see if wall collision occurs, if so flag it
-            if self.camera.collisionPoint.x < .2 -ROOM_WIDTH/2 or self.camera.collisionPoint.x > -.2 + ROOM_WIDTH/2 or self.camera.collisionPoint.z < .2 -ROOM_DEPTH/2 or self.camera.collisionPoint.z > -.2 + ROOM_DEPTH/2:
-                moveBack = True
-
-            #On collision, move collider back onto the player, do not move forward
-            if moveBack == True:
-                self.camera.slideCollision(0,0,-.1)
-            else:
-                self.camera.slide(0, 0, 0.1)
-        if keys[pygame.K_a]:
-            self.camera.slideCollision(-.1,0,0)
-            #Check and see if a collision occurs with objects, if so flag it
-            for i in range(len(collisionList)):
-                if collisionList[i].pointInside(self.camera.collisionPoint):
-                    moveBack = True
-            #Check and see if wall collision occurs, if so flag it
-            if self.camera.collisionPoint.x < .2 -ROOM_WIDTH/2 or self.camera.collisionPoint.x > -.2 + ROOM_WIDTH/2 or self.camera.collisionPoint.z < .2 -ROOM_DEPTH/2 or self.camera.collisionPoint.z > -.2 + ROOM_DEPTH/2:
-                moveBack = True
-
-            #On collision, move collider back onto the player, do not move forward
-            if moveBack == True:
-                self.camera.slideCollision(.1,0,0)
-            else:
-                self.camera.slide(-.1, 0, 0)
-        if keys[pygame.K_d]:
-            
-            self.camera.slideCollision(.1,0,0)
-            #Check and see if a collision occurs with objects, if so flag it
-            for i in range(len(collisionList)):
-                if collisionList[i].pointInside(self.camera.collisionPoint):
-                    moveBack = True
-            #Check and see if wall collision occurs, if so flag it
-            if self.camera.collisionPoint.x < .2 -ROOM_WIDTH/2 or self.camera.collisionPoint.x > -.2 + ROOM_WIDTH/2 or self.camera.collisionPoint.z < .2 -ROOM_DEPTH/2 or self.camera.collisionPoint.z > -.2 + ROOM_DEPTH/2:
-                moveBack = True
-
-            #On collision, move collider back onto the player, do not move forward
-            if moveBack == True:
-                self.camera.slideCollision(-.1,0,0)
-            else:
-                self.camera.slide(.1, 0, 0)
+            elif key == pygame.K_r: # Reset Camera to starting point
+                self.camera.eye.x = 0
+                self.camera.eye.y = 5.67
+                self.camera.eye.z = 8
+                # Reset collision point to match the camera's position
+                self.camera.collisionPoint.x = self.camera.eye.x
+                self.camera.collisionPoint.y = self.camera.eye.y
+                self.camera.collisionPoint.z = self.camera.eye.z
+            elif key == pygame.K_t:  # Reset Vertical Camera position
+                self.camera.heightAngle = INITIAL_LOOK_ANGLE
+
+            elif key in [pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5]:
+                light_index = key - pygame.K_0
+                self.toggle_light(light_index)
+            elif key == pygame.K_h: # Prints to console help message
+                self.components.help_message()
+
+        keys = frame_input.held
+        if pygame.K_w in keys:
+            self.move_camera(0, -0.1)
+        if pygame.K_s in keys:
+            self.move_camera(0, 0.1)
+        if pygame.K_a in keys:
+            self.move_camera(-.1, 0)
+        if pygame.K_d in keys:
+            self.move_camera(.1, 0)
         #Camera turning functions!
-        if keys[pygame.K_LEFT]:
+        if pygame.K_LEFT in keys:
             self.camera.turn(1)
-        if keys[pygame.K_RIGHT]:
+        if pygame.K_RIGHT in keys:
             self.camera.turn(-1) 
-        if keys[pygame.K_DOWN]:
+        if pygame.K_DOWN in keys:
             self.camera.rise(-1)
-        if keys[pygame.K_UP]:
+        if pygame.K_UP in keys:
             self.camera.rise(1)  
 
         #Pool table control functions 
-        if keys[pygame.K_p]:
+        if pygame.K_p in keys:
             if Room.toggleHold != True:
                 Room.in_shooting_mode = not Room.in_shooting_mode
                 Room.toggleHold = True
         else:
             Room.toggleHold = False
-        if keys[pygame.K_j] and Room.in_shooting_mode:
+        if pygame.K_j in keys and Room.in_shooting_mode:
             Room.shooting_angle += 1
-        if keys[pygame.K_l] and Room.in_shooting_mode:
+        if pygame.K_l in keys and Room.in_shooting_mode:
             Room.shooting_angle -= 1
-        if keys[pygame.K_SPACE] and Room.in_shooting_mode:
+        if pygame.K_SPACE in keys and Room.in_shooting_mode:
             Room.in_shooting_mode = False
             self.components.shoot_cue(Room.shooting_angle)
                  
         #Dice control key
-        if keys[pygame.K_x]:
+        if pygame.K_x in keys:
                 Room.initial_dice_frame =  Room.global_frame
                 Room.animate_dice = True
         #Hanging light control key
-        if keys[pygame.K_c]:
+        if pygame.K_c in keys:
             Room.animate_hanging_light = not Room.animate_hanging_light
 
+    def move_camera(self, du, dn):
+        """Slide the camera by (du, dn) unless that would put it inside a wall or an object"""
+        self.camera.slideCollision(du,0,dn) #First move collision box
+        point = self.camera.collisionPoint
+
+        #Check and see if a collision occurs with objects or walls, if so flag it
+        moveBack = self.colliders.point_inside(point)
+        if point.x < .2 -ROOM_WIDTH/2 or point.x > -.2 + ROOM_WIDTH/2 or point.z < .2 -ROOM_DEPTH/2 or point.z > -.2 + ROOM_DEPTH/2:
+            moveBack = True
+
+        #On collision, move collider back onto the player, do not move forward
+        if moveBack:
+            self.camera.slideCollision(-du,0,-dn)
+        else:
+            self.camera.slide(du, 0, dn)
+
     #Function sets the animation frames of the room for the dice and light
     def animate(self):
 
@@ -289,7 +309,7 @@ class Room:
             red_light.enable()
             self.draw_light_indicator([-5, ROOM_HEIGHT - 0.1, -5], [1.0, 0.0, 0.0])  # Red sphere
         else:
-            glDisable(GL_LIGHT0)
+            gl_state.disable(GL_LIGHT0)
 
         # Green Light
         if self.light_states['green']:
@@ -302,7 +322,7 @@ class Room:
             green_light.enable()
             self.draw_light_indicator([5, ROOM_HEIGHT - 0.1, -5], [0.0, 1.0, 0.0])  # Green sphere
         else:
-            glDisable(GL_LIGHT1)
+            gl_state.disable(GL_LIGHT1)
 
         # Blue Light
         if self.light_states['blue']:
@@ -315,7 +335,7 @@ class Room:
             blue_light.enable()
             self.draw_light_indicator([0, ROOM_HEIGHT - 0.1, 5], [0.0, 0.0, 1.0])  # Blue sphere
         else:
-            glDisable(GL_LIGHT2)
+            gl_state.disable(GL_LIGHT2)
 
         # Spotlight
          # Spotlight
@@ -339,14 +359,14 @@ class Room:
             desk_lamp.enable()
             self.draw_light_indicator([-ROOM_WIDTH / 2 + 1.3, 5.25, -ROOM_DEPTH / 2 + 1.3], [1.0, 1.0, 0.0])  # Yellow sphere
         else:
-            glDisable(GL_LIGHT4)
+            gl_state.disable(GL_LIGHT4)
 
         # Flashlight
         if self.light_states['flashlight']:
             light_num = GL_LIGHT5
             Light.place_flashlight(light_num)
         else:
-            glDisable(GL_LIGHT5)
+            gl_state.disable(GL_LIGHT5)
 
 
     #Draws the sphere which represents each light
@@ -356,12 +376,15 @@ class Room:
         :param position: The [x, y, z] position of the sphere.
         :param color: The [r, g, b] color of the sphere.
         """
+        if not self.frustum.sphere_visible(position, LIGHT_INDICATOR_RADIUS):
+            return
         glPushMatrix()
-        glDisable(GL_LIGHTING)  # Disable lighting for the sphere
-        glColor3f(*color)  # Set the color of the sphere
+        set_lighting(False)  # Disable lighting for the sphere
+        set_color(*color)  # Set the color of the sphere
         glTranslatef(position[0], position[1], position[2])
-        gluSphere(gluNewQuadric(), 0.2, 16, 16)  # Draw a small sphere
-        glEnable(GL_LIGHTING)  # Re-enable lighting
+        self.basic_shapes.draw_centered_sphere(LIGHT_INDICATOR_RADIUS, 16, 16,  # Draw a small sphere (shared mesh)
+                                               lod_key=("light indicator", tuple(position)))
+        set_lighting(True)  # Re-enable lighting
         glPopMatrix()
 
     #Light toggling
@@ -374,7 +397,16 @@ class Room:
 
     def draw_room(self):
         """Draw the room with textured walls, floor, and ceiling"""
-        
+        self.draw_floor()
+        self.draw_back_wall()
+        self.draw_front_wall()
+        self.draw_right_wall()
+        self.draw_left_wall()
+        self.draw_ceiling()
+
+    # Each surface sets its own material and texture, so it can be baked (and culled) on its own
+
+    def draw_floor(self):
         # Set the material to be combined with the textures
         Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
         
@@ -383,11 +415,9 @@ class Room:
 
         self.basic_shapes.draw_plane_with_grid(ROOM_WIDTH, ROOM_DEPTH, 30, 30)
 
-
-        # Walls
+    def draw_back_wall(self):
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
         self.textures.set_texture(self.textures.wall_name)
-        
-        # Back wall
         glPushMatrix()
         glTranslate(0,ROOM_HEIGHT/2,ROOM_DEPTH/2) # Move back and up
         glRotate(270, 1,0,0)
@@ -395,14 +425,18 @@ class Room:
         self.basic_shapes.draw_plane_with_grid(ROOM_DEPTH, ROOM_HEIGHT,30,30)
         glPopMatrix()
 
-        # Front wall
+    def draw_front_wall(self):
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
+        self.textures.set_texture(self.textures.wall_name)
         glPushMatrix()
         glTranslate(0,ROOM_HEIGHT/2,-ROOM_DEPTH/2) # Move forward and up
         glRotate(90,1,0,0)
         self.basic_shapes.draw_plane_with_grid(ROOM_DEPTH, ROOM_HEIGHT,30,30)
         glPopMatrix()
 
-        # Right wall
+    def draw_right_wall(self):
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
+        self.textures.set_texture(self.textures.wall_name)
         glPushMatrix()
         glRotate(90,0,1,0)
         glTranslate(0,ROOM_HEIGHT/2,ROOM_DEPTH/2)
@@ -411,8 +445,9 @@ class Room:
         self.basic_shapes.draw_plane_with_grid(ROOM_DEPTH, ROOM_HEIGHT,30,30)
         glPopMatrix()
 
-
-        # Left wall
+    def draw_left_wall(self):
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
+        self.textures.set_texture(self.textures.wall_name)
         glPushMatrix()
         glRotate(90,0,1,0)
         glTranslate(0,ROOM_HEIGHT/2,-ROOM_DEPTH/2)
@@ -420,25 +455,30 @@ class Room:
         self.basic_shapes.draw_plane_with_grid(ROOM_DEPTH, ROOM_HEIGHT,30,30)
         glPopMatrix()
 
-        # Ceiling
+    def draw_ceiling(self):
+        # The ceiling has always used the wall texture
+        Materials.set_material(GL_FRONT, Materials.BRIGHT_WHITE)
+        self.textures.set_texture(self.textures.wall_name)
         glPushMatrix()
         glTranslate(0, ROOM_HEIGHT, 0) # Move up
         glRotate(180,0,0,1)
         self.basic_shapes.draw_plane_with_grid(ROOM_WIDTH, ROOM_DEPTH,30,30)
         glPopMatrix()
 
-    def draw_components(self):
-
-        self.components.draw_animated_pool_table_scene(Room.in_shooting_mode, Room.shooting_angle)
-        collisionList.append(Collision(8,4,0,0)) #Create collision box for pool table
+    def draw_furniture(self):
+        """Draw the furniture that never moves (baked into the static scene)"""
+        self.components.draw_pool_table_with_cue()
+        self.draw_corner_table()
+        self.draw_ceiling_ball()
 
+    def draw_corner_table(self):
         # Place the corner table in the bottom-left corner
         glPushMatrix()  # Save current transformation matrix
         glTranslatef(-ROOM_WIDTH/2 + 1.3, 0, -ROOM_DEPTH/2 + 1.3)  # Move to corner
-        self.components.draw_table_with_lamp(2, 2, Room.dice_frame)  # Draw table
-        collisionList.append(Collision(2,2,-ROOM_WIDTH/2 +1.3,-ROOM_DEPTH/2 + 1.3)) #Create collision box for table
+        self.components.draw_table_and_lamp(2, 2)  # Draw table
         glPopMatrix()  # Restore previous transformation matrix
 
+    def draw_ceiling_ball(self):
         # Draw a ball around the top of the lamp
         glPushMatrix()  # Save current transformation matrix
         glTranslatef(0, ROOM_HEIGHT - 0.4, 0)  # Move to Center
@@ -446,12 +486,8 @@ class Room:
         self.basic_shapes.draw_sphere(0.2)
         glPopMatrix()  # Restore previous transformation matrix
 
-        glPushMatrix()  # Save current transformation matrix
-        glTranslatef(0 , ROOM_HEIGHT - 6, 0)  # Move to ceiling
-        hanging_light_equation = Room.swing_factor * math.sin(0.03 * Room.hanging_light_frame)
-        self.components.draw_animated_hanging_spotlight(hanging_light_equation, self.spot_light_is_enabled, self.global_frame, self.spotlight_state, ROOM_HEIGHT)
-        glPopMatrix()  # Restore previous transformation matrix
-
+    def draw_picture(self):
+        """Draw the framed picture if it should be shown (baked into the static scene)"""
         if self.show_picture:
             # Add a frame to the back wall
             glPushMatrix()
@@ -462,39 +498,161 @@ class Room:
             self.components.draw_framed_picture(3, 1.2, 3)  # Frame size: 3x3   
             glPopMatrix()
 
+    def draw_components(self):
+        """Draw the parts of the scene that move"""
+        self.draw_if_visible(self.frustum.box_visible(POOL_BALL_BOUNDS), self.draw_pool_balls)
+        self.draw_if_visible(self.frustum.box_visible(DICE_BOUNDS), self.draw_dice)
+        self.draw_if_visible(self.frustum.sphere_visible(HANGING_LIGHT_PIVOT, HANGING_LIGHT_RADIUS), self.draw_hanging_light)
+
+    def draw_if_visible(self, visible, draw_function):
+        """
+        Runs draw_function, but only draws its shapes if visible is True.
+        The function still runs when it can't be seen, because the balls move and the spotlight
+        sets up its light while drawing.
+        """
+        if visible:
+            draw_function()
+            return
+        self.basic_shapes.skip_draws = True
+        try:
+            draw_function()
+        finally:
+            self.basic_shapes.skip_draws = False
+
+    def draw_pool_balls(self):
+        self.components.draw_animated_pool_table_scene(Room.in_shooting_mode, Room.shooting_angle, draw_table=False)
+
+    def draw_dice(self):
+        # Dice on the corner table
+        glPushMatrix()  # Save current transformation matrix
+        glTranslatef(-ROOM_WIDTH/2 + 1.3, 0, -ROOM_DEPTH/2 + 1.3)  # Move to corner
+        self.components.draw_table_dice(Room.dice_frame)
+        glPopMatrix()  # Restore previous transformation matrix
+
+    def draw_hanging_light(self):
+        glPushMatrix()  # Save current transformation matrix
+        glTranslatef(0 , ROOM_HEIGHT - 6, 0)  # Move to ceiling
+        hanging_light_equation = Room.swing_factor * math.sin(0.03 * Room.hanging_light_frame)
+        self.components.draw_animated_hanging_spotlight(hanging_light_equation, self.spot_light_is_enabled, self.global_frame, self.spotlight_state, ROOM_HEIGHT)
+        glPopMatrix()  # Restore previous transformation matrix
+
 
 
+    def update(self):
+        """Moves everything that animates forward by one frame (nothing is drawn here)"""
+        self.animate()
+        self.components.update_spotlight(Room.global_frame, Room.spotlight_state)
+        self.components.step_physics(self.frame_time)
+
     def display(self):
         """Main display function"""
+        self.textures.update()  # Upload the textures that finished loading since the last frame
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         
 
         self.camera.setProjection()
         self.camera.placeCamera()
+        self.frustum.update()
+        self.lod.begin_frame()
         
         self.setup_lights()
-        self.show_picture = self.should_we_show_picture()
-        self.animate()
+        show_picture = self.should_we_show_picture()
+        if show_picture != self.show_picture:
+            self.show_picture = show_picture
+            self.static_scene.rebake("picture")
         
-        self.draw_room()
+        # Everything is collected into the render queue and drawn sorted by texture and material
+        self.render_queue.begin()
+        self.static_scene.draw(self.frustum)
         self.draw_components()
+        self.render_queue.end()
         
-        pygame.display.flip()
+        if self.window:
+            pygame.display.flip()
+
 
+    def state_checksum(self):
+        """Checksum of everything the input changes, to check that a replay ends where the recording did"""
+        camera = self.camera
+        return checksum([camera.eye.x, camera.eye.y, camera.eye.z, camera.lookAngle, camera.heightAngle,
+                         Room.in_shooting_mode, Room.shooting_angle, Room.global_frame, Room.dice_frame,
+                         Room.hanging_light_frame, Room.swing_factor, sorted(self.light_states.items()),
+                         sorted(Room.spotlight_state.items()), self.components.physics.snapshot(),
+                         self.components.physics.velocities])
 
-    def run(self):
-        """Set up Pool Balls"""
+    def run(self, recorder=None, replay=None, real_time=True, render=True):
+        """
+        Main game loop.
+        :param recorder: InputRecorder that gets the input of every frame.
+        :param replay: InputLog to play back instead of reading the keyboard.
+        :param real_time: False to play back as fast as possible.
+        :param render: False to skip drawing (the room is still updated every frame).
+        """
+        # Set up Pool Balls
         self.components.config_balls()
-        """Main game loop"""
+        elapsed_ms = round(1000 / FPS)
+        frames = iter(replay.frames) if replay else None
         while self.running:
-            self.handle_input()
-            self.display()
-            self.clock.tick(FPS)
+            if frames is None:
+                frame_input = FrameInput.from_pygame(elapsed_ms)
+            else:
+                pygame.event.pump()  # Keep the window responsive, but ignore the keyboard
+                frame_input = next(frames, None)
+                if frame_input is None:
+                    break
+            if recorder:
+                recorder.record(frame_input)
+
+            self.handle_input(frame_input)
+            self.frame_time = frame_input.elapsed_ms / 1000
+            self.update()
+            if render:
+                self.display()
+            if real_time:
+                elapsed_ms = self.clock.tick(FPS)
+
+
+def seed_argument(text):
+    """--seed: an integer the log header can store"""
+    seed = int(text)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError("the seed must be between 0 and %d" % MAX_SEED)
+    return seed
 
 
 def main():
-    room = Room()
-    room.run()
+    parser = argparse.ArgumentParser(description="Interactive 3D room with a pool table")
+    parser.add_argument("--seed", type=seed_argument, default=None, help="seed for the random numbers (spotlight flicker)")
+    parser.add_argument("--record", metavar="FILE", help="record the input of this session to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded session instead of reading the keyboard")
+    parser.add_argument("--fast", action="store_true", help="play back as fast as possible instead of in real time")
+    parser.add_argument("--no-render", action="store_true", help="play back without drawing anything")
+    parser.add_argument("--texture-budget", type=float, default=DEFAULT_BUDGET / 2**20, metavar="MB",
+                        help="texture memory kept at most, in megabytes")
+    parser.add_argument("--texture-report", action="store_true", help="print how long each texture took to load on exit")
+    parser.add_argument("--load-textures", action="store_true",
+                        help="load every texture at startup (in parallel) instead of the first time it is drawn")
+    args = parser.parse_args()
+
+    replay = InputLog.load(args.replay) if args.replay else None
+    seed = replay.seed if replay else args.seed
+    room = Room(seed, texture_budget=int(args.texture_budget * 2**20), lazy_textures=not args.load_textures)
+    recorder = InputRecorder(room.components.seed) if args.record else None
+
+    start = time.perf_counter()
+    room.run(recorder, replay, real_time=not (replay and args.fast), render=not (replay and args.no_render))
+    elapsed = time.perf_counter() - start
+
+    state = room.state_checksum()
+    if recorder:
+        recorder.save(args.record, state)
+        print("Recorded %d frames to %s (checksum %s)" % (recorder.frame_count, args.record, state))
+    if replay:
+        print("Replayed %d frames in %.2f s (%.1f frames/s)" % (len(replay.frames), elapsed, len(replay.frames) / elapsed))
+        print("Checksum %s: %s" % (state, "matches the recording" if state == replay.checksum else "DIFFERS from " + replay.checksum))
+    if args.texture_report:
+        print("\n".join(room.textures.load_report()))
+    room.textures.shutdown()
     pygame.quit()
 
 
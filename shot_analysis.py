@@ -0,0 +1,104 @@
+"""
+This module simulates batches of pool shots without a window, for "what-if" analysis.
+
+Each shot starts from the same layout (by default the one config_balls sets up) and is resolved
+with the EventSimulator the game uses, so the results match what you would see in the room.
+Big batches are split into chunks and spread over a pool of processes. Nothing here uses OpenGL
+or pygame, so it runs on machines without a display.
+
+Example usage:
+shots = [(angle, SHOT_SPEED) for angle in range(360)]   # (angle in degrees, speed in ft/s)
+for result in simulate_shots(DEFAULT_LAYOUT, shots):
+    print(result.angle, result.time_to_rest, result.contacts, result.final_positions)
+
+Or from the command line (every angle 0-359 at the game's shot speed):
+python shot_analysis.py --angles 0 360 1 --speeds 24
+"""
+
+import argparse
+import multiprocessing
+import os
+import numpy as np
+from event_sim import EventSimulator
+from physics import BALL_RADIUS, TABLE_LENGTH, TABLE_WIDTH, SHOT_SPEED, DEFAULT_LAYOUT
+
+# Shots simulated by a worker process at a time (bigger chunks send fewer messages between processes)
+CHUNK_SIZE = 256
+
+
+class ShotResult:
+    """What happened in one shot"""
+
+    def __init__(self, angle, speed, final_positions, contacts, cushions, time_to_rest, events):
+        self.angle = angle
+        self.speed = speed
+        self.final_positions = final_positions  # (n, 2) array of position_x, position_z once the balls stop
+        self.contacts = contacts  # (time, first, second) of every ball-ball hit, in order
+        self.cushions = cushions  # Number of cushion bounces
+        self.time_to_rest = time_to_rest  # Seconds until every ball stopped (inf if it never settled)
+        self.events = events  # Events the simulator handled
+
+    def __str__(self):
+        return "ShotResult(angle=%g, speed=%g, contacts=%d, cushions=%d, time_to_rest=%.3f)" \
+            % (self.angle, self.speed, len(self.contacts), self.cushions, self.time_to_rest)
+
+
+def simulate_shot(layout, angle, speed=SHOT_SPEED, cue_index=0,
+                  radius=BALL_RADIUS, length=TABLE_LENGTH, width=TABLE_WIDTH):
+    """Shoots the ball at cue_index from layout and runs the simulation until every ball is at rest"""
+    simulator = EventSimulator(layout, radius, length, width)
+    simulator.shoot(cue_index, angle, speed)
+    events = simulator.run()
+    contacts = [(time, first, second) for time, kind, first, second in simulator.events if kind == "ball"]
+    cushions = sum(1 for event in simulator.events if event[1] == "cushion")
+    time_to_rest = np.inf if simulator.is_moving() else simulator.time
+    return ShotResult(angle, speed, simulator.positions.copy(), contacts, cushions, time_to_rest, events)
+
+
+def simulate_chunk(arguments):
+    """Worker function: simulates a list of (angle, speed) shots from the same layout"""
+    layout, shots, cue_index, table = arguments
+    return [simulate_shot(layout, angle, speed, cue_index, *table) for angle, speed in shots]
+
+
+def simulate_shots(layout, shots, cue_index=0, processes=None, chunk_size=CHUNK_SIZE,
+                   radius=BALL_RADIUS, length=TABLE_LENGTH, width=TABLE_WIDTH):
+    """
+    Simulates every shot from layout and returns a ShotResult for each, in the same order.
+    :param shots: (angle, speed) pairs; angle in degrees, speed in ft/s (SHOT_SPEED is the game's shot).
+    :param processes: Worker processes to use (default: one per CPU). Batches of a single chunk,
+                      or processes=1, run in this process.
+    """
+    layout = np.asarray(layout, dtype=np.float64).reshape(-1, 4)
+    shots = [(float(angle), float(speed)) for angle, speed in shots]
+    table = (radius, length, width)
+    chunks = [(layout, shots[start:start + chunk_size], cue_index, table)
+              for start in range(0, len(shots), chunk_size)]
+
+    processes = min(processes or os.cpu_count() or 1, len(chunks))
+    if processes <= 1:
+        return [result for chunk in chunks for result in simulate_chunk(chunk)]
+    with multiprocessing.Pool(processes) as pool:
+        return [result for results in pool.imap(simulate_chunk, chunks) for result in results]
+
+
+def sweep(angles, speeds):
+    """Every combination of the given angles and speeds, as a list of (angle, speed) shots"""
+    return [(angle, speed) for angle in angles for speed in speeds]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a sweep of pool shots from the starting layout")
+    parser.add_argument("--angles", type=float, nargs=3, default=(0, 360, 1), metavar=("START", "STOP", "STEP"),
+                        help="range of shot angles in degrees")
+    parser.add_argument("--speeds", type=float, nargs="+", default=[SHOT_SPEED], help="shot speeds in ft/s")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    shots = sweep(np.arange(*args.angles), args.speeds)
+    for result in simulate_shots(DEFAULT_LAYOUT, shots, processes=args.processes):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+This class bakes the parts of the scene that never move (walls, floor, tables, ...) into a few
+world-space vertex buffers, so they can be drawn every frame without walking through all of the
+glPushMatrix/glTranslate/glRotate calls that place them.
+
+Baking runs the normal draw functions once while BasicShapes records every mesh instead of drawing it.
+Each recorded mesh is moved into world space on the CPU (using the modelview matrix at the time it was
+drawn) and merged with the other meshes that use the same texture and material (and, for shapes
+drawn without lighting, the same colour). Only that state is kept: the material, the bound texture,
+GL_LIGHTING and the current colour, read back from OpenGL when each mesh is recorded.
+
+Example usage:
+static_scene = StaticScene(basic_shapes, textures)
+static_scene.add("room", draw_room)             # Any function that draws with basic_shapes
+static_scene.draw()                             # Bakes on the first call, then just draws the buffers
+static_scene.draw(frustum)                      # Skips the sections the camera can't see
+static_scene.rebake("room")                     # Call when something in a section changes
+"""
+
+import numpy as np
+from OpenGL.GL import *
+from materials import Materials
+from mesh_cache import Mesh
+from mesh_generator import strip_to_triangles
+from render_queue import RenderQueue, set_lighting, set_color
+from frustum import Bounds
+
+
+class SceneRecorder:
+    """Collects the meshes drawn by BasicShapes, transformed to world space and grouped by (texture, material, colour)"""
+
+    def __init__(self):
+        self.groups = {}  # (texture, material values, colour) -> ([vertex arrays], [index arrays], vertex count)
+
+    def record(self, mesh, first=0, count=None):
+        if count is None:
+            count = len(mesh.indices) - first
+        indices = mesh.indices[first:first + count]
+        if mesh.mode == GL_TRIANGLE_STRIP:
+            triangles = strip_to_triangles(indices)
+        else:
+            triangles = indices.reshape(-1, 3)
+        if len(triangles) == 0:
+            return
+
+        # Only keep the vertices used by this range
+        used, triangles = np.unique(triangles, return_inverse=True)
+        vertices = mesh.vertices[used].astype(np.float64)
+
+        # OpenGL returns the matrix column by column, so this is already the transpose we need for row vectors
+        modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4)
+        rotation = modelview[:3, :3]
+        vertices[:, 0:3] = vertices[:, 0:3] @ rotation + modelview[3, :3]
+        normals = vertices[:, 3:6] @ np.linalg.inv(rotation).T
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        vertices[:, 3:6] = normals / np.where(lengths == 0, 1, lengths)
+
+        key = (self.current_texture(), self.current_material(), self.current_color())
+        vertex_list, index_list, vertex_count = self.groups.get(key, ([], [], 0))
+        vertex_list.append(vertices.astype(np.float32))
+        index_list.append(triangles.reshape(-1).astype(np.uint32) + vertex_count)
+        self.groups[key] = (vertex_list, index_list, vertex_count + len(vertices))
+
+    def current_texture(self):
+        """The bound texture, or None if texturing is off"""
+        if not glIsEnabled(GL_TEXTURE_2D):
+            return None
+        return int(glGetIntegerv(GL_TEXTURE_BINDING_2D))
+
+    def current_color(self):
+        """The (r, g, b) colour of a shape drawn without lighting, or None if lighting is on"""
+        if glIsEnabled(GL_LIGHTING):
+            return None
+        return tuple(float(v) for v in glGetFloatv(GL_CURRENT_COLOR)[:3])
+
+    def current_material(self):
+        """The front material as a hashable tuple of (ambient, diffuse, specular, shininess)"""
+        return (
+            tuple(float(v) for v in glGetMaterialfv(GL_FRONT, GL_AMBIENT)),
+            tuple(float(v) for v in glGetMaterialfv(GL_FRONT, GL_DIFFUSE)),
+            tuple(float(v) for v in glGetMaterialfv(GL_FRONT, GL_SPECULAR)),
+            float(np.ravel(glGetMaterialfv(GL_FRONT, GL_SHININESS))[0]),
+        )
+
+
+class StaticBatch:
+    """One merged world-space mesh, drawn with a single texture and material"""
+
+    def __init__(self, texture, material, mesh, color=None):
+        self.texture = texture
+        self.material = material
+        self.mesh = mesh
+        self.color = color  # (r, g, b) drawn without lighting, or None when lit
+
+
+class StaticScene:
+
+    def __init__(self, basic_shapes, textures):
+        self.basic_shapes = basic_shapes
+        self.textures = textures
+        self.sections = {}  # name -> draw function, in the order they were added
+        self.batches = {}   # name -> list of StaticBatch
+        self.bounds = {}    # name -> Bounds of everything in the section (None if it is empty)
+        self.dirty = set()  # names of the sections that need to be baked
+
+    def add(self, name, draw_function):
+        """Add a section of static scenery, drawn by draw_function() (it will be baked on the next draw)"""
+        self.sections[name] = draw_function
+        self.dirty.add(name)
+
+    def rebake(self, name=None):
+        """Mark one section (or every section) to be baked again on the next draw"""
+        if name is None:
+            self.dirty.update(self.sections)
+        else:
+            self.dirty.add(name)
+
+    def bake(self):
+        """Bake every section that is marked dirty"""
+        for name in [name for name in self.sections if name in self.dirty]:
+            self.bake_section(name)
+        self.dirty.clear()
+
+    def bake_section(self, name):
+        for batch in self.batches.pop(name, []):
+            batch.mesh.delete()
+
+        recorder = SceneRecorder()
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()  # Record in world space
+
+        # Materials and textures have to really be set while recording, so pause any active render queue
+        queue = RenderQueue.active
+        RenderQueue.active = None
+        self.basic_shapes.recorder = recorder
+        try:
+            self.sections[name]()
+        finally:
+            self.basic_shapes.recorder = None
+            RenderQueue.active = queue
+            glPopMatrix()
+
+        batches = []
+        bounds = None
+        for (texture, material, color), (vertex_list, index_list, _) in recorder.groups.items():
+            mesh = Mesh(np.concatenate(vertex_list), np.concatenate(index_list), GL_TRIANGLES)
+            mesh.upload()
+            bounds = Bounds.from_vertices(mesh.vertices).union(bounds)
+            batches.append(StaticBatch(texture, Materials.Material(*[list(values) for values in material[:3]], material[3]),
+                                       mesh, color))
+
+        # Draw batches with the same texture one after another
+        batches.sort(key=lambda batch: -1 if batch.texture is None else batch.texture)
+        self.batches[name] = batches
+        self.bounds[name] = bounds
+
+    def draw(self, frustum=None):
+        """Draw every section (baking the dirty ones first), skipping the ones outside the frustum if one is given"""
+        if self.dirty:
+            self.bake()
+        for name, batches in self.batches.items():
+            if not batches or (frustum is not None and not frustum.box_visible(self.bounds[name])):
+                continue
+            for batch in batches:
+                Materials.set_material(GL_FRONT, batch.material)
+                if batch.texture is not None:
+                    self.textures.set_texture(batch.texture)
+                if batch.color is not None:
+                    set_lighting(False)
+                    set_color(*batch.color)
+                self.basic_shapes.draw_mesh(batch.mesh)  # Goes into the render queue when one is active
+                if batch.color is not None:
+                    set_lighting(True)
+
+    @property
+    def draw_calls(self):
+        return sum(len(batches) for batches in self.batches.values())
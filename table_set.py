@@ -0,0 +1,163 @@
+"""
+This class simulates many independent pool tables at once.
+
+The ball states of all the tables are kept in NumPy arrays with the table as the first dimension
+((tables, balls, 2) for positions and velocities), and step() moves every table with the same
+handful of array operations PoolPhysics uses for one table. Tables where every ball is asleep are
+left out of the step. Each table only has a few balls, so every pair on a table is tested.
+
+Example usage:
+tables = TableSet(1000)                          # 1000 tables, all with the default layout
+tables.shoot(7, 0, 45)                           # Table 7: cue ball (index 0) at 45 degrees
+tables.shoot(np.arange(1000), 0, angles)         # Or a shot on every table at once
+while tables.is_moving():
+    tables.step(PHYSICS_DT)
+tables.state(7)                                  # (balls, 4) array of position_x, position_z, rotation_x, rotation_z
+"""
+
+import numpy as np
+from physics import BALL_RADIUS, TABLE_LENGTH, TABLE_WIDTH, SHOT_SPEED, FRICTION_PER_SECOND, STOP_SPEED, \
+    ROLL_RATE, DEFAULT_LAYOUT
+
+
+class TableSet:
+
+    def __init__(self, count, layout=DEFAULT_LAYOUT, radius=BALL_RADIUS, length=TABLE_LENGTH, width=TABLE_WIDTH):
+        """
+        :param count: Number of tables.
+        :param layout: (position_x, position_z, rotation_x, rotation_z) of each ball, the same for
+                       every table, or a (count, balls, 4) array with a layout per table.
+        """
+        layout = np.asarray(layout, dtype=np.float64)
+        if layout.ndim < 3:
+            layout = layout.reshape(1, -1, 4)
+        layout = np.broadcast_to(layout, (count,) + layout.shape[1:])
+        self.radius = radius
+        self.positions = layout[:, :, 0:2].copy()              # (tables, balls, 2): x, z
+        self.rotations = layout[:, :, 2:4].copy()              # (tables, balls, 2): rotation_x, rotation_z
+        self.velocities = np.zeros(self.positions.shape)       # (tables, balls, 2): ft/s along x, z
+        self.awake = np.zeros(self.positions.shape[:2], dtype=bool)  # (tables, balls): balls that are moving
+
+        # Confine the balls to the table
+        self.minimum = np.array([-length / 2 + radius, -width / 2 + radius])
+        self.maximum = np.array([length / 2 - radius, width / 2 - radius])
+
+        self.pairs = np.triu_indices(self.positions.shape[1], 1)  # Every pair of balls on a table
+
+        self.time = 0.0  # Seconds simulated
+        self.contacts = 0  # Ball-ball hits resolved in the last step, on all tables
+        self.tables_stepped = 0  # Tables that had a ball moving in the last step
+
+    def __len__(self):
+        return len(self.positions)
+
+    def shoot(self, tables, index, angle, speed=SHOT_SPEED):
+        """Push ball index on the given tables in the direction of angle (degrees); all of them can be arrays"""
+        tables, index, angle, speed = np.broadcast_arrays(tables, index, np.radians(angle), speed)
+        self.velocities[tables, index, 0] = speed * np.cos(angle)
+        self.velocities[tables, index, 1] = -speed * np.sin(angle)
+        self.awake[tables, index] = speed != 0
+
+    def reset(self, tables, layout=DEFAULT_LAYOUT):
+        """Put the balls of the given tables back to layout, at rest"""
+        layout = np.asarray(layout, dtype=np.float64).reshape(-1, 4)
+        self.positions[tables] = layout[:, 0:2]
+        self.rotations[tables] = layout[:, 2:4]
+        self.velocities[tables] = 0
+        self.awake[tables] = False
+
+    def is_moving(self, table=None):
+        """True if a ball is moving on the table (on any table by default)"""
+        if table is None:
+            return bool(self.awake.any())
+        return bool(self.awake[table].any())
+
+    def state(self, table):
+        """(balls, 4) array of position_x, position_z, rotation_x, rotation_z of one table"""
+        return np.hstack([self.positions[table], self.rotations[table]])
+
+    def snapshot(self):
+        """(tables, balls, 4) array with the state of every table"""
+        return np.concatenate([self.positions, self.rotations], axis=2)
+
+    #==============================
+    # Simulation
+    #==============================
+
+    def step(self, dt):
+        """Advance every table by dt seconds"""
+        self.time += dt
+        self.contacts = 0
+        active = np.nonzero(self.awake.any(axis=1))[0]
+        self.tables_stepped = len(active)
+        if len(active) == 0:
+            return  # Everything is asleep
+
+        # Work on views when every table is moving, otherwise on copies of the moving tables
+        every_table = len(active) == len(self)
+        tables = slice(None) if every_table else active
+        positions, rotations = self.positions[tables], self.rotations[tables]
+        velocities, awake = self.velocities[tables], self.awake[tables]
+
+        self.move_balls(positions, rotations, velocities, awake, dt)
+        self.bounce_off_cushions(positions, velocities)
+        self.collide_balls(positions, velocities, awake)
+
+        if not every_table:
+            self.positions[active], self.rotations[active] = positions, rotations
+            self.velocities[active], self.awake[active] = velocities, awake
+
+    def move_balls(self, positions, rotations, velocities, awake, dt):
+        speeds = np.hypot(velocities[..., 0], velocities[..., 1])
+        positions += velocities * dt  # Sleeping balls have no velocity
+
+        # A moving ball turns at the same rate whatever its speed (rotation_x follows z, rotation_z follows x)
+        rotations[awake] += velocities[awake][:, ::-1] / speeds[awake][:, None] * ROLL_RATE * dt
+
+        # Slow down, and stop once the ball is barely moving
+        velocities *= FRICTION_PER_SECOND ** dt
+        stopped = awake & (speeds * FRICTION_PER_SECOND ** dt < STOP_SPEED)
+        velocities[stopped] = 0
+        awake[stopped] = False
+
+    def bounce_off_cushions(self, positions, velocities):
+        """Reverse the velocity of balls that reached a cushion while moving into it"""
+        past_max = (positions >= self.maximum) & (velocities > 0)
+        past_min = (positions <= self.minimum) & (velocities < 0)
+        velocities[past_max | past_min] *= -1
+
+    def collide_balls(self, positions, velocities, awake):
+        """Elastic hits between equal-mass balls: they swap their velocities along the line between the centers"""
+        first, second = self.pairs
+        offsets = positions[:, second] - positions[:, first]
+        touching = np.einsum("tpk,tpk->tp", offsets, offsets) < (2 * self.radius) ** 2
+        touching &= awake[:, first] | awake[:, second]  # Two sleeping balls can't hit each other
+        table, pair = np.nonzero(touching)
+        if len(table) == 0:
+            return
+        first, second = first[pair], second[pair]
+
+        normals = offsets[table, pair]
+        distances = np.hypot(normals[:, 0], normals[:, 1])
+        distances[distances == 0] = 1e-9
+        normals /= distances[:, None]
+
+        # Only pairs moving towards each other are hit (pairs that are already separating are left alone)
+        closing = np.einsum("ij,ij->i", velocities[table, first] - velocities[table, second], normals)
+        hit = closing > 0
+        table, first, second = table[hit], first[hit], second[hit]
+        normals, distances, closing = normals[hit], distances[hit], closing[hit]
+        self.contacts += len(table)
+        if len(table) == 0:
+            return
+
+        impulses = normals * closing[:, None]
+        np.add.at(velocities, (table, first), -impulses)
+        np.add.at(velocities, (table, second), impulses)
+        for balls in (first, second):  # A sleeping ball that gets hit starts moving
+            awake[table, balls] = np.any(velocities[table, balls] != 0, axis=1)
+
+        # Push overlapping balls apart so they don't stay stuck together
+        overlap = (2 * self.radius - distances)[:, None] * normals / 2
+        np.add.at(positions, (table, first), -overlap)
+        np.add.at(positions, (table, second), overlap)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from atlas import TextureAtlas, remap_tex_coords
+from mipmaps import build_mipmaps
+
+QUAD = [(0, 0), (1, 0), (1, 1), (0, 1)]
+
+
+def solid(height, width, value):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def pixel_rect(atlas, index):
+    """(left, top, right, bottom) of an image in atlas pixels"""
+    s0, t0, s1, t1 = atlas.rects[index]
+    return round(s0 * atlas.width), round(t0 * atlas.height), round(s1 * atlas.width), round(t1 * atlas.height)
+
+
+def test_remap_tex_coords():
+    assert remap_tex_coords(QUAD, (0.25, 0.5, 0.75, 1.0)) == [(0.25, 0.5), (0.75, 0.5), (0.75, 1.0), (0.25, 1.0)]
+    assert remap_tex_coords([(0.5, 0.5)], (0.0, 0.0, 0.5, 0.25)) == [(0.25, 0.125)]
+
+
+def test_levels_follow_the_padding():
+    assert TextureAtlas([(16, 16)], padding=8).levels == 4
+    assert TextureAtlas([(16, 16)], padding=2).levels == 2
+    assert TextureAtlas([(16, 16)], padding=0).levels == 1
+
+
+def test_rects_leave_the_padding_around_each_image():
+    atlas = TextureAtlas([(32, 32)] * 6, padding=8)
+    for index in range(6):
+        left, top, right, bottom = pixel_rect(atlas, index)
+        assert (right - left, bottom - top) == (32, 32)
+        x, y, cell_width, cell_height = atlas.cells[index]
+        assert (left - x, top - y) == (8, 8)
+        assert x + cell_width - right >= 8 and y + cell_height - bottom >= 8
+
+    # No two cells overlap
+    covered = np.zeros((atlas.height, atlas.width), dtype=int)
+    for x, y, cell_width, cell_height in atlas.cells:
+        covered[y:y + cell_height, x:x + cell_width] += 1
+    assert covered.max() == 1
+
+
+def test_sizes_line_up_in_every_mipmap_level():
+    atlas = TextureAtlas([(30, 20), (10, 50), (7, 7)], padding=8)
+    align = 2 ** atlas.levels
+    assert atlas.width % align == 0 and atlas.height % align == 0
+    for x, y, cell_width, cell_height in atlas.cells:
+        assert x % align == 0 and y % align == 0 and cell_width % align == 0 and cell_height % align == 0
+
+
+def test_large_images_are_halved_to_the_tile_size():
+    atlas = TextureAtlas([(1024, 2048), (300, 100)], tile_size=512)
+    assert atlas.tile_sizes == [(256, 512), (300, 100)]
+
+
+def test_pack_places_each_image_in_its_rect_with_edge_borders():
+    images = [solid(16, 16, 10 * (index + 1)) for index in range(6)]
+    images[0][0, :] = 200  # A different top row, repeated into the border above
+    atlas = TextureAtlas([image.shape[:2] for image in images], padding=8)
+    packed = atlas.pack(images)
+    assert packed.shape == (atlas.height, atlas.width, 3)
+    for index, image in enumerate(images):
+        left, top, right, bottom = pixel_rect(atlas, index)
+        assert np.array_equal(packed[top:bottom, left:right], image)
+    left, top, right, bottom = pixel_rect(atlas, 0)
+    assert (packed[top - 8:top, left:right] == 200).all()
+    assert (packed[bottom:bottom + 8, left:right] == 10).all()
+
+
+def test_uploaded_levels_keep_the_images_apart():
+    # Down to the last level uploaded, every texel inside an image's rect comes from that image only
+    images = [solid(32, 32, 40 * (index + 1)) for index in range(6)]
+    atlas = TextureAtlas([image.shape[:2] for image in images], padding=8)
+    levels = build_mipmaps(atlas.pack(images), atlas.levels)
+    assert len(levels) == atlas.levels
+    for level, pixels in enumerate(levels):
+        assert pixels.shape[:2] == (atlas.height >> level, atlas.width >> level)
+        for index in range(6):
+            left, top, right, bottom = (value >> level for value in pixel_rect(atlas, index))
+            border = max(1, 8 >> level)
+            assert (pixels[top - border:bottom + border, left - border:right + border] == 40 * (index + 1)).all()
+
+
+def test_pack_rejects_images_of_another_size():
+    atlas = TextureAtlas([(16, 16)])
+    with pytest.raises(ValueError):
+        atlas.pack([solid(8, 8, 0)])
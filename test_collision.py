@@ -0,0 +1,50 @@
+from collision import Collision, CollisionGrid
+from utils import Point
+
+
+def test_point_inside_matches_the_collider():
+    grid = CollisionGrid(cell_size=2.0)
+    grid.add(Collision(8, 4, 0, 0))  # x from -4 to 4, z from -2 to 2
+    assert grid.point_inside(Point(0, 0, 0))
+    assert grid.point_inside(Point(3.9, 0, -1.9))
+    assert not grid.point_inside(Point(4.1, 0, 0))
+    assert not grid.point_inside(Point(0, 0, 10))
+
+
+def test_points_on_the_bounds_are_outside():
+    # Collision.pointInside is strict, and the grid keeps that even where a bound lies on a cell edge
+    grid = CollisionGrid(cell_size=2.0)
+    grid.add(Collision(4, 4, 0, 0))  # Bounds at -2 and 2, on cell edges
+    assert not grid.point_inside(Point(2, 0, 0))
+    assert not grid.point_inside(Point(-2, 0, 0))
+    assert not grid.point_inside(Point(0, 0, 2))
+    assert grid.point_inside(Point(1.999, 0, -1.999))
+
+
+def test_collider_is_stored_in_every_cell_it_overlaps():
+    grid = CollisionGrid(cell_size=2.0)
+    box = grid.add(Collision(3, 1, 1, 0.5))  # x from -0.5 to 2.5, z from 0 to 1
+    assert sorted(grid.cells) == [(-1, 0), (0, 0), (1, 0)]
+    assert all(grid.cells[cell] == [box] for cell in grid.cells)
+
+
+def test_add_twice_and_remove():
+    grid = CollisionGrid()
+    box = Collision(1, 1, 0, 0)
+    assert grid.add(box) is box
+    grid.add(box)
+    assert len(grid) == 1 and box in grid
+    assert grid.remove(box)
+    assert not grid.remove(box)
+    assert len(grid) == 0 and grid.cells == {}
+    assert not grid.point_inside(Point(0, 0, 0))
+
+
+def test_move_updates_bounds_and_cells():
+    grid = CollisionGrid(cell_size=2.0)
+    box = grid.add(Collision(1, 1, 0, 0))
+    grid.move(box, 10, -10)
+    assert (box.leftBound, box.rightBound, box.backBound, box.frontBound) == (9.5, 10.5, -10.5, -9.5)
+    assert not grid.point_inside(Point(0, 0, 0))
+    assert grid.point_inside(Point(10, 0, -10))
+    assert sorted(grid.cells) == [(4, -6), (4, -5), (5, -6), (5, -5)]
@@ -0,0 +1,111 @@
+import math
+import numpy as np
+from event_sim import EventSimulator, DECAY, distance_to_time, time_to_distance
+from physics import BALL_RADIUS, STOP_SPEED
+
+
+def test_distance_and_time_are_inverses():
+    for t in (0.0, 0.01, 0.5, 3.0):
+        assert math.isclose(distance_to_time(time_to_distance(t)), t, abs_tol=1e-12)
+    assert distance_to_time(1 / DECAY) == math.inf  # Friction stops the ball before it gets that far
+
+
+def test_stop_time():
+    simulator = EventSimulator([(0, 0, 0, 0)], length=1000, width=1000)
+    simulator.shoot(0, 0, speed=10)
+    time, kind, ball, _ = simulator.next_event()
+    assert (kind, ball) == ("stop", 0)
+    assert math.isclose(time, math.log(10 / STOP_SPEED) / DECAY)
+
+
+def test_cushion_time_and_bounce():
+    simulator = EventSimulator([(0, 0, 0, 0)], length=10, width=4)
+    simulator.shoot(0, 0, speed=20)  # Straight along +x
+    time, kind, ball, axis = simulator.next_event()
+    assert (kind, ball, axis) == ("cushion", 0, 0)
+    assert math.isclose(time, distance_to_time((5 - BALL_RADIUS) / 20))
+
+    simulator.advance_to(time)
+    assert math.isclose(simulator.positions[0, 0], 5 - BALL_RADIUS)
+    assert simulator.velocities[0, 0] < 0
+
+
+def test_head_on_hit_time_and_exchange():
+    simulator = EventSimulator([(-2, 0, 0, 0), (2, 0, 0, 0)], length=100, width=100)
+    simulator.shoot(0, 0, speed=10)
+    time, kind, first, second = simulator.next_event()
+    assert (kind, first, second) == ("ball", 0, 1)
+    assert math.isclose(time, distance_to_time((4 - 2 * BALL_RADIUS) / 10))
+
+    speed = 10 * math.exp(-DECAY * time)
+    simulator.advance_to(time)
+    assert math.isclose(simulator.positions[1, 0] - simulator.positions[0, 0], 2 * BALL_RADIUS)
+    assert np.allclose(simulator.velocities, [[0, 0], [speed, 0]])
+
+
+def test_fast_ball_does_not_tunnel():
+    # At this speed the ball covers many diameters in a 1/60 s step, but the hit is still found
+    simulator = EventSimulator([(-20, 0, 0, 0), (0, 0, 0, 0)], length=100, width=100)
+    simulator.shoot(0, 0, speed=2000)
+    simulator.advance(1 / 60)
+    assert simulator.events[0][1:] == ("ball", 0, 1)
+    assert simulator.positions[0, 0] < simulator.positions[1, 0] - 2 * BALL_RADIUS + 1e-9
+    assert simulator.velocities[1, 0] > 0
+
+
+def test_advancing_frame_by_frame_matches_running_the_shot():
+    by_frames = EventSimulator()
+    by_frames.shoot(0, 20)
+    while by_frames.is_moving():
+        by_frames.advance(1 / 60)
+
+    at_once = EventSimulator()
+    at_once.shoot(0, 20)
+    at_once.run()
+    assert [event[1:] for event in by_frames.events] == [event[1:] for event in at_once.events]
+    assert np.allclose(by_frames.positions, at_once.positions)
+
+
+def test_moving_keeps_the_arrays():
+    # PoolBall views into positions and rotations stay valid while the balls move
+    simulator = EventSimulator()
+    positions, rotations = simulator.positions, simulator.rotations
+    view = positions[0]
+    simulator.shoot(0, 45)
+    simulator.advance(0.5)
+    assert simulator.positions is positions and simulator.rotations is rotations
+    assert np.array_equal(view, simulator.positions[0])
+
+
+def test_sweep_and_prune_finds_the_same_events_as_all_pairs():
+    # 200 balls on a jittered grid (so none start out touching), most of them at rest
+    rng = np.random.default_rng(0)
+    x, z = np.meshgrid(np.arange(-9.5, 10), np.arange(-4.5, 5))
+    layout = np.zeros((200, 4))
+    layout[:, :2] = np.column_stack([x.ravel(), z.ravel()]) + rng.uniform(-0.25, 0.25, (200, 2))
+    velocities = rng.normal(0, 5, (200, 2)) * (rng.random((200, 1)) < 0.3)
+
+    simulators = []
+    for broad_phase in ("sweep_and_prune", "all_pairs"):
+        simulator = EventSimulator(layout, length=21, width=11, broad_phase=broad_phase)
+        simulator.velocities[:] = velocities
+        simulator.wake()
+        simulator.advance(0.5)
+        simulators.append(simulator)
+    sweep, all_pairs = simulators
+    assert [event[1:] for event in sweep.events] == [event[1:] for event in all_pairs.events]
+    assert any(event[1] == "ball" for event in sweep.events)
+    assert np.allclose(sweep.positions, all_pairs.positions)
+    assert sweep.pairs_tested < all_pairs.pairs_tested
+
+
+def test_only_hit_balls_wake_up():
+    simulator = EventSimulator([(-2, 0, 0, 0), (0, 0, 0, 0), (0, 1.5, 0, 0)], length=100, width=100)
+    simulator.shoot(0, 0, speed=10)
+    assert simulator.awake.tolist() == [True, False, False]
+
+    simulator.advance_to(simulator.next_event()[0])  # Head-on: the cue ball stops, ball 1 takes its speed
+    assert simulator.awake.tolist() == [False, True, False]
+    simulator.run()
+    assert not simulator.awake.any() and simulator.next_event() is None
+    assert simulator.positions[2].tolist() == [0, 1.5]
@@ -0,0 +1,102 @@
+import numpy as np
+from mesh_generator import grid_strip_indices, join_strips, strip_to_triangles, plane_grid_arrays, box_grid_arrays, \
+    sphere_arrays, cylinder_arrays
+
+
+def test_join_strips_repeats_the_ends():
+    joined = join_strips([[0, 1, 2, 3], [4, 5, 6, 7]])
+    assert joined.tolist() == [0, 1, 2, 3, 3, 4, 4, 5, 6, 7]
+    assert joined.dtype == np.uint32
+
+
+def test_join_strips_with_one_or_no_strips():
+    assert join_strips([[0, 1, 2, 3]]).tolist() == [0, 1, 2, 3]
+    assert len(join_strips([])) == 0
+
+
+def test_joined_strips_draw_only_the_strips_triangles():
+    # The degenerate triangles at the joins are dropped, and nothing else is added
+    first, second = [0, 1, 2, 3], [4, 5, 6, 7]
+    joined = strip_to_triangles(join_strips([first, second]))
+    separate = np.concatenate([strip_to_triangles(first), strip_to_triangles(second)])
+    assert joined.tolist() == separate.tolist()
+
+
+def test_joined_strips_keep_the_winding():
+    # Strip triangles alternate direction; with even-length strips the second strip starts the same way
+    triangles = strip_to_triangles(join_strips([[0, 1, 2, 3], [4, 5, 6, 7]]))
+    assert triangles.tolist() == [[0, 1, 2], [2, 1, 3], [4, 5, 6], [6, 5, 7]]
+
+
+def test_grid_strip_covers_every_cell_once():
+    rows, cols = 3, 4
+    triangles = strip_to_triangles(grid_strip_indices(rows, cols))
+    assert len(triangles) == 2 * rows * cols
+    assert len({tuple(sorted(triangle)) for triangle in triangles.tolist()}) == 2 * rows * cols
+    assert triangles.max() == (rows + 1) * (cols + 1) - 1
+
+
+def test_plane_triangles_all_wind_the_same_way():
+    vertices, indices = plane_grid_arrays(4, 2, 3, 3)
+    corners = vertices[strip_to_triangles(indices), 0:3].astype(np.float64)
+    facing = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])[:, 1]
+    assert (facing > 0).all() or (facing < 0).all()
+    assert np.allclose(vertices[:, 3:6], [0, 1, 0])
+
+
+def test_box_is_one_strip_over_six_faces():
+    rows, cols = 2, 3
+    vertices, indices = box_grid_arrays(2, 2, 2, rows, cols)
+    assert len(vertices) == 6 * (rows + 1) * (cols + 1)
+    triangles = strip_to_triangles(indices)
+    assert len(triangles) == 6 * 2 * rows * cols
+
+    # No triangle joins two faces
+    face_size = (rows + 1) * (cols + 1)
+    faces = triangles // face_size
+    assert (faces == faces[:, :1]).all()
+
+
+def facing(vertices, indices):
+    """Each non-degenerate triangle's winding compared with its vertex normals (+ counter-clockwise seen from them)"""
+    triangles = strip_to_triangles(indices)
+    corners = vertices[triangles, 0:3].astype(np.float64)
+    crosses = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(crosses, axis=1)
+    normals = vertices[triangles, 3:6].sum(axis=1)
+    return np.einsum("ij,ij->i", crosses, normals)[areas > 1e-6]
+
+
+def test_sphere_counts_and_normals():
+    slices, stacks = 8, 5
+    vertices, indices = sphere_arrays(slices, stacks)
+    assert len(vertices) == (stacks + 1) * (slices + 1)
+    triangles = strip_to_triangles(indices)
+    assert len(triangles) == 2 * stacks * slices
+    assert triangles.max() == len(vertices) - 1
+
+    assert np.allclose(np.linalg.norm(vertices[:, 0:3], axis=1), 1, atol=1e-6)
+    assert np.allclose(vertices[:, 3:6], vertices[:, 0:3])  # Unit normals pointing out
+
+
+def test_sphere_triangles_all_wind_the_same_way():
+    signs = np.sign(facing(*sphere_arrays(8, 5)))
+    assert len(signs) > 0 and (signs == signs[0]).all()
+
+
+def test_cylinder_counts_and_normals():
+    slices, stacks = 6, 3
+    vertices, indices = cylinder_arrays(slices, stacks, bottom_radius=2.0, top_radius=1.0)
+    assert len(vertices) == (stacks + 1) * (slices + 1)
+    assert len(strip_to_triangles(indices)) == 2 * stacks * slices
+
+    radii = np.hypot(vertices[:, 0], vertices[:, 1])
+    assert np.allclose(radii[vertices[:, 2] == 0], 2) and np.allclose(radii[vertices[:, 2] == 1], 1)
+    assert np.allclose(np.linalg.norm(vertices[:, 3:6], axis=1), 1, atol=1e-6)
+    assert (vertices[:, 5] > 0).all()  # Narrower at the top, so the side faces up a little
+
+
+def test_cylinder_triangles_all_wind_the_same_way():
+    for bottom_radius, top_radius in ((1.0, 1.0), (1.0, 0.0)):
+        signs = np.sign(facing(*cylinder_arrays(6, 3, bottom_radius, top_radius)))
+        assert len(signs) > 0 and (signs == signs[0]).all()
@@ -0,0 +1,36 @@
+import numpy as np
+from mipmaps import build_mipmaps, downsample
+
+
+def sizes(levels):
+    return [level.shape[:2] for level in levels]
+
+
+def test_level_sizes_round_down_to_one():
+    image = np.zeros((3, 5, 3), dtype=np.uint8)
+    assert sizes(build_mipmaps(image)) == [(3, 5), (1, 2), (1, 1)]
+
+
+def test_long_thin_image_keeps_halving_the_long_side():
+    image = np.zeros((1, 8, 3), dtype=np.uint8)
+    assert sizes(build_mipmaps(image)) == [(1, 8), (1, 4), (1, 2), (1, 1)]
+
+
+def test_downsample_averages_two_by_two_blocks():
+    image = np.array([[[0], [255], [10]],
+                      [[255], [255], [20]]], dtype=np.uint8)  # The odd last column is dropped
+    assert downsample(image).tolist() == [[[191]]]  # (0 + 255 + 255 + 255) / 4 = 191.25
+
+
+def test_downsample_rounds_to_nearest():
+    image = np.array([[[1], [2]], [[2], [2]]], dtype=np.uint8)
+    assert downsample(image)[0, 0, 0] == 2  # 1.75
+    image = np.array([[[1], [1]], [[1], [2]]], dtype=np.uint8)
+    assert downsample(image)[0, 0, 0] == 1  # 1.25
+
+
+def test_flat_colour_stays_flat():
+    image = np.full((6, 10, 3), (12, 200, 255), dtype=np.uint8)
+    for level in build_mipmaps(image):
+        assert (level == (12, 200, 255)).all()
+        assert level.dtype == np.uint8
@@ -0,0 +1,69 @@
+import struct
+import numpy as np
+import pygame
+import pytest
+from replay import FrameInput, InputRecorder, InputLog, checksum, FRAME, MAX_SEED
+
+
+def same_frame(first, second):
+    return (first.elapsed_ms, first.held, first.released, first.quit) == \
+        (second.elapsed_ms, second.held, second.released, second.quit)
+
+
+FRAMES = [
+    FrameInput(16),
+    FrameInput(17, held=[pygame.K_w, pygame.K_LEFT, pygame.K_c]),
+    FrameInput(33, released=[pygame.K_r, pygame.K_h, pygame.K_r]),
+    FrameInput(0xFFFF, held=[pygame.K_SPACE], released=[pygame.K_ESCAPE], quit=True),
+]
+
+
+def test_pack_and_unpack_round_trip():
+    data = b"".join(frame.pack() for frame in FRAMES)
+    offset = 0
+    for frame in FRAMES:
+        unpacked, offset = FrameInput.unpack(data, offset)
+        assert same_frame(unpacked, frame)
+    assert offset == len(data)
+
+
+def test_packed_size():
+    # 5 bytes per frame plus 1 per key released (the closed window counts as one)
+    assert FRAME.size == 5
+    assert len(FRAMES[2].pack()) == 5 + 3
+    assert len(FRAMES[3].pack()) == 5 + 2
+
+
+def test_save_and_load_round_trip(tmp_path):
+    recorder = InputRecorder(MAX_SEED)
+    for frame in FRAMES:
+        recorder.record(frame)
+    state = checksum([1, "on", np.arange(6.0)])
+    recorder.save(tmp_path / "session.rec", state)
+
+    log = InputLog.load(tmp_path / "session.rec")
+    assert log.seed == MAX_SEED
+    assert log.checksum == state
+    assert len(log.frames) == len(FRAMES)
+    assert all(same_frame(loaded, frame) for loaded, frame in zip(log.frames, FRAMES))
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.rec"
+    path.write_bytes(b"NOTAREC!" + bytes(44))
+    with pytest.raises(ValueError):
+        InputLog.load(path)
+
+
+def test_failed_save_leaves_no_file(tmp_path):
+    recorder = InputRecorder(MAX_SEED + 1)  # Too large for the header
+    with pytest.raises(struct.error):
+        recorder.save(tmp_path / "session.rec", checksum([]))
+    assert not (tmp_path / "session.rec").exists()
+
+
+def test_checksum_follows_the_values():
+    state = [3, "spotlight", np.array([0.5, -1.25])]
+    assert checksum(state) == checksum([3, "spotlight", np.array([0.5, -1.25])])
+    assert checksum(state) != checksum([3, "spotlight", np.array([0.5, -1.2500001])])
+    assert checksum([1, 23]) != checksum([12, 3])  # Values are kept apart
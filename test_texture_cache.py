@@ -0,0 +1,80 @@
+import os
+import numpy as np
+from PIL import Image
+from texture_cache import TextureCache, level_sizes
+
+
+def write_image(path, color, size=(8, 4)):
+    Image.new("RGB", size, color).save(path)
+    return str(path)
+
+
+def test_level_sizes_halve_down_to_one():
+    assert level_sizes(5, 3, 3) == [(5, 3), (2, 1), (1, 1)]
+    assert level_sizes(8, 2, 4) == [(8, 2), (4, 1), (2, 1), (1, 1)]
+
+
+def test_miss_then_hit(tmp_path):
+    image = write_image(tmp_path / "red.png", (255, 0, 0))
+    cache = TextureCache(tmp_path / "cache")
+    first = cache.load(image)
+    second = cache.load(image)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert isinstance(second[0], np.memmap)
+    assert np.array_equal(first[0], second[0])
+    assert second[0].shape == (4, 8, 3) and (second[0] == (255, 0, 0)).all()
+
+
+def test_key_follows_the_contents_and_processing(tmp_path):
+    red = write_image(tmp_path / "red.png", (255, 0, 0))
+    also_red = write_image(tmp_path / "also_red.png", (255, 0, 0))
+    cache = TextureCache(tmp_path / "cache")
+    assert cache.key(red, crop=None) == cache.key(also_red, crop=None)  # Same contents, same entry
+    assert cache.key(red, crop=None) != cache.key(red, crop=(0, 0, 4, 4))
+    assert cache.key(red, mipmaps=False) != cache.key(red, mipmaps=True)
+
+
+def test_editing_the_image_invalidates_its_entry(tmp_path):
+    path = tmp_path / "wood.png"
+    image = write_image(path, (255, 0, 0))
+    cache = TextureCache(tmp_path / "cache")
+    cache.load(image)
+
+    write_image(path, (0, 0, 255))
+    stamp = os.stat(path)
+    os.utime(path, ns=(stamp.st_atime_ns, stamp.st_mtime_ns + 10**9))  # Even if the clock didn't move
+    levels = cache.load(image)
+    assert cache.misses == 2
+    assert (levels[0] == (0, 0, 255)).all()
+    assert len(cache.entries()) == 2
+
+
+def test_mipmap_entries_keep_every_level(tmp_path):
+    image = write_image(tmp_path / "ceiling.png", (10, 20, 30), size=(5, 3))
+    cache = TextureCache(tmp_path / "cache")
+    cache.load(image, mipmaps=True)
+    levels = TextureCache(tmp_path / "cache").load(image, mipmaps=True)  # A new cache reads the entry from disk
+    assert [level.shape for level in levels] == [(3, 5, 3), (1, 2, 3), (1, 1, 3)]
+
+
+def test_truncated_entries_are_decoded_again(tmp_path):
+    image = write_image(tmp_path / "red.png", (255, 0, 0))
+    cache = TextureCache(tmp_path / "cache")
+    cache.load(image)
+    path = cache.path(cache.entries()[0])
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 1)
+    assert cache.read(cache.entries()[0]) is None
+    assert (cache.load(image)[0] == (255, 0, 0)).all()
+    assert cache.misses == 2
+
+
+def test_prune_deletes_unused_entries(tmp_path):
+    red = write_image(tmp_path / "red.png", (255, 0, 0))
+    blue = write_image(tmp_path / "blue.png", (0, 0, 255))
+    TextureCache(tmp_path / "cache").load(red)
+
+    cache = TextureCache(tmp_path / "cache")
+    cache.load(blue)
+    assert cache.prune() == 1
+    assert cache.entries() == [cache.key(blue, mipmaps=False, crop=None, rotation=0, size=None)]
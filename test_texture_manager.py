@@ -0,0 +1,46 @@
+import threading
+import numpy as np
+from texture_manager import TextureManager
+
+
+class Uploads:
+    """Records the upload calls instead of talking to OpenGL"""
+
+    def __init__(self):
+        self.sizes = {}
+
+    def __call__(self, texture_name, levels, nearest):
+        self.sizes[texture_name] = levels[0].shape[:2]
+
+
+def image(size):
+    return lambda: [np.zeros((size, size, 3), dtype=np.uint8)]
+
+
+def test_textures_load_when_used_and_the_oldest_are_dropped():
+    uploads = Uploads()
+    manager = TextureManager(uploads, budget_bytes=2 * 16 * 16 * 4, workers=1)
+    for name in range(3):
+        manager.register(name, image(16))
+        manager.use(name)
+        manager.finish_loading()
+        manager.update()
+    assert list(manager.resident) == [1, 2]
+    assert uploads.sizes[0] == (4, 4) and uploads.sizes[2] == (16, 16)  # 0 is back to the placeholder
+    manager.shutdown()
+
+
+def test_shutdown_cancels_the_textures_waiting_to_load():
+    uploads = Uploads()
+    manager = TextureManager(uploads, workers=1)
+    release = threading.Event()
+    manager.register("busy", lambda: release.wait(5) and image(16)())
+    manager.register("waiting", image(16))
+    manager.request_all()
+    waiting = manager.pending["waiting"]
+
+    manager.shutdown()
+    release.set()
+    assert waiting.cancelled() and not manager.pending
+    manager.use("waiting")  # Nothing is started after shutdown
+    assert not manager.pending and uploads.sizes["waiting"] == (4, 4)
@@ -0,0 +1,194 @@
+"""
+This class keeps decoded textures on disk, ready to upload, so images are only decoded once.
+
+An entry is named after a hash of the image file's contents and the processing applied to it
+(crop, rotation, size, mipmaps), so an entry can never be stale: editing an image or changing how it is
+processed gives a new name, and the old entry is simply no longer used (prune() deletes those).
+An entry is a small header followed by the raw RGB rows of every level (just the image, or the
+image and its whole mipmap chain). It is opened with a memory
+map and the levels are handed to glTexImage2D as they are, without decoding or copying them.
+
+Example usage:
+cache = TextureCache()
+levels = cache.load("textures/wood1.jpeg", crop=(0,0,512,512), mipmaps=True)  # List of (height, width, 3) uint8 arrays
+glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, levels[0].shape[1], levels[0].shape[0], 0, GL_RGB,
+             GL_UNSIGNED_BYTE, levels[0])
+
+From the project folder, decode every texture of the room ahead of time:
+python texture_cache.py warm
+python texture_cache.py warm --prune     # Also delete the entries the room no longer uses
+python texture_cache.py clear
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import threading
+import numpy as np
+from PIL import Image
+from mipmaps import build_mipmaps
+
+CACHE_DIR = ".texture_cache"
+FORMAT_VERSION = 1  # Change when the processing or the entry layout changes, so old entries are not used
+MAGIC = b"TEXC"
+HEADER = struct.Struct("<4sIII")  # Magic, width and height of the first level, number of levels
+EXTENSION = ".tex"
+
+
+def process_image(file_name, crop=None, rotation=0, size=None):
+    """Decodes an image and applies the processing: a (height, width, 3) uint8 array of RGB pixels"""
+    im = Image.open(file_name)
+    if crop is not None:
+        im = im.crop(crop)  # A 4-tuple: e.g. (0,0,128,128)
+    if rotation:
+        im = im.rotate(rotation)
+    if size is not None:
+        im = im.resize(size)  # (width, height)
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    return np.asarray(im)
+
+
+def image_size(file_name, crop=None, rotation=0, size=None):
+    """(height, width) process_image() would return, read from the file's header without decoding it"""
+    if size is not None:
+        return size[1], size[0]
+    if crop is not None:
+        return crop[3] - crop[1], crop[2] - crop[0]
+    with Image.open(file_name) as im:
+        width, height = im.size  # Rotating keeps the size
+    return height, width
+
+
+def level_sizes(width, height, count):
+    """(width, height) of each level: every level is half the size of the one before"""
+    return [(max(1, width >> level), max(1, height >> level)) for level in range(count)]
+
+
+class TextureCache:
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.file_hashes = {}  # (file name, modification time, size) -> hash of the contents
+        self.used = set()  # Keys loaded or stored since the cache was created
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+
+    def file_hash(self, file_name):
+        """SHA-256 of a file's contents (only read again when the file changes)"""
+        info = os.stat(file_name)
+        stamp = (os.path.abspath(file_name), info.st_mtime_ns, info.st_size)
+        if stamp not in self.file_hashes:
+            digest = hashlib.sha256()
+            with open(file_name, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            self.file_hashes[stamp] = digest.hexdigest()
+        return self.file_hashes[stamp]
+
+    def key(self, file_name, **processing):
+        """Name of the entry for an image with the given processing"""
+        description = repr((FORMAT_VERSION, self.file_hash(file_name), sorted(processing.items())))
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def load(self, file_name, crop=None, rotation=0, size=None, mipmaps=False):
+        """The levels of the processed image (its mipmap chain if asked), from the cache or decoded and stored on a miss"""
+        processing = {"crop": tuple(crop) if crop is not None else None, "rotation": rotation,
+                      "size": tuple(size) if size is not None else None}
+        key = self.key(file_name, mipmaps=mipmaps, **processing)
+        self.used.add(key)
+        levels = self.read(key)
+        if levels is not None:
+            self.hits += 1
+            return levels
+
+        self.misses += 1
+        image = process_image(file_name, **processing)
+        levels = build_mipmaps(image) if mipmaps else [image]
+        try:
+            self.write(key, levels)
+        except OSError:
+            return levels  # Read-only or full disk: still usable, just not cached
+        return self.read(key) or levels
+
+    def read(self, key):
+        """Memory-mapped levels of an entry, or None if there is no valid entry"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                magic, width, height, count = HEADER.unpack(file.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        sizes = level_sizes(width, height, count)
+        if magic != MAGIC or os.path.getsize(path) != HEADER.size + sum(w * h * 3 for w, h in sizes):
+            return None  # Not an entry, or cut short
+
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER.size)
+        levels, offset = [], 0
+        for width, height in sizes:
+            levels.append(data[offset:offset + width * height * 3].reshape(height, width, 3))
+            offset += width * height * 3
+        return levels
+
+    def write(self, key, levels):
+        """Stores the levels (the first one full size, then halving) under key"""
+        os.makedirs(self.directory, exist_ok=True)
+        height, width = levels[0].shape[:2]
+        temporary = self.path(key) + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, width, height, len(levels)))
+            for level in levels:
+                file.write(np.ascontiguousarray(level, dtype=np.uint8).tobytes())
+        os.replace(temporary, self.path(key))  # Readers never see a half-written entry
+
+    def entries(self):
+        """Keys of every entry in the cache folder"""
+        if not os.path.isdir(self.directory):
+            return []
+        return [name[:-len(EXTENSION)] for name in os.listdir(self.directory) if name.endswith(EXTENSION)]
+
+    def prune(self):
+        """Deletes the entries that were not used since the cache was created; returns how many"""
+        unused = [key for key in self.entries() if key not in self.used]
+        for key in unused:
+            os.remove(self.path(key))
+        return len(unused)
+
+    def clear(self):
+        for key in self.entries():
+            os.remove(self.path(key))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the cache of decoded textures")
+    parser.add_argument("command", choices=["warm", "clear"],
+                        help="warm: decode every texture of the room into the cache; clear: delete every entry")
+    parser.add_argument("--prune", action="store_true", help="after warming, delete the entries that weren't used")
+    parser.add_argument("--directory", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = TextureCache(args.directory)
+    if args.command == "clear":
+        cache.clear()
+        return
+
+    from textures import Textures
+    for attribute, file_name, crop_dimensions in Textures.image_files:
+        if not os.path.exists(file_name):
+            print("%-28s missing" % file_name)
+            continue
+        misses = cache.misses
+        cache.load(file_name, crop_dimensions, mipmaps=True)
+        print("%-28s %s" % (file_name, "decoded" if cache.misses > misses else "already cached"))
+    if args.prune:
+        print("%d unused entries deleted" % cache.prune())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+This class decides which textures are in GPU memory: each one is loaded the first time it is used,
+and the least recently used ones are dropped when the textures take more than a memory budget.
+
+Every texture keeps the name it was given when it was registered, so the rest of the program can
+hold on to texture names as before. A texture that isn't loaded holds a small grey placeholder
+image instead: it can be bound and drawn at any time, and shows the placeholder until its image
+has been decoded (in a worker thread) and uploaded (by update(), once a frame). Dropping a
+texture puts the placeholder back, which frees the memory of the full image; using it again
+loads it again (quickly when the decoded image is in the TextureCache). A texture whose image
+can't be loaded (a missing or corrupt file) keeps the placeholder: the error is kept in failures
+and it isn't tried again.
+
+The sizes are estimates: 4 bytes per texel (drivers store RGB textures as RGBA), every level.
+
+Example usage:
+manager = TextureManager(textures.upload_texture, budget_bytes=256 * 2**20)
+manager.register(texture_name, lambda: Textures.read_image("textures/wall.jpeg"), label="wall")
+manager.use(texture_name)      # When it is bound: starts loading it if it isn't loaded
+manager.update()               # Every frame: uploads what has been decoded, drops textures over the budget
+manager.finish_loading()       # Or wait for every texture being loaded
+manager.shutdown()             # When done: stops the worker threads
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
+import numpy as np
+from mipmaps import build_mipmaps
+
+DEFAULT_BUDGET = 256 * 2**20  # Bytes of texture memory
+BYTES_PER_TEXEL = 4
+PLACEHOLDER_COLOR = (128, 128, 128)
+PLACEHOLDER_SIZE = 4
+
+
+def estimated_bytes(levels):
+    return sum(level.shape[0] * level.shape[1] * BYTES_PER_TEXEL for level in levels)
+
+
+class TextureEntry:
+    """A texture the manager can load"""
+
+    def __init__(self, load, nearest, label):
+        self.load = load  # Function returning the levels to upload (called in a worker thread)
+        self.nearest = nearest  # Magnify with GL_NEAREST (see Textures.set_texture_parameters)
+        self.label = label  # Name used in the load times (the file name)
+        self.last_used = -1  # Frame it was last used in
+        self.error = None  # Exception raised by load, if it failed (it isn't called again)
+
+
+class TextureManager:
+
+    def __init__(self, upload, budget_bytes=DEFAULT_BUDGET, workers=os.cpu_count() or 1):
+        """
+        :param upload: Function(texture name, levels, nearest) that uploads levels into a texture (on the GL thread).
+        """
+        self.upload = upload
+        self.budget_bytes = budget_bytes
+        self.pool = ThreadPoolExecutor(workers)
+        self.closed = False  # Set by shutdown(): no more textures are decoded
+        self.placeholder = build_mipmaps(np.full((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE, 3), PLACEHOLDER_COLOR, np.uint8))
+
+        self.entries = {}  # Texture name -> TextureEntry
+        self.resident = OrderedDict()  # Name -> estimated bytes of the loaded textures, least recently used first
+        self.pending = {}  # Texture name -> Future of (levels, seconds spent decoding)
+        self.frame = 0
+
+        # Statistics
+        self.load_times = {}  # Label -> (seconds decoding, seconds uploading) of the last load
+        self.failures = {}  # Label -> error message of the textures that couldn't be loaded
+        self.loads = 0
+        self.evictions = 0
+
+    def __contains__(self, texture_name):
+        return texture_name in self.entries
+
+    @property
+    def resident_bytes(self):
+        return sum(self.resident.values())
+
+    def register(self, texture_name, load, nearest=False, label=None):
+        """Puts a texture in the manager's hands; it holds the placeholder until it is used"""
+        self.entries[texture_name] = TextureEntry(load, nearest, label or str(texture_name))
+        self.upload(texture_name, self.placeholder, False)
+
+    #==============================
+    # Loading
+    #==============================
+
+    def use(self, texture_name):
+        """Call when the texture is bound: keeps it from being dropped this frame, and loads it if needed"""
+        entry = self.entries.get(texture_name)
+        if entry is None:
+            return  # Not managed
+        entry.last_used = self.frame
+        if texture_name in self.resident:
+            self.resident.move_to_end(texture_name)
+        elif texture_name not in self.pending and entry.error is None:
+            self.request(texture_name)
+
+    def request(self, texture_name):
+        """Starts decoding a texture in a worker thread (unless the manager was shut down)"""
+        if not self.closed:
+            self.pending[texture_name] = self.pool.submit(self.decode, self.entries[texture_name].load)
+
+    @staticmethod
+    def decode(load):
+        start = time.perf_counter()
+        levels = load()
+        return levels, time.perf_counter() - start
+
+    def store(self, texture_name, levels, decode_time=0.0):
+        """Uploads the levels of a texture, which is then loaded, and drops others if over the budget"""
+        entry = self.entries[texture_name]
+        start = time.perf_counter()
+        self.upload(texture_name, levels, entry.nearest)
+        self.load_times[entry.label] = (decode_time, time.perf_counter() - start)
+        entry.last_used = self.frame
+        self.resident[texture_name] = estimated_bytes(levels)
+        self.resident.move_to_end(texture_name)
+        self.loads += 1
+        self.evict_over_budget()
+
+    def load_now(self, texture_name):
+        """Loads a texture without waiting for a frame (on the GL thread)"""
+        self.pending.pop(texture_name, None)
+        try:
+            levels, decode_time = self.decode(self.entries[texture_name].load)
+        except Exception as error:
+            self.fail(texture_name, error)
+            return
+        self.store(texture_name, levels, decode_time)
+
+    def finish(self, texture_name, future):
+        """Stores a texture decoded in a worker thread, or keeps its placeholder if decoding it failed"""
+        try:
+            levels, decode_time = future.result()
+        except Exception as error:
+            self.fail(texture_name, error)
+            return
+        self.store(texture_name, levels, decode_time)
+
+    def fail(self, texture_name, error):
+        entry = self.entries[texture_name]
+        entry.error = error
+        self.failures[entry.label] = "%s: %s" % (type(error).__name__, error)
+
+    def update(self):
+        """
+        Call once a frame on the GL thread, before drawing: uploads the textures decoded since the last
+        frame, and drops the ones the last frame didn't use while over the budget
+        """
+        for texture_name in [texture_name for texture_name, future in self.pending.items() if future.done()]:
+            self.finish(texture_name, self.pending.pop(texture_name))
+        self.evict_over_budget()
+        self.frame += 1
+
+    def request_all(self):
+        """Starts loading every texture that isn't loaded"""
+        for texture_name, entry in self.entries.items():
+            if texture_name not in self.resident and texture_name not in self.pending and entry.error is None:
+                self.request(texture_name)
+
+    def finish_loading(self):
+        """Waits for every texture being loaded, uploading each one as soon as it is decoded"""
+        futures = {future: texture_name for texture_name, future in self.pending.items()}
+        for future in as_completed(futures):
+            self.pending.pop(futures[future])
+            self.finish(futures[future], future)
+
+    def shutdown(self):
+        """
+        Stops the worker threads without waiting for them: textures that haven't started decoding are
+        cancelled, and every texture that isn't loaded keeps its placeholder
+        """
+        self.closed = True
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.pool.shutdown(wait=False)
+
+    #==============================
+    # Dropping textures
+    #==============================
+
+    def evict(self, texture_name):
+        """Puts the placeholder back in place of a texture's image"""
+        self.upload(texture_name, self.placeholder, False)
+        del self.resident[texture_name]
+        self.evictions += 1
+
+    def evict_over_budget(self):
+        """Drops the least recently used textures until the rest fit in the budget (except the ones used this frame)"""
+        total = self.resident_bytes
+        for texture_name in list(self.resident):
+            if total <= self.budget_bytes:
+                break
+            if self.entries[texture_name].last_used >= self.frame:
+                break  # Everything from here on is needed for the current frame
+            total -= self.resident[texture_name]
+            self.evict(texture_name)
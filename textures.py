@@ -3,8 +3,12 @@ This class handles loading and storing textures for our project and includes a s
 It simplifies the process of applying textures to objects in the scene.
 """""
 
+import os
 import sys
 import math
+import time
+from functools import partial
+import numpy as np
 import pygame
 from OpenGL.GLU import *
 from OpenGL.GL import *
@@ -13,7 +17,21 @@ from utils import *
 from basic_shapes import *
 from components import *
 from materials import *
-from PIL import Image
+import render_queue
+from gl_state import gl_state
+from texture_cache import TextureCache, process_image, image_size
+from mipmaps import build_mipmaps
+from atlas import TextureAtlas
+from texture_manager import TextureManager, DEFAULT_BUDGET
+
+# Threads decoding images at startup (PIL decodes without holding the GIL, so they run in parallel)
+DECODE_WORKERS = os.cpu_count() or 1
+
+PLAIN_SIZE = 16  # Side of the white texture (and of its tile in an atlas)
+
+
+def plain_image():
+    return np.full((PLAIN_SIZE, PLAIN_SIZE, 3), 255, dtype=np.uint8)
 
 class Textures:
             
@@ -24,17 +42,35 @@ class Textures:
     def set_texture(self, texture_name):
         # print(f"Binding texture {texture_name}")
 
-        glBindTexture(GL_TEXTURE_2D, texture_name)
-        glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-        glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR) # try GL_LINEAR/GL_NEAREST
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        # While a render queue is collecting the frame, it binds the texture later. A texture packed in an
+        # atlas is drawn from the atlas, so shapes with different textures in it can share a draw call
+        if render_queue.RenderQueue.active is not None:
+            atlas_name, rect = self.atlas_regions.get(texture_name, (texture_name, None))
+            self.manager.use(atlas_name)
+            render_queue.RenderQueue.active.set_texture(atlas_name, rect)
+            return
+
+        # A texture that isn't loaded yet starts loading, and shows its placeholder until then
+        self.manager.use(texture_name)
 
-        # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-        glEnable(GL_LIGHTING)
-        glEnable(GL_TEXTURE_2D)
+        # The texture parameters were set when the texture was loaded (see set_texture_parameters)
+        gl_state.bind_texture(GL_TEXTURE_2D, texture_name)
+
+        # Enable/Disable each time or OpenGL ALWAYS expects texturing! (skipped when already enabled)
+        gl_state.enable(GL_LIGHTING)
+        gl_state.enable(GL_TEXTURE_2D)
+
+    def set_texture_parameters(self, texture_name, levels=1, nearest=False):
+        """
+        Wrapping and filtering for a texture, set once when it is loaded
+        :param levels: Number of mipmap levels uploaded; with more than one the texture is filtered trilinearly.
+        :param nearest: Magnify with GL_NEAREST, to keep sharp edges sharp up close (the checkerboard).
+        """
+        gl_state.texture_parameter(texture_name, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
+        gl_state.texture_parameter(texture_name, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        gl_state.texture_parameter(texture_name, GL_TEXTURE_MAG_FILTER, GL_NEAREST if nearest else GL_LINEAR)
+        gl_state.texture_parameter(texture_name, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR if levels > 1 else GL_LINEAR)
+        gl_state.texture_parameter(texture_name, GL_TEXTURE_MAX_LEVEL, levels - 1)
 
     #==============================
     # Initial texture setup
@@ -71,44 +107,141 @@ class Textures:
     wall_name = None
 
     checkerboard_floor_name = None
+
+    # (attribute that gets the texture name, image file, crop box) of every texture loaded from an image
+    image_files = [
+        ("eight_ball_texture", eight_ball_file, (0,0,512,512)),
+        ("wood_one_texture", wood_one_file, (0,0,512,512)),
+        ("wood_two_texture", wood_two_file, (0,0,512,512)),
+        ("die_one_name", die_one, None),
+        ("die_two_name", die_two, None),
+        ("die_three_name", die_three, None),
+        ("die_four_name", die_four, None),
+        ("die_five_name", die_five, None),
+        ("die_six_name", die_six, None),
+        ("wall_photo_name", wall_photo, None),
+        ("wood_panel_name", wood_panel_file, None),
+        ("ceiling_name", ceiling_file, None),
+        ("wall_name", wall_file, None),
+    ]
+
+    # Textures also packed into one atlas, so a die is drawn with one bind (see BasicShapes.draw_cube)
+    die_atlas_attributes = ["die_one_name", "die_two_name", "die_three_name", "die_four_name", "die_five_name",
+                            "die_six_name"]
+    die_atlas_name = None
+
+    # The ball textures and a plain white tile (for the balls without a texture) share an atlas, so balls of
+    # the same material are drawn with one call whatever their texture (see RenderQueue.set_texture)
+    ball_atlas_attributes = ["eight_ball_texture"]
+    ball_atlas_name = None
+    white_texture = None
     
-    def __init__(self):
+    def __init__(self, window=True, workers=DECODE_WORKERS, use_cache=True, lazy=True, budget_bytes=DEFAULT_BUDGET):
+        """
+        :param lazy: Load each texture the first time it is used (see texture_manager.py), instead of all of them now.
+        :param budget_bytes: Texture memory kept at most; the least recently used textures are dropped beyond it.
+        """
 
         # pygame setup (no reoson for it to be in the code, but there's an error when it's removed: zsh: segmentation fault)
-        screen = pygame.display.set_mode((1200, 800), pygame.DOUBLEBUF|pygame.OPENGL)
+        # window=False when an OpenGL context was created without a window (see headless_gl.py)
+        if window:
+            screen = pygame.display.set_mode((1200, 800), pygame.DOUBLEBUF|pygame.OPENGL)
+
+        # Decoded images are kept on disk (see texture_cache.py), so they are only decoded on the first run
+        self.cache = TextureCache() if use_cache else None
+
+        # Decides which textures are in memory; texture names never change, whether a texture is loaded or not
+        self.manager = TextureManager(self.upload_texture, budget_bytes, workers)
+        self.load_times = self.manager.load_times  # File name -> (seconds decoding, seconds uploading)
+        start = time.perf_counter()
+
+        # Texture state shared by every texture, set once
+        gl_state.tex_env(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
+        gl_state.hint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)  # Rows of RGB pixels are tightly packed (small mipmap levels have odd widths)
 
         # Create a texture
         self.checkerboard_floor_name = self.create_checkerboard_texture_adjustable()
 
-        # Load the rest of the textures from images
-        self.texture_array = glGenTextures(13)  # Texture names for all textures to create
-        self.eight_ball_texture = self.texture_array[0]
-        self.wood_one_texture = self.texture_array[1]
-        self.wood_two_texture = self.texture_array[2]
-        self.die_one_name = self.texture_array[3]
-        self.die_two_name = self.texture_array[4]
-        self.die_three_name = self.texture_array[5]
-        self.die_four_name = self.texture_array[6]
-        self.die_five_name = self.texture_array[7]
-        self.die_six_name = self.texture_array[8]
-        self.wall_photo_name = self.texture_array[9]
-        self.wood_panel_name = self.texture_array[10]
-        self.ceiling_name = self.texture_array[11]
-        self.wall_name = self.texture_array[12]
-
-        self.load_texture(self.eight_ball_texture, self.eight_ball_file, (0,0,512,512))
-        self.load_texture(self.wood_one_texture, self.wood_one_file, (0,0,512,512))
-        self.load_texture(self.wood_two_texture, self.wood_two_file, (0,0,512,512))
-        self.load_texture(self.die_one_name, self.die_one)
-        self.load_texture(self.die_two_name, self.die_two)
-        self.load_texture(self.die_three_name, self.die_three)
-        self.load_texture(self.die_four_name, self.die_four)
-        self.load_texture(self.die_five_name, self.die_five)
-        self.load_texture(self.die_six_name, self.die_six)
-        self.load_texture(self.wall_photo_name, self.wall_photo)
-        self.load_texture(self.wood_panel_name, self.wood_panel_file)
-        self.load_texture(self.ceiling_name, self.ceiling_file)
-        self.load_texture(self.wall_name, self.wall_file)
+        # The rest of the textures come from images
+        self.texture_array = glGenTextures(len(self.image_files))  # Texture names for all textures to create
+        for texture_name, (attribute, file_name, crop_dimensions) in zip(self.texture_array, self.image_files):
+            setattr(self, attribute, texture_name)
+            self.manager.register(texture_name, partial(self.read_image, file_name, crop_dimensions, self.cache),
+                                  label=file_name)
+
+        self.atlas_regions = {}  # Texture name -> (atlas texture name, (s0, t0, s1, t1) rectangle in the atlas)
+        self.die_atlas_name = self.create_atlas(
+            [getattr(self, attribute) for attribute, file_name, crop_dimensions in self.die_atlas_images()],
+            [(file_name, crop_dimensions) for attribute, file_name, crop_dimensions in self.die_atlas_images()])
+        self.white_texture = self.create_plain_texture()
+        ball_images = [image for image in self.image_files if image[0] in self.ball_atlas_attributes]
+        self.ball_atlas_name = self.create_atlas(
+            [getattr(self, attribute) for attribute, file_name, crop_dimensions in ball_images] + [self.white_texture],
+            [(file_name, crop_dimensions) for attribute, file_name, crop_dimensions in ball_images] + [None])
+
+        if not lazy:
+            # The images are decoded in worker threads, and each one is uploaded here as soon as it is ready
+            self.manager.request_all()
+            self.manager.finish_loading()
+        self.total_load_time = time.perf_counter() - start  # Seconds for the textures loaded at startup
+
+    def die_atlas_images(self):
+        return [image for image in self.image_files if image[0] in self.die_atlas_attributes]
+
+    def update(self):
+        """Call once a frame: uploads the textures that finished loading"""
+        self.manager.update()
+
+    def shutdown(self):
+        """Call when done with the textures: stops the threads that decode them"""
+        self.manager.shutdown()
+
+    def create_atlas(self, texture_names, images):
+        """
+        Packs the images of textures into one atlas texture, loaded the first time it is used like the others
+        (the layout only needs the sizes of the images, so nothing is decoded here)
+        :param images: (file name, crop dimensions) of the image of each texture, or None for a plain white tile.
+        :return: The texture name of the atlas; atlas_of() then finds the textures in it. None if an image
+                 can't be read: the textures are then drawn on their own.
+        """
+        try:
+            atlas = TextureAtlas([(PLAIN_SIZE, PLAIN_SIZE) if image is None else image_size(*image) for image in images])
+        except OSError:
+            return None
+
+        def read_atlas():
+            tiles = [plain_image() if image is None else self.read_image(*image, self.cache) for image in images]
+            return build_mipmaps(atlas.pack(tiles), atlas.levels)  # Only the levels with a border
+
+        atlas_name = glGenTextures(1)
+        self.manager.register(atlas_name, read_atlas,
+                              label="atlas of " + ", ".join("white" if image is None else image[0] for image in images))
+        for texture_name, rect in zip(texture_names, atlas.rects):
+            self.atlas_regions[texture_name] = (atlas_name, rect)
+        return atlas_name
+
+    def atlas_of(self, texture_names):
+        """(atlas texture name, tuple of rectangles) if all the textures are in the same atlas, else None"""
+        regions = [self.atlas_regions.get(texture_name) for texture_name in texture_names]
+        if None in regions or len({atlas_name for atlas_name, rect in regions}) != 1:
+            return None
+        return regions[0][0], tuple(rect for atlas_name, rect in regions)
+
+    def load_report(self):
+        """The load times of the images, slowest first, as lines of text"""
+        lines = ["%-28s decode %7.1f ms, upload %6.1f ms" % (file_name, decode * 1e3, upload * 1e3)
+                 for file_name, (decode, upload) in sorted(self.load_times.items(), key=lambda item: -sum(item[1]))]
+        lines += ["%-28s failed: %s" % (file_name, error) for file_name, error in sorted(self.manager.failures.items())]
+        return lines + ["%d textures loaded, %.1f ms at startup" % (len(self.load_times), self.total_load_time * 1e3)]
+
+    def create_plain_texture(self):
+        """A small white texture: textured shapes drawn with it look the same as untextured ones"""
+        texture = glGenTextures(1)
+        levels = build_mipmaps(plain_image())
+        self.manager.register(texture, lambda: levels, label="white")
+        self.manager.store(texture, levels)
+        return texture
 
     def create_checkerboard_texture_adjustable(self, size=128, checker_size=8):
         """
@@ -120,9 +253,6 @@ class Textures:
         # Generate a new texture ID
         texture = glGenTextures(1)
 
-        # Bind the texture so subsequent calls affect this texture
-        glBindTexture(GL_TEXTURE_2D, texture)
-
         # Create the checkerboard pattern
         data = []
         for i in range(size):
@@ -132,17 +262,14 @@ class Textures:
                 else:
                     data.extend([0, 0, 0])  # Black square
 
-        # Convert the list to bytes (OpenGL expects bytes for texture data)
-        data = bytes(data)
-
-        # Specify the texture parameters and upload the texture data to OpenGL
-        glTexImage2D(
-            GL_TEXTURE_2D, 0, GL_RGB, size, size, 0, GL_RGB, GL_UNSIGNED_BYTE, data
-        )
+        # Convert the list to an image array
+        data = np.frombuffer(bytes(data), dtype=np.uint8).reshape(size, size, 3)
 
-        # Set texture filtering to nearest-neighbor for sharp edges
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        # Upload it with its mipmaps, so the 30x30 floor fades to grey in the distance instead of shimmering,
+        # and with nearest magnification so the checkers stay sharp up close
+        levels = build_mipmaps(data)
+        self.manager.register(texture, lambda: levels, nearest=True, label="checkerboard")
+        self.manager.store(texture, levels)
 
         return texture
 
@@ -153,7 +280,7 @@ class Textures:
         # First, we ask OpenGL to give us a new texture (Think of it like wallpaper or gift wrapping paper that you apply to an object.) ID (like getting a new blank canvas)
         texture = glGenTextures(1)
         # Tell OpenGL we want to work on this texture (like picking up our canvas to draw on it)
-        glBindTexture(GL_TEXTURE_2D, texture)
+        gl_state.bind_texture(GL_TEXTURE_2D, texture)
         
         size = 64
         checker_size = 8
@@ -189,48 +316,40 @@ class Textures:
         data = bytes(data)
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, size, size, 0, GL_RGB, GL_UNSIGNED_BYTE, data)
         # Tell OpenGL how to handle the texture when it's stretched or shrunk
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        self.set_texture_parameters(texture)
         return texture
 
 
     def load_rotate_and_stretch_texture(self, texture_name, file_name, rotation, new_width, new_height):
-        # Load the image. Crop if requested (should be a 4-tuple: e.g. (0,0,128,128)
-        im = Image.open(file_name)
-        # print("Image dimensions: {0}".format(im.size))  # If you want to see the image's original dimensions
-        
-        im = im.rotate(rotation)
-
-        im = im.resize((new_width, new_height))
+        # Rotate, then stretch the image to the new size
+        def read():
+            if self.cache is not None:
+                return self.cache.load(file_name, rotation=rotation, size=(new_width, new_height), mipmaps=True)
+            return build_mipmaps(process_image(file_name, rotation=rotation, size=(new_width, new_height)))
+        self.manager.register(texture_name, read, label=file_name)
+        self.manager.load_now(texture_name)
         
-        if im.mode != "RGB":
-         im = im.convert("RGB")
-
-
-        dimX = im.size[0]
-        dimY = im.size[1]
-        texture = im.tobytes("raw", "RGB")
+    @staticmethod
+    def read_image(file_name, crop_dimensions=None, cache=None, mipmaps=True):
+        """
+        Reads an image file as RGB pixels (no OpenGL calls)
+        :return: The levels to upload: (height, width, 3) arrays, the image and then its mipmaps if asked.
+        """
+        # Crop if requested (should be a 4-tuple: e.g. (0,0,128,128)
+        if cache is not None:
+            return cache.load(file_name, crop_dimensions, mipmaps=mipmaps)  # Memory-mapped, uploaded without a copy
+        texture = process_image(file_name, crop_dimensions)
+        return build_mipmaps(texture) if mipmaps else [texture]
 
-        glBindTexture(GL_TEXTURE_2D, texture_name)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, dimX, dimY, 0, GL_RGB,
-                    GL_UNSIGNED_BYTE, texture)
-        
     def load_texture(self, texture_name, file_name, crop_dimensions=None):
-        # Load the image. Crop if requested (should be a 4-tuple: e.g. (0,0,128,128)
-        im = Image.open(file_name)
-        # print("Image dimensions: {0}".format(im.size))  # If you want to see the image's original dimensions
-        if crop_dimensions != None:
-            # We are asked to crop the texture
-            im = im.crop(crop_dimensions)
-        
-        if im.mode != "RGB":
-         im = im.convert("RGB")
-
-
-        dimX = im.size[0]
-        dimY = im.size[1]
-        texture = im.tobytes("raw", "RGB")
-
-        glBindTexture(GL_TEXTURE_2D, texture_name)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, dimX, dimY, 0, GL_RGB,
-                    GL_UNSIGNED_BYTE, texture)
+        self.manager.register(texture_name, partial(self.read_image, file_name, crop_dimensions, self.cache),
+                              label=file_name)
+        self.manager.load_now(texture_name)
+
+    def upload_texture(self, texture_name, levels, nearest=False):
+        """Uploads every level of a texture (see read_image) and sets its filtering"""
+        gl_state.bind_texture(GL_TEXTURE_2D, texture_name)
+        for level, texture in enumerate(levels):
+            glTexImage2D(GL_TEXTURE_2D, level, GL_RGB, texture.shape[1], texture.shape[0], 0, GL_RGB,
+                        GL_UNSIGNED_BYTE, texture)
+        self.set_texture_parameters(texture_name, len(levels), nearest)